@@ -0,0 +1,390 @@
+"""
+##----------------------------------------
+Runtime asyncio (scheduler.runtime = 'async')
+##----------------------------------------
+
+Alternativa ao `run_loop` + JobExecutor para muitos jobs que passam quase
+todo o tempo esperando o Oracle:
+
+- `run_timer_loop`: acorda exatamente no próximo disparo do RuleScheduler,
+  sem o teto de 60 s do `run_loop`. O `run_pending` roda em uma thread, pois
+  as tarefas internas (reload, métricas, mudanças) consultam o PostgreSQL;
+- `AsyncJobRunner`: a mesma admissão do JobExecutor (prioridade e
+  `overlap_policy`), mas cada execução é uma corrotina: centenas de jobs
+  esperando o banco custam só o estado das corrotinas, não uma thread cada;
+- `run_export_async`: análogo de `exporters.run_export` para a busca
+  assíncrona do python-oracledb; cada bloco é gravado em um executor de I/O
+  enquanto o próximo é buscado;
+- `AsyncDBLogWriter`: logs em lote com `asyncpg` (opcional), no lugar da
+  thread do DBLogWriter.
+
+A API assíncrona do oracledb só existe no modo thin (`oracle_database.thin_mode`).
+No modo thick, e para jobs que não cabem no caminho assíncrono (extração
+paralela, modo 'process'), a execução vai para o JobExecutor de threads
+(ver `scheduler.run_jobs_async`).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import collections
+import itertools
+import threading
+import time
+
+from logging_config import DBLogWriter, get_logger, log_exception, log_debug
+
+try:
+    import asyncpg
+except ImportError:  # asyncpg é opcional: sem ele os logs seguem na thread do DBLogWriter
+    asyncpg = None
+
+logger = get_logger('async_runtime')
+
+# Teto do sono entre disparos: protege contra ajustes do relógio (NTP, horário de verão)
+MAX_SLEEP_SECONDS = 300.0
+
+
+async def run_timer_loop(engine, max_sleep=MAX_SLEEP_SECONDS):
+    """Dispara as regras vencidas e dorme até o próximo disparo, para sempre."""
+    while True:
+        try:
+            await asyncio.to_thread(engine.run_pending)
+            idle = engine.idle_seconds()
+            delay = max_sleep if idle is None else min(idle, max_sleep)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except Exception as e:
+            log_exception(logger, f"Error in async scheduler loop: {e}. Continuing loop.")
+            await asyncio.sleep(30)
+
+
+class _Run:
+    __slots__ = ('func', 'jobs', 'priority', 'enqueued_at')
+
+    def __init__(self, func, jobs):
+        self.func = func
+        self.jobs = jobs
+        self.priority = max(job.priority or 0 for job in jobs)
+        self.enqueued_at = None
+
+
+def _set_done(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AsyncJobRunner:
+    """
+    Fila de prioridade consumida por `max_jobs` corrotinas. `submit_jobs(func, jobs)`
+    aplica a política de sobreposição de cada job (como `JobExecutor.submit_jobs`)
+    e enfileira `func(jobs_admitidos)`, uma função assíncrona.
+
+    Tudo roda no loop do runtime; de outras threads use `submit_threadsafe`.
+    `oracle_slot()` reserva uma vaga do `oracle_limiter` (o mesmo
+    `job_runner.OracleLimiter` do JobExecutor, para as consultas das
+    corrotinas e das threads somarem no mesmo teto) e `io_executor` grava os
+    arquivos.
+    """
+
+    def __init__(self, max_jobs, oracle_limiter, io_workers):
+        self.max_jobs = max_jobs
+        self.oracle_limiter = oracle_limiter
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='async-io')
+        self._loop = None
+        self._queue = None
+        self._workers = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()  # só para stats() lida de outras threads (/metrics)
+        self._running = {}
+        self._queued = {}
+        self._deferred = {}
+        self._shutdown = False
+
+        self._counters = dict.fromkeys(('submitted', 'skipped', 'coalesced', 'completed', 'failed'), 0)
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._started_tasks = 0
+
+    def start(self):
+        """Cria a fila e as corrotinas de trabalho no loop corrente."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [self._loop.create_task(self._worker()) for _ in range(self.max_jobs)]
+
+    # ------------------------------------------------------------------ submit
+
+    def submit_threadsafe(self, func, jobs, on_admitted=None):
+        """Agenda `submit_jobs` no loop; `on_admitted(jobs)` é chamado lá com os jobs admitidos."""
+        def submit():
+            if self._shutdown:
+                return
+            admitted = self.submit_jobs(func, jobs)
+            if admitted and on_admitted is not None:
+                on_admitted(admitted)
+        self._loop.call_soon_threadsafe(submit)
+
+    def submit_jobs(self, func, jobs):
+        """Admite os jobs conforme a política de cada um. Retorna a lista admitida."""
+        if self._shutdown:
+            raise RuntimeError("AsyncJobRunner is shut down")
+
+        ready = []
+        with self._lock:
+            for job in jobs:
+                job_id = job.job_id
+                busy = self._running.get(job_id, 0) or self._queued.get(job_id, 0)
+                policy = job.overlap_policy or 'skip'
+
+                if not busy or policy == 'allow':
+                    ready.append(job)
+                elif policy == 'coalesce' and job_id not in self._deferred and not self._queued.get(job_id, 0):
+                    self._deferred[job_id] = _Run(func, [job])
+                    self._counters['coalesced'] += 1
+                    log_debug(logger, f"Job '{job.name}' (ID: {job_id}) is running; coalesced into one follow-up run.", job_id=job_id)
+                else:
+                    self._counters['skipped'] += 1
+                    log_debug(logger, f"Job '{job.name}' (ID: {job_id}) is already running or queued; skipping this run.", job_id=job_id)
+
+            if ready:
+                self._enqueue(_Run(func, ready))
+        return ready
+
+    def _enqueue(self, task):
+        task.enqueued_at = time.monotonic()
+        for job in task.jobs:
+            self._queued[job.job_id] = self._queued.get(job.job_id, 0) + 1
+        self._queue.put_nowait((-task.priority, next(self._seq), task))
+        self._counters['submitted'] += 1
+
+    # ------------------------------------------------------------------ workers
+
+    async def _worker(self):
+        while True:
+            _, _, task = await self._queue.get()
+            if task is None:
+                return  # shutdown: a fila já foi esvaziada (sentinela tem a menor prioridade)
+
+            with self._lock:
+                waited = time.monotonic() - task.enqueued_at
+                self._latency_total += waited
+                self._latency_max = max(self._latency_max, waited)
+                self._started_tasks += 1
+                for job in task.jobs:
+                    self._queued[job.job_id] -= 1
+                    self._running[job.job_id] = self._running.get(job.job_id, 0) + 1
+
+            try:
+                await task.func(task.jobs)
+                outcome = 'completed'
+            except Exception as e:
+                outcome = 'failed'
+                log_exception(logger, f"Unhandled error running jobs {[job.job_id for job in task.jobs]}: {e}")
+
+            with self._lock:
+                self._counters[outcome] += 1
+                for job in task.jobs:
+                    self._running[job.job_id] -= 1
+                    if not self._running[job.job_id]:
+                        del self._running[job.job_id]
+                        deferred = self._deferred.pop(job.job_id, None)
+                        if deferred is not None and not self._shutdown:
+                            self._enqueue(deferred)
+
+    # ------------------------------------------------------------------ Oracle
+
+    @asynccontextmanager
+    async def oracle_slot(self):
+        """Limita as consultas Oracle simultâneas (junto com as threads do JobExecutor)."""
+        started = time.monotonic()
+        while True:
+            # Sem vaga, a próxima liberação (de qualquer thread) acorda esta corrotina
+            released = self._loop.create_future()
+            if self.oracle_limiter.try_acquire(on_release=self._waker(released), started=started):
+                break
+            await released
+        try:
+            yield
+        finally:
+            self.oracle_limiter.release()
+
+    def _waker(self, future):
+        loop = self._loop
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(_set_done, future)
+            except RuntimeError:
+                pass  # loop já encerrado
+        return wake
+
+    # ------------------------------------------------------------------ status
+
+    def stats(self):
+        """
+        Mesmas métricas do JobExecutor.stats(), para as execuções assíncronas.
+        As de Oracle (`oracle_*`) são do limitador compartilhado: iguais às do JobExecutor.
+        """
+        with self._lock:
+            started = self._started_tasks
+            return dict(
+                self._counters,
+                workers=self.max_jobs,
+                queue_depth=self._queue.qsize() if self._queue is not None else 0,
+                deferred=len(self._deferred),
+                running_jobs=sum(self._running.values()),
+                oracle_active=self.oracle_limiter.active,
+                oracle_limit=self.oracle_limiter.limit,
+                oracle_wait_seconds=round(self.oracle_limiter.wait_total, 3),
+                queue_latency_avg_ms=round(1000 * self._latency_total / started, 1) if started else 0.0,
+                queue_latency_max_ms=round(1000 * self._latency_max, 1),
+            )
+
+    async def shutdown(self):
+        """Para de aceitar jobs, termina o que já está na fila e libera o executor de I/O."""
+        self._shutdown = True
+        with self._lock:
+            self._deferred.clear()
+        for _ in self._workers:
+            self._queue.put_nowait((float('inf'), next(self._seq), None))
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self.io_executor.shutdown(wait=True)
+
+
+"""
+##----------------------------------------
+Pipeline busca → escrita (assíncrono)
+##----------------------------------------
+"""
+
+
+async def run_export_async(fetch_batch, exporter, executor, on_batch=None):
+    """
+    Consome `await fetch_batch()` até receber um bloco vazio e grava cada
+    bloco no `exporter` (já aberto) pelo `executor`, enquanto o próximo bloco
+    é buscado: no máximo um bloco em escrita e um em busca por job.
+
+    `on_batch(batch_rows, total_rows)` é chamado após cada bloco buscado.
+    Erros da escrita são repassados ao chamador. Retorna o total de linhas.
+    """
+    loop = asyncio.get_running_loop()
+    total = 0
+    writing = None
+    try:
+        while True:
+            batch = await fetch_batch()
+            if writing is not None:
+                await writing
+                writing = None
+            if not batch:
+                return total
+            writing = loop.run_in_executor(executor, exporter.write_batch, batch)
+            total += len(batch)
+            if on_batch:
+                on_batch(len(batch), total)
+    finally:
+        if writing is not None:
+            # Erro na busca: a escrita em andamento termina antes do abort/close do chamador
+            await asyncio.gather(writing, return_exceptions=True)
+
+
+"""
+##----------------------------------------
+Logs no PostgreSQL com asyncpg
+##----------------------------------------
+"""
+
+_LOG_COLUMNS = ('timestamp', 'log_level', 'logger_name', 'job_id', 'user_name', 'log_text', 'duration_ms')
+
+
+class AsyncDBLogWriter:
+    """
+    Mesmo papel do `logging_config.DBLogWriter`, no loop do runtime: os
+    registros entram em uma fila limitada (de qualquer thread, por `submit`)
+    e uma tarefa os grava em lote com COPY do asyncpg, a cada `batch_size`
+    registros ou `flush_interval` segundos. Fila cheia descarta o registro
+    mais antigo ('drop_oldest') ou o novo ('drop_newest'); 'block' não faz
+    sentido dentro do loop e vale como 'drop_oldest'.
+    """
+
+    def __init__(self, dsn, queue_size=10000, batch_size=500, flush_interval=2.0, overflow='drop_oldest'):
+        if asyncpg is None:
+            raise RuntimeError("Async database logging requires the 'asyncpg' package.")
+        self._dsn = dsn
+        self._records = collections.deque()
+        self._queue_size = int(queue_size)
+        self._batch_size = int(batch_size)
+        self._flush_interval = float(flush_interval)
+        self._drop_newest = overflow == 'drop_newest'
+        self._dropped = 0
+        self._loop = None
+        self._ready = None
+        self._task = None
+        self._closed = False
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    def submit(self, record):
+        """Enfileira um registro sem bloquear (chamado de qualquer thread)."""
+        self._loop.call_soon_threadsafe(self._put, record)
+
+    def _put(self, record):
+        if len(self._records) >= self._queue_size:
+            self._dropped += 1
+            if self._drop_newest:
+                return
+            self._records.popleft()
+        self._records.append(record)
+        if len(self._records) >= self._batch_size:
+            self._ready.set()
+
+    async def close(self):
+        """Grava o que estiver pendente e encerra a tarefa."""
+        self._closed = True
+        self._ready.set()
+        await self._task
+
+    async def _run(self):
+        connection = None
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._ready.wait(), self._flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._ready.clear()
+
+                while self._records:
+                    batch = [self._records.popleft() for _ in range(min(self._batch_size, len(self._records)))]
+                    if self._dropped:
+                        dropped, self._dropped = self._dropped, 0
+                        batch.append(DBLogWriter._make_record(
+                            "WARNING", "logging", f"DB log queue overflow: {dropped} log records dropped."
+                        ))
+                    connection = await self._write(connection, batch)
+
+                if self._closed:
+                    return
+        finally:
+            if connection is not None:
+                await connection.close()
+
+    async def _write(self, connection, batch):
+        try:
+            if connection is None or connection.is_closed():
+                connection = await asyncpg.connect(self._dsn)
+            await connection.copy_records_to_table(
+                'logs', schema_name='sql_scheduler', columns=_LOG_COLUMNS,
+                records=[tuple(record[column] for column in _LOG_COLUMNS) for record in batch]
+            )
+        except Exception as e:
+            # Avoid infinite loops if logging the error itself fails
+            print(f"CRITICAL: Failed to write {len(batch)} log(s) to database! Error: {e}")
+            for record in batch:
+                print(f"Original log message: {record['log_level']} - {record['logger_name']} - {record['log_text']}")
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+            return None
+        return connection
@@ -3,8 +3,13 @@ import os
 import sys
 import json
 import re
+from functools import lru_cache
+
+
+def set_locale():
+    """Ajusta o locale de datas para pt_BR (chamado na inicialização do serviço)."""
+    locale.setlocale(locale.LC_TIME, 'pt_br')
 
-locale.setlocale(locale.LC_TIME, 'pt_br')
 
 """
 ##----------------------------------------
@@ -31,8 +36,19 @@ def open_json() -> dict:
   "oracle_database": {
     "TSN": "tsnname",
     "INSTANT_CLIENT": "path",
+    "thin_mode": false,
     "user_name": "uname",
-    "user_pass": "pwd"
+    "user_pass": "pwd",
+    "pool": {
+      "size": 6,
+      "max_overflow": 2,
+      "recycle": 3600,
+      "pre_ping": true,
+      "timeout": 30,
+      "native": false,
+      "prewarm": true,
+      "async_size": 6
+    }
   },
   "postgres":{
     "hostname": "localhost",
@@ -40,6 +56,51 @@ def open_json() -> dict:
     "database": "postgres",
     "username": "postgres",
     "password": "postgres"
+  },
+  "logging": {
+    "queue_size": 10000,
+    "batch_size": 500,
+    "flush_interval": 2.0,
+    "overflow": "drop_oldest"
+  },
+  "export": {
+    "queue_depth": 2,
+    "sink_queue_depth": 4,
+    "write_buffer_bytes": 8388608,
+    "fetch_batch_bytes": 8388608,
+    "min_arraysize": 100,
+    "max_arraysize": 100000,
+    "typed_fetch": true,
+    "csv_date_format": null,
+    "csv_timestamp_format": null,
+    "checkpoint_rows": 1000000,
+    "checkpoint_seconds": 300
+  },
+  "scheduler": {
+    "max_workers": 6,
+    "max_oracle_queries": 6,
+    "process_workers": 4,
+    "runtime": "thread",
+    "async_max_jobs": 256,
+    "async_io_workers": 8,
+    "async_oracle": true
+  },
+  "reload": {
+    "poll_seconds": 5,
+    "listen": false,
+    "install_triggers": false
+  },
+  "leveling": {
+    "default_duration_seconds": 60,
+    "history_runs": 20,
+    "history_days": 14
+  },
+  "metrics": {
+    "persist_runs": true,
+    "textfile": "",
+    "textfile_interval": 60,
+    "http_port": 0,
+    "http_host": "0.0.0.0"
   }
 }"""
 
@@ -61,53 +122,89 @@ SQL check functions
 ##----------------------------------------
 """
 
+# Trechos de regex compartilhados pelo tokenizador e pelo classificador
+_SQL_SPACE = r"\s+|--[^\n]*|/\*.*?(?:\*/|\Z)"
+_SQL_QSTRING = r"[nN]?[qQ]'(?:\[.*?\]|\{.*?\}|\(.*?\)|<.*?>|(?P<delim>[^\s\[{(<']).*?(?P=delim))(?:'|\Z)"
+_SQL_STRING = r"[nN]?'(?:[^']|'')*(?:'|\Z)"
+_SQL_IDENT = r'"(?:[^"]|"")*(?:"|\Z)'
+_SQL_WORD = r"[^\W\d][\w$#]*"
+
+_READ_KEYWORDS = frozenset(('SELECT', 'WITH', 'SHOW', 'DESCRIBE', 'EXPLAIN'))
+_WRITE_KEYWORDS = frozenset((
+    'INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'ALTER',
+    'TRUNCATE', 'GRANT', 'REVOKE', 'MERGE'
+))
+
+# Tokenizador genérico: uma alternativa por tipo de token
+_SQL_TOKEN = re.compile(
+    rf"(?P<space>{_SQL_SPACE})|(?P<qstring>{_SQL_QSTRING})|(?P<string>{_SQL_STRING})"
+    rf"|(?P<ident>{_SQL_IDENT})|(?P<word>{_SQL_WORD})|(?P<other>.)",
+    re.DOTALL
+)
+
+# Classificador: '(' e comentários antes da primeira palavra...
+_SQL_HEAD = re.compile(rf"(?:{_SQL_SPACE}|\()*(?P<word>{_SQL_WORD})?", re.DOTALL)
+# ...e depois um único avanço sobre tudo o que não pode alterar dados. O
+# casamento para no primeiro ';' ou palavra de escrita fora de literais,
+# comentários e identificadores entre aspas (ou no fim do script).
+_SQL_READ_BODY = re.compile(
+    rf"(?:{_SQL_SPACE}|{_SQL_QSTRING}|{_SQL_STRING}|{_SQL_IDENT}"
+    rf"|(?!(?:{'|'.join(sorted(_WRITE_KEYWORDS))})(?![\w$#])){_SQL_WORD}|\d[\w.]*|[^;\w\s'\"])*",
+    re.DOTALL | re.IGNORECASE
+)
+
+
+def iter_sql_tokens(sql):
+    """
+    Quebra o script em tokens `(tipo, texto)`, ignorando espaços e
+    comentários. Tipos: 'word' (palavra-chave ou identificador sem aspas),
+    'string' (literal, inclusive q'[...]' do Oracle), 'ident' (identificador
+    entre aspas duplas) e 'other' (pontuação e operadores).
+    """
+    for match in _SQL_TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind == 'space':
+            continue
+        yield ('string' if kind == 'qstring' else kind), match.group()
+
+
+@lru_cache(maxsize=1024)
 def is_select_query(sql):
     """
     Verifica se a consulta SQL é apenas para leitura (DQL).
+
+    Uma passada linear: a primeira palavra precisa ser de leitura (SELECT,
+    WITH, ...), nenhuma palavra fora de literais, comentários e
+    identificadores entre aspas pode ser de escrita, e só é aceito um
+    comando (';' apenas no final). O resultado fica em cache pelo próprio
+    texto do script, que se repete a cada execução do job.
+    """
+    head = _SQL_HEAD.match(sql)
+    if head.group('word') is None or head.group('word').upper() not in _READ_KEYWORDS:
+        return False
+
+    body_end = _SQL_READ_BODY.match(sql, head.end()).end()
+    # Parou em uma palavra de escrita ou em ';': aceito só se for o fim do
+    # comando. O resto é conferido token a token (uma regex com '\s+' dentro
+    # de '(...)*\Z' retrocede exponencialmente em '; <espaços> texto')
+    for match in _SQL_TOKEN.finditer(sql, body_end):
+        if match.lastgroup != 'space' and match.group() != ';':
+            return False
+    return True
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """
+    Forma canônica do script para comparar consultas: sem comentários,
+    tokens separados por um espaço, palavras sem aspas em maiúsculas e sem
+    ';' final. Literais e identificadores entre aspas ficam como estão.
+    Usada para detectar jobs com o mesmo SQL.
     """
-    # Remove comentários e normaliza espaços em branco
-    normalized_sql = re.sub(r'--.*?\n|/\*.*?\*/', '', sql, flags=re.DOTALL)
-    normalized_sql = re.sub(r'\s+', ' ', normalized_sql).strip().upper()
-    
-    # Verifica se a consulta começa com palavras-chave de leitura
-    allowed_patterns = [
-        r'^SELECT\s+',
-        r'^WITH\s+',
-        r'^SHOW\s+',
-        r'^DESCRIBE\s+',
-        r'^EXPLAIN\s+'
-    ]
-    
-    # Verifica se a consulta é apenas de leitura
-    is_read_only = any(re.match(pattern, normalized_sql) for pattern in allowed_patterns)
-    
-    # Verifica se não contém palavras-chave de modificação de dados
-    forbidden_patterns = [
-        r'\s+INSERT\s+',
-        r'\s+UPDATE\s+', 
-        r'\s+DELETE\s+',
-        r'\s+DROP\s+',
-        r'\s+CREATE\s+',
-        r'\s+ALTER\s+',
-        r'\s+TRUNCATE\s+',
-        r'\s+GRANT\s+',
-        r'\s+REVOKE\s+',
-        r'\s+MERGE\s+',
-        r'^INSERT\s+', 
-        r'^UPDATE\s+', 
-        r'^DELETE\s+',
-        r'^DROP\s+',
-        r'^CREATE\s+',
-        r'^ALTER\s+',
-        r'^TRUNCATE\s+',
-        r'^GRANT\s+',
-        r'^REVOKE\s+',
-        r'^MERGE\s+'
-    ]
-    
-    contains_forbidden = any(re.search(pattern, normalized_sql) for pattern in forbidden_patterns)
-    
-    return is_read_only and not contains_forbidden
+    tokens = [value.upper() if kind == 'word' else value for kind, value in iter_sql_tokens(sql)]
+    while tokens and tokens[-1] == ';':
+        tokens.pop()
+    return ' '.join(tokens)
 
 
 if __name__ == '__main__':
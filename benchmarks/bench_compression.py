@@ -0,0 +1,94 @@
+"""
+Benchmark do CSV comprimido x CSV puro.
+
+Gera linhas sintéticas, simula a latência de cada `fetchmany()` e mede
+vazão e tamanho do arquivo para cada combinação de compressão/nível,
+usando o mesmo `CsvExporter` do `execute_job`.
+
+Uso:
+    python benchmarks/bench_compression.py --rows 500000 --batch 15000 --fetch-latency 0.02
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exporters import CsvExporter, zstandard  # noqa: E402
+
+
+def make_batches(rows, batch_size, seed=42):
+    """Gera blocos de linhas parecidos com um relatório típico (texto, números e datas)."""
+    rnd = random.Random(seed)
+    base = datetime.datetime(2024, 1, 1)
+    cities = ['SAO PAULO', 'RIO DE JANEIRO', 'BELO HORIZONTE', 'CURITIBA', 'PORTO ALEGRE']
+    batches = []
+    for start in range(0, rows, batch_size):
+        batches.append([
+            (
+                i,
+                f"CLIENTE {rnd.randint(1, 50000):06d}",
+                rnd.choice(cities),
+                round(rnd.uniform(0, 100000), 2),
+                (base + datetime.timedelta(minutes=i)).strftime('%d/%m/%Y'),
+                rnd.randint(0, 10 ** 9),
+            )
+            for i in range(start, min(start + batch_size, rows))
+        ])
+    return batches
+
+
+def run_case(batches, compression, level, fetch_latency, directory):
+    exporter_path = os.path.join(directory, 'bench' + CsvExporter.extension_for(compression))
+    exporter = CsvExporter(exporter_path, compression, level)
+
+    started = time.perf_counter()
+    exporter.open(['id', 'name', 'city', 'amount', 'date', 'code'])
+    try:
+        for batch in batches:
+            if fetch_latency:
+                time.sleep(fetch_latency)  # simula a ida e volta do fetchmany()
+            exporter.write_batch(batch)
+    finally:
+        exporter.close()
+    elapsed = time.perf_counter() - started
+
+    size = os.path.getsize(exporter_path)
+    os.remove(exporter_path)
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--batch', type=int, default=15000)
+    parser.add_argument('--fetch-latency', type=float, default=0.0, help='segundos por fetchmany() simulado')
+    args = parser.parse_args()
+
+    cases = [(None, None), ('gzip', 1), ('gzip', 6)]
+    if zstandard is not None:
+        cases += [('zstd', 1), ('zstd', 3), ('zstd', 9)]
+    else:
+        print("zstandard not installed: skipping zstd cases")
+
+    batches = make_batches(args.rows, args.batch)
+    print(f"rows={args.rows} batch={args.batch} fetch_latency={args.fetch_latency}s")
+    print(f"{'compression':<12}{'level':>6}{'seconds':>10}{'rows/s':>12}{'MB':>10}{'ratio':>8}")
+
+    baseline_size = None
+    with tempfile.TemporaryDirectory() as directory:
+        for compression, level in cases:
+            elapsed, size = run_case(batches, compression, level, args.fetch_latency, directory)
+            baseline_size = baseline_size or size
+            print(
+                f"{compression or 'none':<12}{level if level is not None else '-':>6}"
+                f"{elapsed:>10.2f}{args.rows / elapsed:>12,.0f}{size / 1e6:>10.2f}{baseline_size / size:>8.2f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
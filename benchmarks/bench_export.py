@@ -0,0 +1,296 @@
+"""
+Benchmark de ponta a ponta da exportação, sem Oracle nem PostgreSQL.
+
+Um SQLite com linhas sintéticas faz o papel do Oracle (com `arraysize` e
+latência por `fetchmany()` configuráveis) e outro SQLite faz o papel do
+PostgreSQL (jobs, logs e `job_runs`), ligados ao serviço com
+`cfg.override()`. Os jobs são carregados com `schedule_job()`, disparados
+pelo `RuleScheduler` e executados pelo `execute_job` real, com o mesmo
+executor, exportadores e métricas do serviço.
+
+O `arraysize` de cada caso vira o override do job (`fetch_arraysize`);
+com `auto` vale a escolha adaptativa do `fetch_tuning`.
+
+Cada combinação de arraysize x workers x formato roda em um processo novo
+(pico de memória isolado) e mostra linhas/s, MB/s, pico de RSS e a latência
+de despacho (`run_pending`) e de fila até o job começar. Com `--json` os
+resultados são salvos para comparar uma rodada com a outra.
+
+Uso:
+    python benchmarks/bench_export.py --rows 200000 --jobs 4 --arraysize auto 1000 15000 --workers 2 6 --formats csv parquet
+    python benchmarks/bench_export.py --columns int text:40 num date --fetch-latency 0.005 --json resultado.json
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+SOURCE_TABLE = 'bench_rows'
+
+
+"""
+##----------------------------------------
+Origem sintética (no lugar do Oracle)
+##----------------------------------------
+"""
+
+
+class _SourceCursor(sqlite3.Cursor):
+    """Cursor com uma espera fixa a cada `fetchmany()` (ida e volta ao banco)."""
+
+    fetch_latency = 0.0
+
+    def fetchmany(self, size=None):
+        if self.fetch_latency:
+            time.sleep(self.fetch_latency)
+        return super().fetchmany(self.arraysize if size is None else size)
+
+
+class _SourceConnection(sqlite3.Connection):
+
+    def cursor(self, factory=_SourceCursor):
+        return super().cursor(factory)
+
+
+def parse_columns(specs):
+    """'int', 'num', 'date' ou 'text:N' (N = largura) => lista de (tipo, largura)."""
+    columns = []
+    for spec in specs:
+        kind, _, width = spec.partition(':')
+        if kind not in ('int', 'num', 'text', 'date'):
+            raise SystemExit(f"Unknown column type '{kind}'. Expected int, num, text:N or date.")
+        columns.append((kind, int(width or 20)))
+    return columns
+
+
+def build_source(path, rows, columns, seed=42):
+    """Cria a tabela de origem com `rows` linhas sintéticas."""
+    rnd = random.Random(seed)
+    base = datetime.datetime(2024, 1, 1)
+    alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ '
+
+    def value(kind, width, i):
+        if kind == 'int':
+            return rnd.randint(0, 10 ** 9)
+        if kind == 'num':
+            return round(rnd.uniform(0, 100000), 2)
+        if kind == 'date':
+            return (base + datetime.timedelta(minutes=i)).isoformat(sep=' ')
+        return ''.join(rnd.choice(alphabet) for _ in range(rnd.randint(width // 2, width)))
+
+    names = [f'c{i}_{kind}' for i, (kind, _) in enumerate(columns)]
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"CREATE TABLE {SOURCE_TABLE} (id INTEGER PRIMARY KEY, {', '.join(names)})")
+        placeholders = ', '.join('?' * (len(columns) + 1))
+        for start in range(0, rows, 10000):
+            conn.executemany(
+                f"INSERT INTO {SOURCE_TABLE} VALUES ({placeholders})",
+                [(i, *(value(kind, width, i) for kind, width in columns)) for i in range(start, min(start + 10000, rows))]
+            )
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo, em MB (None se não houver como medir)."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+"""
+##----------------------------------------
+Um caso (roda em um processo novo)
+##----------------------------------------
+"""
+
+
+def run_case(case):
+    import logging
+    from sqlalchemy import create_engine, event, func, select
+    from sqlalchemy.orm import Session
+
+    logging.getLogger().setLevel(case['log_level'])
+
+    from config import cfg
+    from models import Base, Weekday, JobHE, JobDE, JobRun
+
+    workdir = case['workdir']
+    _SourceCursor.fetch_latency = case['fetch_latency']
+
+    oracle_engine = create_engine(
+        'sqlite://',
+        creator=lambda: sqlite3.connect(case['source'], factory=_SourceConnection, check_same_thread=False),
+        pool_size=case['workers']
+    )
+
+    catalog_path = os.path.join(workdir, 'catalog.db')
+    scheduler_path = os.path.join(workdir, 'sql_scheduler.db')
+    postgres_engine = create_engine(f"sqlite:///{catalog_path}", connect_args={'timeout': 60, 'check_same_thread': False})
+
+    @event.listens_for(postgres_engine, 'connect')
+    def attach_schema(dbapi_connection, connection_record):
+        dbapi_connection.execute(f"ATTACH DATABASE '{scheduler_path}' AS sql_scheduler")
+
+    cfg.override(
+        parameters={
+            'scheduler': {'max_workers': case['workers'], 'max_oracle_queries': case['workers']},
+            'export': {'queue_depth': case['queue_depth']},
+            'logging': {'flush_interval': 0.5},
+            'metrics': {'persist_runs': True},
+        },
+        postgres_engine=postgres_engine,
+        oracle_engine=oracle_engine
+    )
+
+    import scheduler
+    from logging_config import shutdown_logging
+
+    Base.metadata.create_all(postgres_engine)
+    out_dir = os.path.join(workdir, 'out')
+    with Session(postgres_engine) as session:
+        for day, number in scheduler.DAY_MAP.items():
+            session.add(Weekday(job_day=day, day_number=number + 1))
+        schedule_id = 0
+        for job_id in range(1, case['jobs'] + 1):
+            # SQL diferente por job: sem isso o single-flight junta tudo em uma consulta
+            session.add(JobHE(
+                job_id=job_id, job_name=f'bench_{job_id}', job_status='Y',
+                export_path=out_dir, export_name=f'bench_{job_id}',
+                sql_script=f"SELECT * FROM {SOURCE_TABLE} WHERE {job_id} = {job_id}",
+                export_format=case['format'], export_compression=case['compression'],
+                # 'auto' => arraysize escolhido pelo fetch_tuning (estimativa + aprendizado)
+                fetch_arraysize=None if case['arraysize'] == 'auto' else case['arraysize']
+            ))
+            for day in scheduler.DAY_MAP:
+                schedule_id += 1
+                session.add(JobDE(
+                    schedule_id=schedule_id, job_id=job_id, job_day=day,
+                    start_hour='00:00', end_hour='23:59', job_iter='1'
+                ))
+        session.commit()
+
+    scheduler.schedule_job()
+    fire_at = min(scheduler.engine.get(key).next_fire(datetime.datetime.now()) for key in scheduler.engine.keys() if isinstance(key, tuple))
+
+    started = time.perf_counter()
+    dispatched = scheduler.engine.run_pending(now=fire_at)
+    dispatch_ms = (time.perf_counter() - started) * 1000
+    executor = scheduler.get_executor()
+    executor.shutdown(wait=True)
+    elapsed = time.perf_counter() - started
+    stats = executor.stats()
+    shutdown_logging()
+
+    with Session(postgres_engine) as session:
+        rows, written, failed = session.execute(select(
+            func.coalesce(func.sum(JobRun.rows), 0),
+            func.coalesce(func.sum(JobRun.bytes_written), 0),
+            func.count().filter(JobRun.status != 'success')
+        )).one()
+
+    return {
+        'format': case['format'] + (f"+{case['compression']}" if case['compression'] else ''),
+        'arraysize': case['arraysize'],
+        'workers': case['workers'],
+        'jobs': dispatched,
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_s': round(rows / elapsed),
+        'mb_per_s': round(written / 2 ** 20 / elapsed, 2),
+        'peak_rss_mb': None if peak_rss_mb() is None else round(peak_rss_mb(), 1),
+        'dispatch_ms': round(dispatch_ms, 2),
+        'queue_avg_ms': stats['queue_latency_avg_ms'],
+        'queue_max_ms': stats['queue_latency_max_ms'],
+        'failed': failed,
+    }
+
+
+"""
+##----------------------------------------
+Orquestração
+##----------------------------------------
+"""
+
+
+def spawn_case(case):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--case', json.dumps(case)],
+        cwd=case['workdir'], env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"case {case} failed:\n{proc.stderr.strip()}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='linhas por job')
+    parser.add_argument('--columns', nargs='+', default=['int', 'text:30', 'text:12', 'num', 'date', 'int'])
+    parser.add_argument('--jobs', type=int, default=4, help='jobs disparados no mesmo instante')
+    parser.add_argument('--arraysize', type=lambda v: v if v == 'auto' else int(v), nargs='+', default=['auto'],
+                        help="arraysize fixo por job ou 'auto'")
+    parser.add_argument('--workers', type=int, nargs='+', default=[6])
+    parser.add_argument('--formats', nargs='+', default=['csv'], help="csv, parquet, arrow; compressão com '+', ex.: csv+zstd")
+    parser.add_argument('--fetch-latency', type=float, default=0.0, help='segundos por fetchmany() simulado')
+    parser.add_argument('--queue-depth', type=int, default=2)
+    parser.add_argument('--log-level', default='WARNING', help='nível do log no console durante os casos')
+    parser.add_argument('--json', help='arquivo para salvar os resultados')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    columns = parse_columns(args.columns)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source.db')
+        build_source(source, args.rows, columns)
+        print(f"rows/job={args.rows} jobs={args.jobs} columns={' '.join(args.columns)} fetch_latency={args.fetch_latency}s")
+
+        header = ['format', 'arraysize', 'workers', 'jobs', 'rows', 'seconds', 'rows_per_s', 'mb_per_s',
+                  'peak_rss_mb', 'dispatch_ms', 'queue_avg_ms', 'queue_max_ms', 'failed']
+        print(''.join(f"{name:>13}" for name in header))
+
+        case_number = 0
+        for export_format in args.formats:
+            fmt, _, compression = export_format.partition('+')
+            for arraysize in args.arraysize:
+                for workers in args.workers:
+                    case_number += 1
+                    workdir = os.path.join(directory, f'case{case_number}')
+                    os.makedirs(workdir)
+                    result = spawn_case({
+                        'source': source, 'workdir': workdir, 'format': fmt, 'compression': compression or None,
+                        'arraysize': arraysize, 'workers': workers, 'jobs': args.jobs,
+                        'fetch_latency': args.fetch_latency, 'queue_depth': args.queue_depth,
+                        'log_level': args.log_level,
+                    })
+                    results.append(result)
+                    print(''.join(f"{'-' if result[name] is None else result[name]:>13}" for name in header))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump({'args': vars(args), 'results': results}, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark do tempo de importação dos módulos do serviço.
+
+Importa cada módulo em um processo Python novo, a partir de um diretório
+temporário vazio (sem `datafile.json`), e mede o tempo total da importação.
+Falha se a importação tiver efeitos colaterais (ler/criar o `datafile.json`,
+sair do processo) ou passar do limite `--max-ms`, para pegar regressões de
+inicialização.
+
+Uso:
+    python benchmarks/bench_import.py --runs 5 --max-ms 1500
+    python benchmarks/bench_import.py --importtime scheduler   # detalhe por módulo
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['auxils', 'models', 'config', 'logging_config', 'recurrence', 'exporters', 'scheduler']
+
+
+def time_import(module, workdir):
+    """Tempo (ms) de `import module` em um processo novo; levanta RuntimeError se falhar."""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, PYTHONDONTWRITEBYTECODE='1')
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    proc = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed (exit {proc.returncode}):\n{proc.stdout}{proc.stderr}")
+    if os.path.exists(os.path.join(workdir, 'datafile.json')):
+        raise RuntimeError(f"import {module} touched datafile.json (configuration read at import time)")
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+def show_importtime(module, workdir, top=15):
+    """Mostra os módulos mais lentos segundo `python -X importtime`."""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                          cwd=workdir, env=env, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len('import time:'):].split('|', 2)]
+        rows.append((int(cumulative_us), int(self_us), name))
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>10.1f} ms  {self_us / 1000:>8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None, help='falha se a mediana de algum módulo passar disso')
+    parser.add_argument('--importtime', metavar='MODULE', help='mostra o detalhamento de -X importtime do módulo')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.importtime:
+            show_importtime(args.importtime, workdir)
+            return 0
+
+        failed = False
+        print(f"{'module':<16}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+        started = time.perf_counter()
+        for module in MODULES:
+            try:
+                samples = [time_import(module, workdir) for _ in range(args.runs)]
+            except RuntimeError as e:
+                print(f"{module:<16}  FAILED: {e}")
+                failed = True
+                continue
+            median = statistics.median(samples)
+            flag = ''
+            if args.max_ms is not None and median > args.max_ms:
+                flag = '  <-- over limit'
+                failed = True
+            print(f"{module:<16}{median:>12.1f}{min(samples):>10.1f}{max(samples):>10.1f}{flag}")
+        print(f"total wall time: {time.perf_counter() - started:.1f}s")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
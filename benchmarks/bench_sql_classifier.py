@@ -0,0 +1,115 @@
+"""
+Benchmark do `is_select_query`: varredura única x versão antiga por regex.
+
+Gera relatórios sintéticos com milhares de linhas (CTEs, comentários,
+literais e identificadores entre aspas) e mede o tempo por chamada da
+versão antiga, da nova sem cache (primeira execução do job) e da nova com
+cache (execuções seguintes). Também lista os casos em que a versão antiga
+erra a classificação.
+
+Uso:
+    python benchmarks/bench_sql_classifier.py --lines 5000 --repeat 20
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auxils import is_select_query  # noqa: E402
+
+
+def legacy_is_select_query(sql):
+    """Cópia da implementação anterior, apenas para comparação."""
+    normalized_sql = re.sub(r'--.*?\n|/\*.*?\*/', '', sql, flags=re.DOTALL)
+    normalized_sql = re.sub(r'\s+', ' ', normalized_sql).strip().upper()
+
+    allowed_patterns = [r'^SELECT\s+', r'^WITH\s+', r'^SHOW\s+', r'^DESCRIBE\s+', r'^EXPLAIN\s+']
+    is_read_only = any(re.match(pattern, normalized_sql) for pattern in allowed_patterns)
+
+    keywords = ['INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'ALTER', 'TRUNCATE', 'GRANT', 'REVOKE', 'MERGE']
+    forbidden_patterns = [rf'\s+{kw}\s+' for kw in keywords] + [rf'^{kw}\s+' for kw in keywords]
+    contains_forbidden = any(re.search(pattern, normalized_sql) for pattern in forbidden_patterns)
+
+    return is_read_only and not contains_forbidden
+
+
+def make_report(lines, variant=0):
+    """Relatório parecido com os reais: uma CTE por bloco e um SELECT final grande."""
+    parts = [f"-- Relatório sintético {variant}\nWITH"]
+    ctes = max(1, lines // 12)
+    for i in range(ctes):
+        parts.append(
+            f"""  /* bloco {i}: vendas por filial */
+  cte_{i} AS (
+    SELECT v.filial_id,
+           v.produto_id,
+           SUM(v.valor) AS total_{i},
+           "Data Venda",
+           CASE WHEN v.status = 'DELETED' THEN 0 ELSE 1 END AS ativo -- status textual
+      FROM vendas_{i % 7} v
+     WHERE v.dt_venda >= TO_DATE('01/01/2024', 'DD/MM/YYYY')
+       AND v.obs NOT LIKE q'[%it's%]'
+     GROUP BY v.filial_id, v.produto_id, "Data Venda"
+  ){',' if i < ctes - 1 else ''}"""
+        )
+    parts.append("SELECT *\n  FROM cte_0\n ORDER BY 1")
+    return '\n'.join(parts)
+
+
+TRICKY_CASES = [
+    ("SELECT \"UPDATE DATE\" FROM t", True),
+    ("SELECT * FROM t WHERE status = 'DELETE ME'", True),
+    ("SELECT 1 FROM dual -- last line without newline DROP TABLE x", True),
+    ("/* comentário */ SELECT 1 FROM dual", True),
+    ("SELECT 1 FROM dual; DELETE FROM t", False),
+    ("SELECT\n*\nFROM t\nFOR UPDATE", False),
+    ("(SELECT 1 FROM dual) UNION (SELECT 2 FROM dual)", True),
+]
+
+
+def time_calls(func, scripts, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for sql in scripts:
+            func(sql)
+    return (time.perf_counter() - started) / (repeat * len(scripts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=5000, help='linhas aproximadas por relatório')
+    parser.add_argument('--scripts', type=int, default=5, help='relatórios distintos')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    scripts = [make_report(args.lines, variant) for variant in range(args.scripts)]
+    for sql in scripts:
+        assert legacy_is_select_query(sql) == is_select_query(sql), "classifiers disagree on a plain report"
+
+    uncached = is_select_query.__wrapped__
+    legacy = time_calls(legacy_is_select_query, scripts, args.repeat)
+    cold = time_calls(uncached, scripts, args.repeat)
+    is_select_query.cache_clear()
+    for sql in scripts:
+        is_select_query(sql)  # primeira execução de cada job preenche o cache
+    warm = time_calls(is_select_query, scripts, args.repeat)
+
+    size_kb = sum(len(sql) for sql in scripts) / len(scripts) / 1024
+    print(f"scripts={args.scripts} lines~{args.lines} size~{size_kb:.0f}KiB repeat={args.repeat}")
+    print(f"{'classifier':<22}{'ms/call':>10}{'speedup':>10}")
+    for name, seconds in (('legacy regex', legacy), ('single pass', cold), ('single pass (cached)', warm)):
+        print(f"{name:<22}{seconds * 1000:>10.3f}{legacy / seconds:>10.1f}x")
+
+    print("\nclassification differences (expected verdict / legacy / single pass):")
+    for sql, expected in TRICKY_CASES:
+        old, new = legacy_is_select_query(sql), is_select_query(sql)
+        flag = '' if old == expected else '  <- legacy wrong'
+        print(f"  {expected!s:<6}{old!s:<7}{new!s:<7}{sql!r}{flag}")
+        assert new == expected, f"single pass misclassified {sql!r}"
+
+
+if __name__ == '__main__':
+    main()
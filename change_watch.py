@@ -0,0 +1,156 @@
+"""
+##----------------------------------------
+Detecção de mudanças nos jobs
+##----------------------------------------
+
+Em vez de esperar o reload completo, o scheduler recarrega só os jobs que
+mudaram, poucos segundos depois da mudança:
+
+- polling: uma consulta agregada por job (status, `jobs_he.updated_at`,
+  quantidade e maior `updated_at` das linhas de `jobs_de`) a cada
+  `reload.poll_seconds`; qualquer diferença em relação à consulta anterior
+  (inclusive jobs novos e apagados) marca o job como alterado;
+- LISTEN/NOTIFY (`reload.listen`): uma conexão dedicada escuta o canal
+  `CHANNEL` e os job_ids notificados são recarregados no próximo ciclo
+  (a cada segundo); o polling continua como rede de segurança.
+
+`updated_at` precisa mudar quando a configuração muda. Os triggers de
+`TRIGGERS_SQL` (instalados com `reload.install_triggers`) fazem isso no
+PostgreSQL e também emitem o NOTIFY; mudanças só nas colunas que o próprio
+serviço grava (last_exec, watermark, arraysize aprendido, resultado da sonda
+de frescor) são ignoradas.
+Sem os triggers, quem edita os jobs deve atualizar `updated_at`.
+"""
+import select
+import threading
+import time
+
+CHANNEL = 'sql_scheduler_jobs'
+
+TRIGGERS_SQL = f"""
+CREATE OR REPLACE FUNCTION sql_scheduler.notify_job_change() RETURNS trigger AS $$
+DECLARE
+    runtime_columns text[] := ARRAY['last_exec', 'watermark_value', 'fetch_arraysize_learned', 'freshness_value', 'updated_at'];
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('{CHANNEL}', OLD.job_id::text);
+        RETURN OLD;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        IF (to_jsonb(NEW) - runtime_columns) = (to_jsonb(OLD) - runtime_columns) THEN
+            RETURN NEW;
+        END IF;
+        IF OLD.job_id <> NEW.job_id THEN
+            PERFORM pg_notify('{CHANNEL}', OLD.job_id::text);
+        END IF;
+    END IF;
+    NEW.updated_at := now();
+    PERFORM pg_notify('{CHANNEL}', NEW.job_id::text);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS jobs_he_changed ON sql_scheduler.jobs_he;
+CREATE TRIGGER jobs_he_changed BEFORE INSERT OR UPDATE OR DELETE ON sql_scheduler.jobs_he
+    FOR EACH ROW EXECUTE FUNCTION sql_scheduler.notify_job_change();
+
+DROP TRIGGER IF EXISTS jobs_de_changed ON sql_scheduler.jobs_de;
+CREATE TRIGGER jobs_de_changed BEFORE INSERT OR UPDATE OR DELETE ON sql_scheduler.jobs_de
+    FOR EACH ROW EXECUTE FUNCTION sql_scheduler.notify_job_change();
+"""
+
+
+class ChangeWatcher:
+    """
+    `check()` roda no loop do scheduler: junta os job_ids notificados e, a
+    cada `poll_seconds`, os que mudaram no `snapshot()` ({job_id: assinatura},
+    ou None se a consulta falhar), e chama `on_change(job_ids)` com eles.
+    """
+
+    def __init__(self, snapshot, on_change, poll_seconds=5.0):
+        self._snapshot = snapshot
+        self._on_change = on_change
+        self.poll_seconds = poll_seconds
+        self._last = None
+        self._last_poll = None
+        self._notified = set()
+        self._lock = threading.Lock()
+
+    def notify(self, job_id):
+        """Chamado pelo listener (outra thread) para cada NOTIFY recebido."""
+        with self._lock:
+            self._notified.add(job_id)
+
+    def prime(self):
+        """Guarda a situação atual como referência (antes da carga inicial dos jobs)."""
+        self._last = self._snapshot()
+        self._last_poll = time.monotonic()
+
+    def check(self):
+        with self._lock:
+            changed, self._notified = self._notified, set()
+
+        if self._last_poll is None or time.monotonic() - self._last_poll >= self.poll_seconds:
+            self._last_poll = time.monotonic()
+            current = self._snapshot()
+            if current is not None:
+                if self._last is not None:
+                    changed.update(
+                        job_id for job_id in self._last.keys() | current.keys()
+                        if self._last.get(job_id) != current.get(job_id)
+                    )
+                self._last = current
+
+        if changed:
+            self._on_change(sorted(changed))
+        return changed
+
+
+class ChangeListener:
+    """
+    LISTEN em uma conexão psycopg2 dedicada (fora do pool), em uma thread
+    daemon. Cada payload (job_id) vai para `watcher.notify`. Se a conexão
+    cair, tenta de novo a cada `retry_seconds`; enquanto isso o polling cobre.
+    """
+
+    def __init__(self, connect, watcher, on_error=None, retry_seconds=30.0):
+        self._connect = connect
+        self._watcher = watcher
+        self._on_error = on_error
+        self._retry_seconds = retry_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='job-change-listener', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                while not self._stop.is_set():
+                    if select.select([connection], [], [], 5.0) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        payload = connection.notifies.pop(0).payload
+                        if payload.isdigit():
+                            self._watcher.notify(int(payload))
+            except Exception as e:
+                if self._on_error is not None:
+                    self._on_error(e)
+                self._stop.wait(self._retry_seconds)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
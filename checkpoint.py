@@ -0,0 +1,199 @@
+"""
+##----------------------------------------
+Checkpoints das exportações (retomada)
+##----------------------------------------
+
+Toda exportação em arquivo grava em `<arquivo>.partial` e só no final
+substitui o arquivo definitivo, com um rename atômico: quem lê nunca vê um
+arquivo pela metade e, se a execução falhar, o arquivo anterior continua lá.
+
+Jobs com `resume_key` (coluna única e não nula do resultado, ex.: a chave
+primária) também gravam checkpoints em `<arquivo>.checkpoint.json` a cada
+`export.checkpoint_rows` linhas ou `export.checkpoint_seconds` segundos:
+linhas gravadas, última chave e tamanho do arquivo parcial nesse ponto. A
+consulta roda ordenada pela chave:
+
+    SELECT * FROM (sql) resume_src ORDER BY resume_src.chave
+
+Se a execução falhar, a seguinte retoma do último checkpoint: o parcial é
+truncado no tamanho salvo (o que foi escrito depois é descartado) e a
+consulta continua com `WHERE resume_src.chave > :resume_key`.
+
+Só CSV é retomável. Com gzip/zstd cada checkpoint fecha um membro/frame, e
+membros concatenados continuam formando um arquivo válido. O checkpoint só
+vale para o mesmo SQL, formato, compressão e chave; se algo mudou, a
+exportação recomeça do zero.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+import hashlib
+import json
+import os
+import time
+
+from auxils import normalize_sql
+
+PARTIAL_SUFFIX = '.partial'
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+
+
+def partial_path(path):
+    return path + PARTIAL_SUFFIX
+
+
+def checkpoint_path(path):
+    return path + CHECKPOINT_SUFFIX
+
+
+def signature_for(sql, export_format, compression, key_column):
+    """Identifica a exportação: um checkpoint de outra consulta ou formato não é retomado."""
+    source = '|'.join((normalize_sql(sql), export_format or 'csv', compression or '', key_column.upper()))
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+
+
+def resume_sql(sql, key_column, resuming):
+    """SQL do job ordenado pela chave; na retomada, só as linhas depois de :resume_key."""
+    condition = f" WHERE resume_src.{key_column} > :resume_key" if resuming else ''
+    return f"SELECT * FROM ({sql}) resume_src{condition} ORDER BY resume_src.{key_column}"
+
+
+def _encode_key(value):
+    if isinstance(value, datetime):
+        return {'type': 'datetime', 'value': value.isoformat()}
+    if isinstance(value, date):
+        return {'type': 'date', 'value': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'type': 'decimal', 'value': str(value)}
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return {'type': 'str', 'value': str(value)}
+    return {'type': type(value).__name__, 'value': value}
+
+
+_KEY_DECODERS = {
+    'datetime': datetime.fromisoformat,
+    'date': date.fromisoformat,
+    'decimal': Decimal,
+    'int': int,
+    'float': float,
+    'str': str,
+}
+
+
+def _decode_key(encoded):
+    return _KEY_DECODERS[encoded['type']](encoded['value'])
+
+
+class Checkpoint:
+    """Progresso salvo de uma exportação retomável."""
+
+    __slots__ = ('signature', 'rows', 'last_key', 'offset')
+
+    def __init__(self, signature, rows=0, last_key=None, offset=0):
+        self.signature = signature
+        self.rows = rows          # linhas já gravadas no parcial
+        self.last_key = last_key  # chave da última linha gravada
+        self.offset = offset      # tamanho do parcial (bytes) no checkpoint
+
+    @classmethod
+    def load(cls, path, signature):
+        """
+        Checkpoint do arquivo `path` se ele puder ser retomado (mesma
+        assinatura e parcial com pelo menos `offset` bytes); senão None.
+        """
+        try:
+            with open(checkpoint_path(path), 'r', encoding='utf-8') as handle:
+                data = json.load(handle)
+            checkpoint = cls(data['signature'], data['rows'], _decode_key(data['last_key']), data['offset'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if checkpoint.signature != signature or checkpoint.rows <= 0:
+            return None
+        try:
+            if os.path.getsize(partial_path(path)) < checkpoint.offset:
+                return None
+        except OSError:
+            return None
+        return checkpoint
+
+    def save(self, path):
+        """Grava de forma atômica (um checkpoint nunca fica pela metade)."""
+        target = checkpoint_path(path)
+        temp_path = f"{target}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump({
+                'signature': self.signature,
+                'rows': self.rows,
+                'last_key': _encode_key(self.last_key),
+                'offset': self.offset,
+                'saved_at': datetime.now().isoformat(timespec='seconds'),
+            }, handle)
+        os.replace(temp_path, target)
+
+
+def discard(path):
+    """Remove o checkpoint do arquivo `path`, se houver."""
+    try:
+        os.remove(checkpoint_path(path))
+    except FileNotFoundError:
+        pass
+
+
+class CheckpointWriter:
+    """
+    Envolve o exportador CSV de um job retomável: depois de cada bloco
+    gravado, salva um checkpoint se passaram `every_rows` linhas ou
+    `every_seconds` segundos desde o anterior. Em uma falha na busca
+    (`abort()`), salva o progresso até o último bloco gravado.
+    """
+
+    def __init__(self, exporter, path, checkpoint, key_column, every_rows, every_seconds):
+        self.exporter = exporter
+        self.path = path
+        self.checkpoint = checkpoint
+        self.key_column = key_column
+        self.every_rows = every_rows
+        self.every_seconds = every_seconds
+        self._index = None
+        self._last_key = checkpoint.last_key
+        self._pending = 0
+        self._saved_at = time.monotonic()
+        self._failed = False
+
+    def open(self, columns, description=None):
+        upper_columns = [c.upper() for c in columns]
+        if self.key_column.upper() not in upper_columns:
+            raise ValueError(f"Resume key column '{self.key_column}' not found in query result")
+        self._index = upper_columns.index(self.key_column.upper())
+        self.exporter.open(columns, description)
+
+    def write_batch(self, rows):
+        try:
+            self.exporter.write_batch(rows)
+        except BaseException:
+            self._failed = True
+            raise
+        self._pending += len(rows)
+        self._last_key = rows[-1][self._index]
+        if self._pending >= self.every_rows or time.monotonic() - self._saved_at >= self.every_seconds:
+            self._save()
+
+    def _save(self):
+        self.checkpoint.offset = self.exporter.checkpoint()
+        self.checkpoint.rows += self._pending
+        self.checkpoint.last_key = self._last_key
+        self.checkpoint.save(self.path)
+        self._pending = 0
+        self._saved_at = time.monotonic()
+
+    def abort(self):
+        # Falha na busca: o que já foi gravado está íntegro e vira o ponto de retomada
+        if not self._failed and self._pending:
+            try:
+                self._save()
+            except Exception:
+                pass
+        if hasattr(self.exporter, 'abort'):
+            self.exporter.abort()
+
+    def close(self):
+        self.exporter.close()
@@ -1,16 +1,104 @@
 from sqlalchemy import event, create_engine, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, NullPool
 from urllib.parse import quote_plus
 from auxils import open_json
+from migrations import missing_schema
+from dependencies import missing_packages
+import fetch_tuning
+import fetch_converters
+from functools import cached_property
 import datetime
+import os
+import threading
+import time
 import oracledb
 
 
+# Roda uma vez por sessão nova (pools síncrono, nativo e assíncrono). NLS_NUMERIC_CHARACTERS
+# fixo: o CSV busca NUMBER como texto (ver fetch_converters) e, no modo thick, esse texto
+# segue o separador da sessão; um território pt_BR do cliente trocaria '1.5' por '1,5'
+NLS_SESSION_SQL = "ALTER SESSION SET NLS_DATE_FORMAT = 'DD/MM/YYYY' NLS_NUMERIC_CHARACTERS = '.,'"
+
+
+class PoolStats:
+    """Contadores do pool Oracle: conexões criadas, em uso e espera por conexão."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.checkouts = 0
+        self.checked_out = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._pending = threading.local()
+
+    def record_wait(self, waited):
+        """Guarda (por thread) a espera do checkout em andamento."""
+        self._pending.wait = waited
+
+    def take_wait(self):
+        waited = getattr(self._pending, 'wait', 0.0)
+        self._pending.wait = 0.0
+        return waited
+
+    def on_create(self):
+        with self._lock:
+            self.created += 1
+
+    def on_checkout(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            # Espera acima de 10 ms indica job aguardando conexão livre
+            if waited > 0.01:
+                self.waits += 1
+
+    def on_checkin(self):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'created': self.created,
+                'checkouts': self.checkouts,
+                'checked_out': self.checked_out,
+                'waits': self.waits,
+                'wait_seconds': round(self.wait_seconds, 3),
+                'max_wait_seconds': round(self.max_wait_seconds, 3),
+                'avg_wait_ms': round(1000 * self.wait_seconds / self.checkouts, 2) if self.checkouts else 0.0,
+            }
+
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool que mede quanto tempo cada checkout espera por uma conexão."""
+
+    stats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - started)
+
+
 class Config:
-    # Carrega as configurações dos bancos
-    _MAIN_PARAMETERS = open_json()
-    _ORACLE = _MAIN_PARAMETERS['oracle_database']
-    _POSTGRES = _MAIN_PARAMETERS['postgres']
+    """
+    Configurações e engines dos bancos.
+
+    Nada é lido nem conectado na importação: o `datafile.json` é carregado no
+    primeiro acesso a uma configuração e cada engine é criado no primeiro uso
+    (`postgres_engine` / `oracle_engine`). O teste de conectividade fica em
+    `check_connections()`, chamado explicitamente na inicialização do serviço.
+    """
+
+    # arraysize inicial de jobs sem override nem histórico (ver fetch_tuning)
     ARRAYSIZE = 15000
 
     # ============================================================================
@@ -18,30 +106,274 @@ class Config:
     # ============================================================================
 
     def __init__(self) -> None:
-        self._engine = self._get_postgres_engine()
-        self._oracle_engine = self._get_oracle_engine()
+        self.oracle_pool_stats = PoolStats()
+        self._native_pool = None
+        self._engine = None
+        self._oracle_engine = None
+        self._oracle_async_pool = None
+        self._lock = threading.Lock()
 
     # ============================================================================
-    # ============================== POSTGRESQL ==================================
+    # ============================== PARÂMETROS ==================================
     # ============================================================================
 
-    def get_postgres_session(self):
-        return sessionmaker(bind=self._engine)
+    @cached_property
+    def _MAIN_PARAMETERS(self):
+        # Carrega as configurações dos bancos
+        return open_json()
 
-    def _get_postgres_engine(self):
-        """Cria e retorna um engine SQLAlchemy para o PostgreSQL."""
-        database_url = self._get_postgres_url(self._POSTGRES)
-        engine = create_engine(database_url)
+    @property
+    def _ORACLE(self):
+        return self._MAIN_PARAMETERS['oracle_database']
+
+    @property
+    def _POSTGRES(self):
+        return self._MAIN_PARAMETERS['postgres']
+
+    @cached_property
+    def LOGGING(self):
+        # Parâmetros opcionais do log em banco (fila/lote); ausentes => padrões
+        return self._MAIN_PARAMETERS.get('logging', {})
+
+    @cached_property
+    def EXPORT(self):
+        # Pipeline de exportação: blocos em fila entre busca e escrita e buffer do arquivo
+        return self._MAIN_PARAMETERS.get('export', {})
+
+    @cached_property
+    def EXPORT_QUEUE_DEPTH(self):
+        return int(self.EXPORT.get('queue_depth', 2))
+
+    @cached_property
+    def SINK_QUEUE_DEPTH(self):
+        # Jobs com vários destinos: blocos que cada destino pode acumular antes de segurar os demais
+        return int(self.EXPORT.get('sink_queue_depth', 4))
+
+    @cached_property
+    def EXPORT_WRITE_BUFFER(self):
+        return int(self.EXPORT.get('write_buffer_bytes', 8 * 1024 * 1024))
+
+    @cached_property
+    def FETCH_BATCH_BYTES(self):
+        # Tamanho alvo (bytes em memória) de cada bloco buscado no Oracle; define o arraysize por job
+        return int(self.EXPORT.get('fetch_batch_bytes', 8 * 1024 * 1024))
+
+    @cached_property
+    def MIN_ARRAYSIZE(self):
+        return int(self.EXPORT.get('min_arraysize', 100))
+
+    @cached_property
+    def MAX_ARRAYSIZE(self):
+        return int(self.EXPORT.get('max_arraysize', 100000))
+
+    @cached_property
+    def CHECKPOINT_ROWS(self):
+        # Jobs retomáveis (resume_key): checkpoint a cada N linhas ou M segundos, o que vier antes
+        return int(self.EXPORT.get('checkpoint_rows', 1000000))
+
+    @cached_property
+    def CHECKPOINT_SECONDS(self):
+        return float(self.EXPORT.get('checkpoint_seconds', 300))
+
+    @cached_property
+    def CSV_CONVERSIONS(self):
+        # Conversores da busca para jobs CSV (ver fetch_converters); None => desligados
+        if not self.EXPORT.get('typed_fetch', True):
+            return None
+        return fetch_converters.CsvConversions(self.EXPORT.get('csv_date_format'), self.EXPORT.get('csv_timestamp_format'))
+
+    @cached_property
+    def SCHEDULER(self):
+        # Scheduler: número de workers (o pool Oracle acompanha por padrão)
+        return self._MAIN_PARAMETERS.get('scheduler', {})
+
+    @cached_property
+    def MAX_WORKERS(self):
+        return int(self.SCHEDULER.get('max_workers', 6))
+
+    @cached_property
+    def PROCESS_WORKERS(self):
+        # Processos para jobs com execution_mode = 'process' (padrão: núcleos da máquina)
+        return int(self.SCHEDULER.get('process_workers', os.cpu_count() or 1))
+
+    @cached_property
+    def MAX_ORACLE_QUERIES(self):
+        # Limite global de consultas Oracle simultâneas
+        return int(self.SCHEDULER.get('max_oracle_queries', self.MAX_WORKERS))
+
+    @cached_property
+    def RUNTIME(self):
+        # 'thread' (run_loop + JobExecutor) ou 'async' (ver async_runtime)
+        return (self.SCHEDULER.get('runtime') or 'thread').lower()
+
+    @cached_property
+    def ASYNC_MAX_JOBS(self):
+        # Runtime asyncio: execuções em andamento ao mesmo tempo (corrotinas, não threads)
+        return int(self.SCHEDULER.get('async_max_jobs', 256))
+
+    @cached_property
+    def ASYNC_IO_WORKERS(self):
+        # Runtime asyncio: threads que gravam os arquivos (abertura, blocos e fechamento)
+        return int(self.SCHEDULER.get('async_io_workers', 8))
+
+    @cached_property
+    def RELOAD(self):
+        # Recarga dos jobs alterados: intervalo do polling, LISTEN/NOTIFY e instalação dos triggers
+        return self._MAIN_PARAMETERS.get('reload', {})
+
+    @cached_property
+    def LEVELING(self):
+        # Nivelamento de carga: duração padrão (jobs sem histórico) e execuções usadas na média
+        return self._MAIN_PARAMETERS.get('leveling', {})
+
+    @cached_property
+    def METRICS(self):
+        # Métricas: arquivo para o textfile collector e/ou porta HTTP do /metrics (0 = desligado)
+        return self._MAIN_PARAMETERS.get('metrics', {})
+
+    @cached_property
+    def ORACLE_POOL(self):
+        # Pool Oracle: tamanho, overflow, recycle, pre-ping, timeout e pool nativo do oracledb
+        return self._ORACLE.get('pool', {})
+
+    # ============================================================================
+    # ============================== ENGINES =====================================
+    # ============================================================================
+
+    @property
+    def postgres_engine(self):
+        """Engine do PostgreSQL, criado no primeiro uso."""
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = self._get_postgres_engine()
+        return self._engine
+
+    @property
+    def oracle_engine(self):
+        """Engine do OracleDB, criado no primeiro uso (inicializa o Instant Client)."""
+        if self._oracle_engine is None:
+            with self._lock:
+                if self._oracle_engine is None:
+                    self._oracle_engine = self._get_oracle_engine()
+        return self._oracle_engine
+
+    @property
+    def oracle_async_pool(self):
+        """
+        Pool assíncrono do oracledb (`create_pool_async`), criado no primeiro
+        uso dentro do loop do runtime asyncio. None quando a API assíncrona
+        não está disponível: modo thick (Instant Client), `scheduler.async_oracle`
+        desligado ou engine Oracle substituído por outro banco (`override`).
+        """
+        if self._oracle_async_pool is None:
+            engine = self.oracle_engine  # define o modo thin/thick antes do teste abaixo
+            if (engine.dialect.name != 'oracle' or not oracledb.is_thin_mode()
+                    or not self.SCHEDULER.get('async_oracle', True)):
+                return None
+            async def _init_session(connection, requested_tag):
+                # Como no pool síncrono: o ALTER SESSION só roda quando a sessão é criada
+                cursor = connection.cursor()
+                await cursor.execute(NLS_SESSION_SQL)
+                cursor.close()
+
+            with self._lock:
+                if self._oracle_async_pool is None:
+                    pool_cfg = self.ORACLE_POOL
+                    self._oracle_async_pool = oracledb.create_pool_async(
+                        user=self._ORACLE['user_name'],
+                        password=self._ORACLE['user_pass'],
+                        dsn=self._ORACLE['TSN'],
+                        min=1,
+                        max=int(pool_cfg.get('async_size', self.MAX_ORACLE_QUERIES)),
+                        increment=1,
+                        session_callback=_init_session,
+                        max_lifetime_session=int(pool_cfg.get('recycle', 3600)),
+                        ping_interval=60 if pool_cfg.get('pre_ping', True) else -1,
+                    )
+        return self._oracle_async_pool
+
+    def override(self, parameters=None, postgres_engine=None, oracle_engine=None):
+        """
+        Substitui as configurações e/ou os engines antes do primeiro uso, para
+        rodar o serviço sem os bancos reais (ex.: `benchmarks/bench_export.py`
+        com SQLite no lugar do PostgreSQL e do Oracle). `parameters` tem o
+        mesmo formato do `datafile.json`; as configurações derivadas dele são
+        recalculadas no próximo acesso.
+        """
+        with self._lock:
+            if parameters is not None:
+                for name, attr in vars(type(self)).items():
+                    if isinstance(attr, cached_property):
+                        self.__dict__.pop(name, None)
+                self.__dict__['_MAIN_PARAMETERS'] = parameters
+            if postgres_engine is not None:
+                self._engine = postgres_engine
+            if oracle_engine is not None:
+                fetch_tuning.install(oracle_engine)
+                fetch_converters.install(oracle_engine)
+                self._oracle_engine = oracle_engine
+
+    def check_connections(self):
+        """
+        Testa a conexão com o PostgreSQL e o OracleDB. Retorna True se ambos
+        responderem; as falhas são impressas, como na inicialização original.
+        """
+        ok = True
 
-        # Testa a conexão
         try:
-            with engine.connect() as connection:
+            with self.postgres_engine.connect() as connection:
                 result = connection.execute(text("SELECT version()"))
                 print(f"Conectado com sucesso ao PostgreSQL: {result.fetchone()}")
-            return engine
+            missing = missing_schema(self.postgres_engine)
+            if missing:
+                print(f"Schema sql_scheduler desatualizado (faltam: {', '.join(missing)}). Rode: python migrations.py")
+                ok = False
+            elif not self._check_packages():
+                ok = False
         except Exception as e:
             print(f"Erro ao conectar ao PostgreSQL: {e}")
-            exit(1)
+            ok = False
+
+        tsn = self._ORACLE.get('TSN')
+        try:
+            with self.oracle_engine.connect() as conn:
+                result = conn.execute(text("SELECT SYSDATE FROM DUAL")).fetchone()
+                assert result is not None, "Teste DQL retornou nenhuma linha"
+
+                if not isinstance(result[0], datetime.datetime):
+                    raise RuntimeError("Retorno inesperado no teste DQL")
+                print(f"Conectado com sucesso ao OracleDB (TSN={tsn}): {result[0]}")
+        except Exception as e:
+            print(f"Erro ao conectar ao OracleDB (TSN={tsn}): {e}")
+            ok = False
+
+        return ok
+
+    def _check_packages(self):
+        """
+        Confere os pacotes opcionais dos recursos configurados (ver dependencies).
+        Sem o `asyncpg` o runtime asyncio só grava os logs pela thread do
+        DBLogWriter, então a falta dele é apenas avisada.
+        """
+        missing = missing_packages(self.postgres_engine, self.RUNTIME)
+        for package, users in missing.items():
+            print(f"Pacote opcional '{package}' não instalado (usado por: {', '.join(users)}).")
+        if missing:
+            print("Instale com: pip install -r requirements-optional.txt")
+        return not (missing.keys() - {'asyncpg'})
+
+    # ============================================================================
+    # ============================== POSTGRESQL ==================================
+    # ============================================================================
+
+    def get_postgres_session(self):
+        return sessionmaker(bind=self.postgres_engine)
+
+    def _get_postgres_engine(self):
+        """Cria e retorna um engine SQLAlchemy para o PostgreSQL."""
+        database_url = self._get_postgres_url(self._POSTGRES)
+        return create_engine(database_url)
 
     def _get_postgres_url(self, pg_params):
         password_safe = quote_plus(pg_params['password'])
@@ -50,25 +382,33 @@ class Config:
             f"@{pg_params['hostname']}:{pg_params['port']}/{pg_params['database']}"
         )
 
+    @property
+    def postgres_dsn(self):
+        """DSN libpq do PostgreSQL, para clientes fora do SQLAlchemy (ex.: asyncpg nos logs)."""
+        pg_params = self._POSTGRES
+        return (
+            f"postgresql://{quote_plus(pg_params['username'])}:{quote_plus(pg_params['password'])}"
+            f"@{pg_params['hostname']}:{pg_params['port']}/{pg_params['database']}"
+        )
+
     # ============================================================================
     # ============================== ORACLEDB ====================================
     # ============================================================================
 
     def get_oracle_session(self):
         """Retorna um SessionMaker para o OracleDB."""
-        return sessionmaker(bind=self._oracle_engine)
+        return sessionmaker(bind=self.oracle_engine)
 
     def _get_oracle_engine(self):
         """
         Inicializa o Oracle client, cria e retorna um engine SQLAlchemy
         para o OracleDB usando TNS name configurado.
         """
-        # 1) Inicializa o Oracle Instant Client
-        try:
+        # 1) Inicializa o Oracle Instant Client (modo thick). Com `thin_mode` o
+        #    driver fala direto com o banco (o TSN é resolvido pelo TNS_ADMIN)
+        #    e a API assíncrona do runtime asyncio fica disponível
+        if not self._ORACLE.get('thin_mode', False):
             oracledb.init_oracle_client(lib_dir=self._ORACLE['INSTANT_CLIENT'])
-        except Exception as e:
-            print(f"Erro ao inicializar Oracle client: {e}")
-            exit(1)
 
         # 2) Recupera TSN (TNS name) definido pela empresa
         tsn = self._ORACLE['TSN']
@@ -79,32 +419,120 @@ class Config:
         pw   = quote_plus(self._ORACLE['user_pass'])
         url  = f"oracle+oracledb://{user}:{pw}@{tsn}"
 
-        # 4) Cria engine e testa conexão
-        engine = create_engine(url, arraysize=self.ARRAYSIZE)
+        # 4) Cria engine (pool configurável); a conexão é testada em check_connections()
+        pool_cfg = self.ORACLE_POOL
+        if pool_cfg.get('native', False):
+            engine = self._get_native_pool_engine(user, self._ORACLE['user_pass'], tsn, pool_cfg)
+        else:
+            engine = create_engine(
+                url,
+                arraysize=self.ARRAYSIZE,
+                poolclass=_TimedQueuePool,
+                pool_size=int(pool_cfg.get('size', self.MAX_WORKERS)),
+                max_overflow=int(pool_cfg.get('max_overflow', 2)),
+                pool_recycle=int(pool_cfg.get('recycle', 3600)),
+                pool_pre_ping=bool(pool_cfg.get('pre_ping', True)),
+                pool_timeout=float(pool_cfg.get('timeout', 30)),
+            )
+            engine.pool.stats = self.oracle_pool_stats
+
+            # —–––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+            # injeta automaticamente o ALTER SESSION toda vez que uma conexão
+            # nova é criada (não a cada checkout)
+            @event.listens_for(engine, "connect")
+            def _set_nls_date_format(dbapi_connection, connection_record):
+                # dbapi_connection é o objeto oracledb.Connection
+                cursor = dbapi_connection.cursor()
+                cursor.execute(NLS_SESSION_SQL)
+                cursor.close()
+                self.oracle_pool_stats.on_create()
+            # —–––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 
-        # —–––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-        # injeta automaticamente o ALTER SESSION toda vez que uma conexão
-        @event.listens_for(engine, "connect")
-        def _set_nls_date_format(dbapi_connection, connection_record):
-            # dbapi_connection é o objeto oracledb.Connection
-            cursor = dbapi_connection.cursor()
-            cursor.execute("ALTER SESSION SET NLS_DATE_FORMAT = 'DD/MM/YYYY'")
+            @event.listens_for(engine, "checkout")
+            def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+                self.oracle_pool_stats.on_checkout(self.oracle_pool_stats.take_wait())
+
+            @event.listens_for(engine, "checkin")
+            def _on_checkin(dbapi_connection, connection_record):
+                self.oracle_pool_stats.on_checkin()
+
+        # arraysize/prefetchrows por job (ver fetch_tuning) e conversores do CSV (ver fetch_converters)
+        fetch_tuning.install(engine)
+        fetch_converters.install(engine)
+        return engine
+
+    def _get_native_pool_engine(self, user, password, tsn, pool_cfg):
+        """
+        Usa o pool de sessões nativo do oracledb. O ALTER SESSION roda no
+        `session_callback`, apenas quando uma sessão nova é criada, e o
+        SQLAlchemy só empresta conexões dele (NullPool).
+        """
+        def _init_session(connection, requested_tag):
+            cursor = connection.cursor()
+            cursor.execute(NLS_SESSION_SQL)
             cursor.close()
-        # —–––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+            self.oracle_pool_stats.on_create()
+
+        size = int(pool_cfg.get('size', self.MAX_WORKERS))
+        self._native_pool = oracledb.create_pool(
+            user=user,
+            password=password,
+            dsn=tsn,
+            min=size,  # sessões mínimas já criadas (pré-aquecidas)
+            max=size + int(pool_cfg.get('max_overflow', 2)),
+            increment=1,
+            session_callback=_init_session,
+            getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+            wait_timeout=int(float(pool_cfg.get('timeout', 30)) * 1000),
+            max_lifetime_session=int(pool_cfg.get('recycle', 3600)),
+            ping_interval=60 if pool_cfg.get('pre_ping', True) else -1,
+        )
 
+        stats = self.oracle_pool_stats
 
+        def _acquire():
+            started = time.perf_counter()
+            connection = self._native_pool.acquire()
+            stats.on_checkout(time.perf_counter() - started)
+            return connection
+
+        engine = create_engine("oracle+oracledb://", creator=_acquire, poolclass=NullPool, arraysize=self.ARRAYSIZE)
+
+        @event.listens_for(engine, "close")
+        def _on_release(dbapi_connection, connection_record):
+            stats.on_checkin()
+
+        return engine
+
+    def prewarm_oracle_pool(self):
+        """
+        Abre de uma vez as conexões do pool para que os primeiros jobs não
+        paguem o custo de conexão. O pool nativo já nasce com `min` sessões.
+        """
+        engine = self.oracle_engine
+        if self._native_pool is not None:
+            return self._native_pool.opened
+
+        size = engine.pool.size()
+        connections = []
         try:
-            with engine.connect() as conn:
-                result = conn.execute(text("SELECT SYSDATE FROM DUAL")).fetchone()
-                assert result is not None, "Teste DQL retornou nenhuma linha"
+            for _ in range(size):
+                connections.append(engine.connect())
+        finally:
+            for connection in connections:
+                connection.close()
+        return len(connections)
 
-                if not isinstance(result[0], datetime.datetime):
-                    raise RuntimeError("Retorno inesperado no teste DQL")
-                print(f"Conectado com sucesso ao OracleDB (TSN={tsn}): {result[0]}")
-            return engine
-        except Exception as e:
-            print(f"Erro ao conectar ao OracleDB (TSN={tsn}): {e}")
-            exit(1)
+    def oracle_pool_status(self):
+        """Estatísticas do pool Oracle (conexões criadas, em uso, espera)."""
+        engine = self.oracle_engine
+        status = self.oracle_pool_stats.snapshot()
+        if self._native_pool is not None:
+            status.update(pool='native', opened=self._native_pool.opened, busy=self._native_pool.busy, max=self._native_pool.max)
+        else:
+            pool = engine.pool
+            status.update(pool='queue', size=pool.size(), idle=pool.checkedin(), overflow=pool.overflow())
+        return status
 
 
 cfg = Config()
@@ -0,0 +1,58 @@
+"""
+##----------------------------------------
+Dependências opcionais
+##----------------------------------------
+
+`pyarrow`, `zstandard` e `asyncpg` ficam em `requirements-optional.txt` e só
+são importados quando um recurso os usa: Parquet/Arrow, CSV com 'zstd' e os
+logs em lote do runtime asyncio. `missing_packages` confere na inicialização
+(`cfg.check_connections`) se os pacotes dos recursos configurados nos jobs
+ativos (inclusive destinos extras) e no datafile.json estão instalados, para
+que a falta apareça ao subir o serviço e não na primeira execução do job.
+"""
+import importlib.util
+import json
+
+from sqlalchemy import select
+
+from exporters import required_packages
+from models import JobHE
+
+
+def is_installed(package):
+    return importlib.util.find_spec(package) is not None
+
+
+def _job_outputs(export_format, compression, sinks):
+    yield export_format, compression
+    try:
+        specs = json.loads(sinks) if sinks else []
+    except ValueError:
+        return  # lista inválida: o job já é recusado na execução
+    if isinstance(specs, list):
+        for spec in specs:
+            if isinstance(spec, dict):
+                yield spec.get('format'), spec.get('compression')
+
+
+def missing_packages(engine, runtime='thread'):
+    """
+    Pacotes opcionais ausentes: {pacote: [quem precisa dele]}, ex.:
+    {'pyarrow': ['job 12', 'job 15']}. Dicionário vazio => tudo instalado.
+    """
+    users = {}
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(JobHE.job_id, JobHE.export_format, JobHE.export_compression, JobHE.sinks)
+            .where(JobHE.job_status == 'Y')
+            .order_by(JobHE.job_id)
+        )
+        for job_id, export_format, compression, sinks in rows:
+            packages = set()
+            for output in _job_outputs(export_format, compression, sinks):
+                packages |= required_packages(*output)
+            for package in packages:
+                users.setdefault(package, []).append(f"job {job_id}")
+    if runtime == 'async':
+        users.setdefault('asyncpg', []).append("scheduler.runtime = 'async'")
+    return {package: names for package, names in sorted(users.items()) if not is_installed(package)}
@@ -0,0 +1,779 @@
+"""
+##----------------------------------------
+Exportadores do resultado dos jobs
+##----------------------------------------
+
+Cada exportador recebe o resultado em blocos (um `fetchmany()` por vez), então
+o pico de memória é limitado pelo tamanho do bloco e não pelo tamanho do
+resultado. Formatos suportados: 'csv', 'parquet' e 'arrow' (Arrow IPC).
+Parquet e Arrow dependem do pacote opcional `pyarrow`. O formato 'postgres'
+não gera arquivo: carrega os blocos direto em uma tabela do PostgreSQL com
+COPY (`PostgresCopyExporter`). O formato 'checksum' grava só a quantidade de
+linhas e um checksum do resultado, para conciliação (`ChecksumExporter`).
+
+Compressão opcional ('gzip' ou 'zstd'): no CSV ela roda em uma thread
+separada (`CompressedFileWriter`), sobrepondo-se ao próximo `fetchmany()`;
+nos formatos colunares é repassada ao codec interno do arquivo.
+'zstd' no CSV depende do pacote opcional `zstandard`.
+
+`run_export` liga a busca ao exportador em pipeline: a thread do job busca o
+próximo bloco enquanto uma thread de escrita serializa e grava o anterior.
+Com vários destinos, `FanOutExporter` pode dar a cada um a sua thread e a sua
+fila, para que um destino lento não segure os demais.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+import csv
+import hashlib
+import io
+import json
+import os
+import queue
+import threading
+import zlib
+
+# pyarrow é opcional (só parquet/arrow) e pesado: importado no primeiro uso
+pa = None
+pq = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard é opcional: só necessário para CSV .zst
+    zstandard = None
+
+
+COMPRESSIONS = ('gzip', 'zstd')
+
+
+def normalize_compression(compression):
+    """Retorna 'gzip', 'zstd' ou None; levanta ValueError para valores desconhecidos."""
+    if not compression or compression.lower() == 'none':
+        return None
+    compression = compression.lower()
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}'. Expected one of: {', '.join(COMPRESSIONS)}")
+    return compression
+
+
+def required_packages(export_format, compression=None):
+    """Pacotes opcionais (requirements-optional.txt) de que uma saída depende."""
+    export_format = (export_format or 'csv').lower()
+    packages = set()
+    if export_format in ('parquet', 'arrow'):
+        packages.add('pyarrow')
+    # Parquet/Arrow comprimem com o próprio pyarrow; só o CSV usa o zstandard
+    if export_format == 'csv' and (compression or '').lower() == 'zstd':
+        packages.add('zstandard')
+    return packages
+
+
+class CompressedFileWriter:
+    """
+    Comprime e grava blocos de bytes em uma thread dedicada.
+
+    `write()` apenas enfileira o bloco (fila limitada a `max_pending` blocos),
+    então a thread chamadora volta logo para o próximo `fetchmany()` enquanto
+    o bloco anterior é comprimido. zlib e zstandard liberam o GIL durante a
+    compressão, então as duas etapas rodam de fato em paralelo.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path, compression, level=None, max_pending=4, append=False):
+        self.path = path
+        self.bytes_written = 0
+        self._compression = compression
+        self._level = level
+        self._compressor = self._new_compressor(compression, level)
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._file = open(path, 'ab' if append else 'wb')
+        self._thread = threading.Thread(target=self._run, name='export-compressor', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _new_compressor(compression, level):
+        if compression == 'gzip':
+            # wbits=31 => cabeçalho/rodapé gzip
+            return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+        if compression == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("zstd compression requires the 'zstandard' package.")
+            return zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+        raise ValueError(f"Unknown compression '{compression}'")
+
+    def write(self, data):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(data)
+
+    def checkpoint(self):
+        """
+        Fecha o membro gzip / frame zstd atual e grava tudo em disco; o
+        próximo bloco começa um membro novo (membros concatenados formam um
+        arquivo válido). Retorna o tamanho do arquivo nesse ponto.
+        """
+        marker = _CheckpointMarker()
+        self.write(marker)
+        marker.done.wait()
+        if self._error is not None:
+            raise self._error
+        return marker.offset
+
+    def close(self):
+        """Espera a compressão terminar e fecha o arquivo; repassa erros da thread."""
+        if self._thread is None:
+            return
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            if data is self._STOP:
+                break
+            if isinstance(data, _CheckpointMarker):
+                self._checkpoint(data)
+                continue
+            if self._error is not None:
+                continue  # só esvazia a fila para não travar quem produz
+            try:
+                self._emit(self._compressor.compress(data))
+            except Exception as e:
+                self._error = e
+
+        if self._error is None:
+            try:
+                self._emit(self._compressor.flush())
+            except Exception as e:
+                self._error = e
+
+    def _checkpoint(self, marker):
+        try:
+            if self._error is None:
+                self._emit(self._compressor.flush())
+                self._compressor = self._new_compressor(self._compression, self._level)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                marker.offset = self._file.tell()
+        except Exception as e:
+            self._error = e
+        finally:
+            marker.done.set()
+
+    def _emit(self, chunk):
+        if chunk:
+            self._file.write(chunk)
+            self.bytes_written += len(chunk)
+
+
+class _CheckpointMarker:
+    """Pedido de checkpoint na fila do CompressedFileWriter."""
+
+    __slots__ = ('done', 'offset')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.offset = None
+
+
+class CsvExporter:
+    """CSV delimitado por ';' em UTF-8, com cabeçalho."""
+
+    extension = '.csv'
+    _COMPRESSED_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+    def __init__(self, path, compression=None, level=None, buffer_size=1024 * 1024, append=False):
+        self.path = path
+        self.compression = normalize_compression(compression)
+        self.level = level
+        self.buffer_size = buffer_size
+        self.append = append
+        self._file = None
+        self._writer = None
+        self._buffer = None
+
+    @classmethod
+    def extension_for(cls, compression=None):
+        return cls.extension + cls._COMPRESSED_EXTENSIONS.get(normalize_compression(compression), '')
+
+    def open(self, columns, description=None):
+        # No modo append o cabeçalho só é escrito se o arquivo ainda não existir.
+        # gzip e zstd aceitam membros/frames concatenados, então também dá para acrescentar.
+        write_header = not (self.append and os.path.exists(self.path) and os.path.getsize(self.path) > 0)
+
+        if self.compression is None:
+            mode = 'a' if self.append else 'w'
+            self._file = open(self.path, mode, newline='', encoding='utf-8', buffering=self.buffer_size)
+            self._writer = csv.writer(self._file, delimiter=';')
+        else:
+            # Serializa cada bloco em memória e entrega os bytes ao compressor
+            self._file = CompressedFileWriter(self.path, self.compression, self.level, append=self.append)
+            self._buffer = io.StringIO(newline='')
+            self._writer = csv.writer(self._buffer, delimiter=';')
+        if write_header:
+            self._writer.writerow(columns)
+            self._flush_buffer()
+
+    def write_batch(self, rows):
+        self._writer.writerows(rows)
+        self._flush_buffer()
+
+    def checkpoint(self):
+        """Grava em disco tudo o que já foi escrito e retorna o tamanho do arquivo (ponto de retomada)."""
+        if self.compression is not None:
+            return self._file.checkpoint()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return os.fstat(self._file.fileno()).st_size
+
+    def _flush_buffer(self):
+        if self._buffer is None:
+            return
+        self._file.write(self._buffer.getvalue().encode('utf-8'))
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _ArrowExporter:
+    """Base dos formatos colunares: monta o schema a partir do cursor.description."""
+
+    def __init__(self, path, compression=None, level=None, buffer_size=None, append=False):
+        _load_pyarrow(self.format_name)
+        if append:
+            raise ValueError(f"Export format '{self.format_name}' does not support append mode; use 'delta'.")
+        self.path = path
+        self.compression = normalize_compression(compression)
+        self.level = level
+        self.schema = None
+        self._writer = None
+
+    @classmethod
+    def extension_for(cls, compression=None):
+        # A compressão é interna ao arquivo: a extensão não muda
+        return cls.extension
+
+    def open(self, columns, description=None):
+        description = description or [(name, None) for name in columns]
+        self.schema = pa.schema([
+            pa.field(name, arrow_type_for(column)) for name, column in zip(columns, description)
+        ])
+        self._writer = self._new_writer()
+
+    def write_batch(self, rows):
+        arrays = [
+            _to_arrow_array(values, field.type)
+            for values, field in zip(zip(*rows), self.schema)
+        ]
+        self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _new_writer(self):
+        raise NotImplementedError
+
+
+class ParquetExporter(_ArrowExporter):
+    """Parquet: cada bloco do `fetchmany()` vira um row group."""
+
+    format_name = 'parquet'
+    extension = '.parquet'
+
+    def _new_writer(self):
+        return pq.ParquetWriter(
+            self.path, self.schema,
+            compression=self.compression or 'snappy',
+            compression_level=self.level if self.compression else None
+        )
+
+
+class ArrowExporter(_ArrowExporter):
+    """Arrow IPC (formato de arquivo): cada bloco vira um record batch."""
+
+    format_name = 'arrow'
+    extension = '.arrow'
+
+    def _new_writer(self):
+        options = None
+        if self.compression is not None:
+            # Arrow IPC só suporta os codecs 'zstd' e 'lz4_frame'
+            if self.compression != 'zstd':
+                raise ValueError(f"Arrow IPC export does not support '{self.compression}' compression; use 'zstd'.")
+            codec = pa.Codec('zstd', compression_level=self.level)
+            options = pa.ipc.IpcWriteOptions(compression=codec)
+        return pa.ipc.new_file(self.path, self.schema, options=options)
+
+
+class PostgresCopyExporter:
+    """
+    Carrega o resultado em uma tabela do PostgreSQL com `COPY ... FROM STDIN`,
+    um COPY por bloco, todos na mesma transação, sem arquivo intermediário.
+    `path` é a tabela ('schema.tabela'); `connect()` devolve uma conexão
+    psycopg2 (do pool do serviço). Modos de carga:
+
+        'truncate'  TRUNCATE + COPY na tabela; quem lê a tabela espera o fim
+                    da carga (o TRUNCATE segura o lock até o commit);
+        'swap'      COPY em `<tabela>__staging` (CREATE TABLE ... LIKE
+                    INCLUDING ALL) e troca de nomes no fim, em uma transação
+                    curta. Grants e views dependentes não acompanham a troca;
+                    para essas tabelas use 'truncate';
+        append=True COPY na tabela, sem apagar nada (export_mode 'append').
+
+    Em erro nada é gravado: `abort()` (ou uma falha em `write_batch`) faz o
+    `close()` desfazer a transação. As colunas do COPY são as da consulta;
+    nomes em maiúsculas (padrão do Oracle) viram minúsculas, como no
+    PostgreSQL. NULL vai como campo vazio sem aspas (no Oracle '' já é NULL).
+    """
+
+    extension = ''
+    LOAD_MODES = ('truncate', 'swap')
+    _BINARY_TYPES = ('DB_TYPE_RAW', 'DB_TYPE_LONG_RAW', 'DB_TYPE_BLOB')
+
+    def __init__(self, path, compression=None, level=None, buffer_size=None, append=False,
+                 load_mode='truncate', connect=None):
+        if load_mode not in self.LOAD_MODES:
+            raise ValueError(f"Unknown load mode '{load_mode}'. Expected one of: {', '.join(self.LOAD_MODES)}")
+        if connect is None:
+            raise ValueError("Export format 'postgres' requires a connection factory.")
+        self.path = path
+        self.append = append
+        self.load_mode = load_mode
+        self.connect = connect
+        self.bytes_written = 0
+        self._connection = None
+        self._cursor = None
+        self._copy_sql = None
+        self._binary = ()
+        self._failed = False
+        self._buffer = io.StringIO(newline='')
+        self._writer = csv.writer(self._buffer)
+
+    @classmethod
+    def extension_for(cls, compression=None):
+        return cls.extension
+
+    @staticmethod
+    def _identifier(name):
+        # Nomes sem minúsculas seguem a regra do Oracle/PostgreSQL para identificadores sem aspas
+        return name.lower() if name == name.upper() else name
+
+    def _table(self, suffix=''):
+        from psycopg2 import sql
+        parts = [self._identifier(part) for part in self.path.strip().split('.')]
+        parts[-1] += suffix
+        return sql.Identifier(*parts)
+
+    def open(self, columns, description=None):
+        from psycopg2 import sql
+        self._binary = tuple(
+            index for index, column in enumerate(description or ())
+            if getattr(column[1] if len(column) > 1 else None, 'name', None) in self._BINARY_TYPES
+        )
+        target = self._table()
+        load_into = target
+        self._connection = self.connect()
+        self._cursor = self._connection.cursor()
+        try:
+            if not self.append:
+                if self.load_mode == 'swap':
+                    load_into = self._table('__staging')
+                    self._cursor.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(load_into))
+                    self._cursor.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING ALL)").format(load_into, target))
+                else:
+                    self._cursor.execute(sql.SQL("TRUNCATE TABLE {}").format(target))
+            self._copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+                load_into, sql.SQL(', ').join(sql.Identifier(self._identifier(name)) for name in columns)
+            ).as_string(self._cursor)  # `connect()` pode devolver o proxy do pool; o cursor é o do psycopg2
+        except BaseException:
+            # Ex.: tabela inexistente; o destino não chega a ser aberto, então fecha aqui
+            self._failed = True
+            self.close()
+            raise
+
+    def write_batch(self, rows):
+        if self._binary:
+            rows = [self._convert(row) for row in rows]
+        self._writer.writerows(rows)
+        payload = self._buffer.getvalue().encode('utf-8')
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        try:
+            self._cursor.copy_expert(self._copy_sql, io.BytesIO(payload))
+        except BaseException:
+            self._failed = True
+            raise
+        self.bytes_written += len(payload)
+
+    def _convert(self, row):
+        # bytea no formato hex do PostgreSQL
+        row = list(row)
+        for index in self._binary:
+            if row[index] is not None:
+                row[index] = '\\x' + bytes(row[index]).hex()
+        return row
+
+    def abort(self):
+        """A exportação falhou: `close()` desfaz a carga em vez de confirmá-la."""
+        self._failed = True
+
+    def close(self):
+        if self._connection is None:
+            return
+        try:
+            if self._failed:
+                self._connection.rollback()
+            else:
+                if not self.append and self.load_mode == 'swap':
+                    self._swap()
+                self._connection.commit()
+        except BaseException:
+            self._connection.rollback()
+            raise
+        finally:
+            self._cursor.close()
+            self._connection.close()
+            self._connection = None
+
+    def _swap(self):
+        from psycopg2 import sql
+        target, staging, old = self._table(), self._table('__staging'), self._table('__old')
+        name = target.strings[-1]
+        self._cursor.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(old))
+        self._cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(target, sql.Identifier(name + '__old')))
+        self._cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(staging, sql.Identifier(name)))
+        self._cursor.execute(sql.SQL("DROP TABLE {}").format(old))
+
+
+class ChecksumExporter:
+    """
+    Não grava as linhas: no `close()` gera um JSON com as colunas, a
+    quantidade de linhas e um checksum do resultado, para conciliar com a
+    origem ou com outra cópia da mesma exportação.
+
+    O checksum é a soma (módulo 2**64) do BLAKE2b de 64 bits de cada linha,
+    então não depende da ordem das linhas. Cada linha entra como texto: os
+    valores separados por '\\x1f', NULL como '\\N', datas em ISO 8601 e
+    binários em hexadecimal.
+    """
+
+    extension = '.checksum.json'
+    ALGORITHM = 'sum64-blake2b64'
+
+    def __init__(self, path, compression=None, level=None, buffer_size=None, append=False):
+        if append:
+            raise ValueError("Export format 'checksum' does not support export mode 'append'.")
+        self.path = path
+        self.columns = None
+        self.rows = 0
+        self._sum = 0
+
+    @classmethod
+    def extension_for(cls, compression=None):
+        return cls.extension
+
+    @staticmethod
+    def _text(value):
+        if value is None:
+            return '\\N'
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value).hex()
+        return str(value)
+
+    def open(self, columns, description=None):
+        self.columns = list(columns)
+
+    def write_batch(self, rows):
+        total = self._sum
+        for row in rows:
+            line = '\x1f'.join(map(self._text, row)).encode('utf-8')
+            total += int.from_bytes(hashlib.blake2b(line, digest_size=8).digest(), 'big')
+        self._sum = total & 0xFFFFFFFFFFFFFFFF
+        self.rows += len(rows)
+
+    def close(self):
+        with open(self.path, 'w', encoding='utf-8') as handle:
+            json.dump({
+                'columns': self.columns,
+                'rows': self.rows,
+                'checksum': f"{self._sum:016x}",
+                'algorithm': self.ALGORITHM,
+                'generated_at': datetime.now().isoformat(timespec='seconds'),
+            }, handle, indent=2)
+
+
+class _SinkWorker:
+    """Thread de escrita de um destino do `FanOutExporter`, alimentada por uma fila limitada."""
+
+    def __init__(self, index, exporter, queue_depth, errors):
+        self.index = index
+        self.exporter = exporter
+        self.errors = errors
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._thread = threading.Thread(target=self._run, name=f'export-sink-{index}', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            rows = self._queue.get()
+            if rows is _END:
+                return
+            if self.index in self.errors:
+                # Destino com erro: só esvazia a fila, para não travar quem alimenta
+                continue
+            try:
+                self.exporter.write_batch(rows)
+            except Exception as e:
+                self.errors[self.index] = e
+
+    def put(self, rows):
+        # Fila cheia: espera este destino, os demais já receberam ou vão receber o bloco
+        self._queue.put(rows)
+
+    def finish(self):
+        self._queue.put(_END)
+
+    def join(self):
+        self._thread.join()
+
+
+class FanOutExporter:
+    """
+    Repassa cada bloco para vários exportadores já abertos. Se um deles
+    falhar, o erro fica em `errors[índice]` e ele é descartado, sem
+    interromper os demais; só levanta erro quando todos falharem.
+
+    Com `queue_depth > 0` cada exportador grava em sua própria thread, com
+    uma fila de até `queue_depth` blocos: os destinos gravam em paralelo e
+    um destino lento só segura os outros quando a fila dele enche. Os erros
+    dessas threads podem aparecer em `errors` só depois do `close()`.
+    """
+
+    def __init__(self, exporters, queue_depth=0):
+        self.exporters = list(exporters)
+        self.errors = {}
+        self._workers = None
+        if queue_depth > 0:
+            self._workers = [
+                _SinkWorker(index, exporter, queue_depth, self.errors)
+                for index, exporter in enumerate(self.exporters)
+            ]
+
+    def _active(self):
+        return [(i, e) for i, e in enumerate(self.exporters) if i not in self.errors]
+
+    def write_batch(self, rows):
+        if self._workers is not None:
+            for worker in self._workers:
+                if worker.index not in self.errors:
+                    worker.put(rows)
+        else:
+            for index, exporter in self._active():
+                try:
+                    exporter.write_batch(rows)
+                except Exception as e:
+                    self.errors[index] = e
+        if len(self.errors) == len(self.exporters):
+            raise next(iter(self.errors.values()))
+
+    def _drain(self):
+        # Espera as threads gravarem o que já está nas filas
+        if self._workers is None:
+            return
+        workers, self._workers = self._workers, None
+        for worker in workers:
+            worker.finish()
+        for worker in workers:
+            worker.join()
+
+    def abort(self):
+        self._drain()
+        for exporter in self.exporters:
+            if hasattr(exporter, 'abort'):
+                exporter.abort()
+
+    def close(self):
+        self._drain()
+        # Fecha todos, inclusive os que falharam, para liberar os arquivos
+        for index, exporter in enumerate(self.exporters):
+            try:
+                exporter.close()
+            except Exception as e:
+                self.errors.setdefault(index, e)
+
+
+"""
+##----------------------------------------
+Pipeline busca → escrita
+##----------------------------------------
+"""
+
+_END = object()
+
+
+def run_export(fetch_batch, exporter, queue_depth=2, on_batch=None):
+    """
+    Consome `fetch_batch()` até receber um bloco vazio e grava cada bloco no
+    `exporter` (já aberto) em uma thread separada. A fila entre as duas
+    etapas guarda no máximo `queue_depth` blocos, o que limita a memória.
+    Com `queue_depth <= 0` tudo roda na thread chamadora, sem pipeline.
+
+    `on_batch(batch_rows, total_rows)` é chamado após cada bloco buscado.
+    Erros da escrita são repassados ao chamador. Retorna o total de linhas.
+    """
+    total = 0
+
+    if queue_depth <= 0:
+        while True:
+            batch = fetch_batch()
+            if not batch:
+                return total
+            exporter.write_batch(batch)
+            total += len(batch)
+            if on_batch:
+                on_batch(len(batch), total)
+
+    batches = queue.Queue(maxsize=queue_depth)
+    errors = []
+
+    def writer():
+        while True:
+            batch = batches.get()
+            if batch is _END:
+                return
+            if errors:
+                continue  # só esvazia a fila para não travar a busca
+            try:
+                exporter.write_batch(batch)
+            except BaseException as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=writer, name='export-writer', daemon=True)
+    thread.start()
+    try:
+        while not errors:
+            batch = fetch_batch()
+            if not batch:
+                break
+            batches.put(batch)
+            total += len(batch)
+            if on_batch:
+                on_batch(len(batch), total)
+    finally:
+        batches.put(_END)
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return total
+
+
+EXPORTERS = {
+    'csv': CsvExporter,
+    'parquet': ParquetExporter,
+    'arrow': ArrowExporter,
+    'postgres': PostgresCopyExporter,
+    'checksum': ChecksumExporter,
+}
+
+
+def get_exporter_class(export_format):
+    """Retorna a classe do exportador ou levanta ValueError se o formato não existir."""
+    try:
+        return EXPORTERS[(export_format or 'csv').lower()]
+    except KeyError:
+        raise ValueError(f"Unknown export format '{export_format}'. Expected one of: {', '.join(EXPORTERS)}")
+
+
+"""
+##----------------------------------------
+Mapeamento de tipos (cursor.description → Arrow)
+##----------------------------------------
+"""
+
+
+def _load_pyarrow(format_name):
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError(f"Export format '{format_name}' requires the 'pyarrow' package.")
+        pa, pq = pyarrow, pyarrow.parquet
+
+# Nome do tipo oracledb (DbType.name) → tipo Arrow
+_ORACLE_TYPES = {
+    'DB_TYPE_BINARY_FLOAT': 'float32',
+    'DB_TYPE_BINARY_DOUBLE': 'float64',
+    'DB_TYPE_BINARY_INTEGER': 'int64',
+    'DB_TYPE_DATE': 'timestamp',
+    'DB_TYPE_TIMESTAMP': 'timestamp',
+    'DB_TYPE_TIMESTAMP_LTZ': 'timestamp',
+    'DB_TYPE_TIMESTAMP_TZ': 'timestamp',
+    'DB_TYPE_RAW': 'binary',
+    'DB_TYPE_LONG_RAW': 'binary',
+    'DB_TYPE_BLOB': 'binary',
+    'DB_TYPE_BOOLEAN': 'bool',
+}
+
+
+def arrow_type_for(column):
+    """
+    Converte uma entrada do DBAPI `cursor.description`
+    (name, type_code, display_size, internal_size, precision, scale, null_ok)
+    em um tipo Arrow. Tipos desconhecidos viram string.
+    """
+    type_code = column[1] if len(column) > 1 else None
+    type_name = getattr(type_code, 'name', None)
+
+    if type_name == 'DB_TYPE_NUMBER':
+        precision = column[4] if len(column) > 4 else None
+        scale = column[5] if len(column) > 5 else None
+        # NUMBER(p, 0) cabe em int64 até 18 dígitos e NUMBER(p, -s) é um inteiro
+        # de p + s dígitos; NUMBER(p, s) declarado vira decimal exato (o dialeto
+        # devolve Decimal). NUMBER sem precisão, FLOAT(b) e expressões (precisão 0
+        # ou escala -127) guardam até 38 dígitos em qualquer escala: nenhum tipo
+        # numérico do Arrow os comporta sem perda (float64 erra acima de 2^53),
+        # então viram texto. Só BINARY_FLOAT/BINARY_DOUBLE viram float.
+        if precision and scale is not None and scale != -127:
+            if scale <= 0:
+                digits = precision - scale
+                if digits <= 18:
+                    return pa.int64()
+                if digits <= 38:
+                    return pa.decimal128(digits, 0)
+            elif precision <= 38 and scale <= 38:
+                return pa.decimal128(precision, scale)
+        return pa.string()
+
+    arrow_name = _ORACLE_TYPES.get(type_name)
+    if arrow_name == 'timestamp':
+        return pa.timestamp('us')
+    if arrow_name is not None:
+        return getattr(pa, arrow_name)()
+    return pa.string()
+
+
+def _to_arrow_array(values, arrow_type):
+    if pa.types.is_string(arrow_type):
+        values = [None if v is None else v if isinstance(v, str) else str(v) for v in values]
+    elif pa.types.is_floating(arrow_type):
+        # O Arrow não converte Decimal para double
+        values = [float(v) if isinstance(v, Decimal) else v for v in values]
+    elif pa.types.is_decimal(arrow_type):
+        values = [Decimal(repr(v)) if isinstance(v, float) else v for v in values]
+    return pa.array(values, type=arrow_type)
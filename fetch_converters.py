@@ -0,0 +1,107 @@
+"""
+##----------------------------------------
+Conversão de valores na busca (exportação CSV)
+##----------------------------------------
+
+No CSV todo valor vira texto. Sem conversores, cada linha chega como `Row`
+do SQLAlchemy com `Decimal`/`int`, `datetime` e LOBs, e o `csv.writer` chama
+`str()` em cada célula. Para jobs CSV, `CsvConversions` registra no cursor um
+`outputtypehandler` do oracledb que já entrega os valores prontos:
+
+- NUMBER como texto (sem criar `Decimal`/`int` por célula), no mesmo
+  formato do `str()` do caminho sem conversores: o separador decimal é o
+  '.' fixado na sessão (`config.NLS_SESSION_SQL`) e o zero antes do ponto,
+  que o Oracle omite ('.5'), é acrescentado;
+- DATE e TIMESTAMP formatados uma vez por valor com `export.csv_date_format`
+  / `csv_timestamp_format` (strftime), sem depender do NLS_DATE_FORMAT da
+  sessão; sem formato configurado continuam `datetime`;
+- CLOB/NCLOB como str e BLOB como bytes, buscados junto com a linha (sem
+  uma ida ao banco por LOB).
+
+A busca usa direto o `fetchmany()` do cursor DBAPI (tuplas, sem `Row`),
+exceto o primeiro bloco: com stream_results o SQLAlchemy já leu a primeira
+linha para o buffer do `Result`, então ele sai pelo `Result`.
+
+Parquet/Arrow e o watermark por coluna precisam dos tipos originais, então
+não usam os conversores (ver `scheduler._csv_conversions`).
+"""
+from operator import methodcaller
+
+import oracledb
+from sqlalchemy import event
+
+CONVERT_OPTION = 'csv_conversions'
+
+# Tamanho máximo do texto de um NUMBER (38 dígitos, sinal, ponto e expoente)
+_NUMBER_TEXT_SIZE = 64
+
+_DATE_TYPES = (oracledb.DB_TYPE_DATE,)
+_TIMESTAMP_TYPES = (oracledb.DB_TYPE_TIMESTAMP, oracledb.DB_TYPE_TIMESTAMP_TZ, oracledb.DB_TYPE_TIMESTAMP_LTZ)
+_INLINE_LOBS = {
+    oracledb.DB_TYPE_CLOB: oracledb.DB_TYPE_LONG,
+    oracledb.DB_TYPE_NCLOB: oracledb.DB_TYPE_LONG_NVARCHAR,
+    oracledb.DB_TYPE_BLOB: oracledb.DB_TYPE_LONG_RAW,
+}
+
+
+def install(engine):
+    """Registra no engine o evento que aplica os conversores por execução."""
+    event.listen(engine, 'before_cursor_execute', _apply_conversions)
+
+
+def _apply_conversions(conn, cursor, statement, parameters, context, executemany):
+    conversions = context.execution_options.get(CONVERT_OPTION) if context is not None else None
+    # Só cursores do oracledb têm outputtypehandler (ex.: SQLite no benchmark não tem)
+    if conversions is not None and hasattr(cursor, 'outputtypehandler'):
+        cursor.outputtypehandler = conversions.output_type_handler
+
+
+def number_text(text):
+    """Texto de um NUMBER como o `str()` do Decimal/int equivalente ('.5' => '0.5', '-.5' => '-0.5')."""
+    if text[0] == '.':
+        return '0' + text
+    if text[:2] == '-.':
+        return '-0' + text[1:]
+    return text
+
+
+class CsvConversions:
+    """
+    Conversores de uma exportação CSV. `execution_options()` liga os
+    conversores na execução e `fetch(result)` devolve a busca em tuplas.
+    """
+
+    def __init__(self, date_format=None, timestamp_format=None):
+        self.date_format = date_format
+        self.timestamp_format = timestamp_format
+        self._date_converter = methodcaller('strftime', date_format) if date_format else None
+        self._timestamp_converter = methodcaller('strftime', timestamp_format) if timestamp_format else None
+
+    def execution_options(self):
+        return {CONVERT_OPTION: self}
+
+    def output_type_handler(self, cursor, metadata):
+        type_code = metadata.type_code
+        if type_code is oracledb.DB_TYPE_NUMBER:
+            return cursor.var(oracledb.DB_TYPE_VARCHAR, _NUMBER_TEXT_SIZE, arraysize=cursor.arraysize, outconverter=number_text)
+        if type_code in _DATE_TYPES and self._date_converter is not None:
+            return cursor.var(type_code, arraysize=cursor.arraysize, outconverter=self._date_converter)
+        if type_code in _TIMESTAMP_TYPES and self._timestamp_converter is not None:
+            return cursor.var(type_code, arraysize=cursor.arraysize, outconverter=self._timestamp_converter)
+        if type_code in _INLINE_LOBS:
+            return cursor.var(_INLINE_LOBS[type_code], arraysize=cursor.arraysize)
+        return None  # demais tipos: conversão padrão do oracledb
+
+    @staticmethod
+    def fetch(result):
+        """Busca em blocos direto no cursor DBAPI (tuplas, `cursor.arraysize` linhas)."""
+        cursor = result.cursor
+        first = [True]
+
+        def fetch_batch():
+            if first:
+                # Esvazia o buffer do Result (linhas lidas no execute) junto com o primeiro bloco
+                first.clear()
+                return [tuple(row) for row in result.fetchmany(cursor.arraysize)]
+            return cursor.fetchmany()
+        return fetch_batch
@@ -0,0 +1,170 @@
+"""
+##----------------------------------------
+Tamanho de busca (arraysize/prefetchrows) por job
+##----------------------------------------
+
+Em vez de um único `Config.ARRAYSIZE` para todas as consultas, cada job
+busca em blocos de aproximadamente `fetch_batch_bytes` (seção `export` do
+datafile.json), então a memória fica estável e as idas ao banco são as
+mínimas para esse limite:
+
+- antes do execute: override do job (`jobs_he.fetch_arraysize`) ou o valor
+  aprendido nas execuções anteriores (`fetch_arraysize_learned`), que
+  também vira o `prefetchrows` (o primeiro bloco já vem no execute); sem
+  nenhum dos dois, o padrão global;
+- depois do execute, sem override nem valor aprendido: estima a largura da
+  linha pelos tipos do `cursor.description`;
+- no primeiro bloco: mede a largura real de uma amostra das linhas e corrige
+  o arraysize do resto da execução; esse valor é o que o job aprende.
+
+Os tamanhos chegam ao cursor pelo evento `before_cursor_execute` (opção de
+execução `FETCH_OPTION`) e, depois do execute, direto no cursor DBAPI.
+"""
+import sys
+
+from sqlalchemy import event
+
+FETCH_OPTION = 'fetch_sizes'
+
+# Bytes aproximados por valor já convertido para Python, por tipo do oracledb
+_TYPE_BYTES = {
+    'DB_TYPE_NUMBER': 32,
+    'DB_TYPE_BINARY_INTEGER': 28,
+    'DB_TYPE_BINARY_FLOAT': 24,
+    'DB_TYPE_BINARY_DOUBLE': 24,
+    'DB_TYPE_BOOLEAN': 28,
+    'DB_TYPE_DATE': 48,
+    'DB_TYPE_TIMESTAMP': 48,
+    'DB_TYPE_TIMESTAMP_TZ': 48,
+    'DB_TYPE_TIMESTAMP_LTZ': 48,
+    'DB_TYPE_INTERVAL_DS': 40,
+    'DB_TYPE_ROWID': 67,
+    'DB_TYPE_CLOB': 4096,
+    'DB_TYPE_NCLOB': 4096,
+    'DB_TYPE_BLOB': 4096,
+    'DB_TYPE_LONG': 4096,
+    'DB_TYPE_LONG_RAW': 4096,
+}
+_STR_OVERHEAD = 49      # sys.getsizeof('')
+_VALUE_SLOT = 8         # ponteiro do valor na tupla
+_ROW_OVERHEAD = 56      # tupla/Row de cada linha
+_UNKNOWN_WIDTH = 64     # largura quando o tipo não informa tamanho
+_SAMPLE_ROWS = 64
+
+# Só corrige o arraysize no meio da execução se a estimativa errou por mais que isso
+_RESIZE_RATIO = 1.5
+
+
+def install(engine):
+    """Registra no engine o evento que aplica os tamanhos por execução."""
+    event.listen(engine, 'before_cursor_execute', _apply_fetch_sizes)
+
+
+def _apply_fetch_sizes(conn, cursor, statement, parameters, context, executemany):
+    sizes = context.execution_options.get(FETCH_OPTION) if context is not None else None
+    if not sizes:
+        return
+    arraysize, prefetchrows = sizes
+    cursor.arraysize = arraysize
+    if prefetchrows is not None and hasattr(cursor, 'prefetchrows'):
+        cursor.prefetchrows = prefetchrows
+
+
+def estimate_row_bytes(description):
+    """Largura estimada (bytes em memória) de uma linha a partir do `cursor.description`."""
+    total = _ROW_OVERHEAD
+    for column in description or ():
+        type_name = getattr(column[1], 'name', None) if len(column) > 1 else None
+        width = _TYPE_BYTES.get(type_name)
+        if width is None:
+            # Texto/RAW: internal_size é o máximo declarado da coluna
+            size = column[3] if len(column) > 3 and column[3] else _UNKNOWN_WIDTH
+            width = _STR_OVERHEAD + size
+        total += _VALUE_SLOT + width
+    return total
+
+
+def sample_row_bytes(rows, sample=_SAMPLE_ROWS):
+    """Largura média medida em uma amostra espaçada das linhas."""
+    step = max(len(rows) // sample, 1)
+    picked = rows[::step][:sample]
+    total = 0
+    for row in picked:
+        total += _ROW_OVERHEAD + sum(_VALUE_SLOT + sys.getsizeof(value) for value in row)
+    return total / len(picked)
+
+
+class FetchSizing:
+    """
+    Escolhe e ajusta o arraysize de uma execução. `learned_arraysize()`
+    devolve o valor a gravar no job ao final (ou None se não mudou).
+    """
+
+    def __init__(self, target_bytes, default_arraysize, min_arraysize=100, max_arraysize=100000,
+                 override=None, learned=None):
+        self.target_bytes = target_bytes
+        self.min_arraysize = min_arraysize
+        self.max_arraysize = max_arraysize
+        self.override = override
+        self.learned = learned
+        self.default_arraysize = default_arraysize
+        self.arraysize = override or learned or default_arraysize
+        self.prefetchrows = self.arraysize if (override or learned) else None
+        self.measured = None
+        self.frozen = False
+
+    def clone(self):
+        """Mesmas configurações, sem o que foi medido (um objeto por cursor, ex.: partes paralelas)."""
+        return FetchSizing(self.target_bytes, self.default_arraysize, self.min_arraysize, self.max_arraysize,
+                           self.override, self.learned)
+
+    def freeze(self):
+        """
+        As variáveis de busca do cursor já foram criadas com o arraysize atual
+        (ver fetch_converters): continua medindo e aprendendo para a próxima
+        execução, mas não redimensiona o cursor.
+        """
+        self.frozen = True
+
+    def size_for(self, row_bytes):
+        return int(min(max(self.target_bytes // max(row_bytes, 1), self.min_arraysize), self.max_arraysize))
+
+    def execution_options(self):
+        return {FETCH_OPTION: (self.arraysize, self.prefetchrows)}
+
+    def after_execute(self, cursor):
+        """Sem override nem histórico: ajusta pelo tipo das colunas antes do primeiro fetch."""
+        if self.override or self.learned:
+            return
+        self._resize(cursor, self.size_for(estimate_row_bytes(cursor.description)))
+
+    def wrap_fetch(self, fetch_batch, cursor):
+        """Mede a largura real no primeiro bloco e corrige o arraysize do restante."""
+        def fetch():
+            batch = fetch_batch()
+            self.observe(batch, cursor)
+            return batch
+        return fetch
+
+    def observe(self, batch, cursor):
+        """Mede o primeiro bloco não vazio (chamado a cada bloco; usado também pela busca assíncrona)."""
+        if self.measured is None and batch:
+            self.measured = self.size_for(sample_row_bytes(batch))
+            ratio = self.measured / self.arraysize
+            if not self.override and not (1 / _RESIZE_RATIO <= ratio <= _RESIZE_RATIO):
+                self._resize(cursor, self.measured)
+
+    def _resize(self, cursor, arraysize):
+        if self.frozen:
+            return
+        self.arraysize = arraysize
+        cursor.arraysize = arraysize
+
+    def learned_arraysize(self):
+        """Novo valor aprendido (média com o anterior, para amortecer variações) ou None."""
+        if self.measured is None:
+            return None
+        value = self.measured if not self.learned else (self.learned + self.measured) // 2
+        if self.learned and abs(value - self.learned) <= self.learned * 0.1:
+            return None
+        return value
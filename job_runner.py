@@ -0,0 +1,263 @@
+"""
+##----------------------------------------
+Executor dos jobs com controle de admissão
+##----------------------------------------
+
+Substitui o ThreadPoolExecutor com fila FIFO ilimitada por:
+- workers configuráveis e fila de prioridade (maior `priority` roda antes);
+- política por job quando ele já está rodando ou na fila (`overlap_policy`):
+    'skip'     descarta a nova execução;
+    'coalesce' guarda no máximo uma execução para depois da atual;
+    'allow'    enfileira normalmente (comportamento antigo);
+- limite global de consultas Oracle simultâneas (`oracle_slot()`, ver
+  `OracleLimiter`);
+- métricas de profundidade da fila e latência de fila.
+"""
+from contextlib import contextmanager
+import heapq
+import itertools
+import threading
+import time
+
+from logging_config import get_logger, log_exception, log_debug
+
+logger = get_logger('job_runner')
+
+OVERLAP_POLICIES = ('skip', 'coalesce', 'allow')
+
+
+class _Task:
+    __slots__ = ('func', 'jobs', 'priority', 'enqueued_at')
+
+    def __init__(self, func, jobs):
+        self.func = func
+        self.jobs = jobs
+        self.priority = max(job.priority or 0 for job in jobs)
+        self.enqueued_at = None
+
+
+class OracleLimiter:
+    """
+    Vagas de consulta Oracle do serviço, divididas entre as threads do
+    JobExecutor e as corrotinas do runtime asyncio. `slot(count)` reserva
+    `count` vagas de uma vez (um job em processo filho com extração paralela
+    usa uma por parte) e espera até haver todas livres; pedidos acima do
+    limite reservam o limite inteiro. `try_acquire` não bloqueia: o loop
+    asyncio usa `on_release` para saber quando tentar de novo.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._cond = threading.Condition()
+        self._active = 0
+        self._wait_total = 0.0
+        self._on_release = []
+
+    def try_acquire(self, count=1, on_release=None, started=None):
+        """
+        Reserva sem esperar e devolve as vagas reservadas (0 se não há).
+        Sem vagas, `on_release()` é chamado uma vez na próxima liberação.
+        """
+        count = min(count, self.limit)
+        with self._cond:
+            if self._active + count > self.limit:
+                if on_release is not None:
+                    self._on_release.append(on_release)
+                return 0
+            self._active += count
+            if started is not None:
+                self._wait_total += time.monotonic() - started
+        return count
+
+    def acquire(self, count=1):
+        count = min(count, self.limit)
+        started = time.monotonic()
+        with self._cond:
+            while self._active + count > self.limit:
+                self._cond.wait()
+            self._active += count
+            self._wait_total += time.monotonic() - started
+        return count
+
+    def release(self, count=1):
+        with self._cond:
+            self._active -= min(count, self.limit)
+            self._cond.notify_all()
+            callbacks, self._on_release = self._on_release, []
+        for callback in callbacks:
+            callback()
+
+    @contextmanager
+    def slot(self, count=1):
+        count = self.acquire(count)
+        try:
+            yield
+        finally:
+            self.release(count)
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def wait_total(self):
+        return self._wait_total
+
+
+class JobExecutor:
+    """
+    Pool de workers para os jobs. `submit_jobs(func, jobs)` decide quais
+    jobs são admitidos (conforme a política de sobreposição de cada um) e
+    enfileira `func(jobs_admitidos)`.
+    """
+
+    def __init__(self, max_workers, max_oracle_queries=None):
+        self.max_workers = max_workers
+        self.max_oracle_queries = max_oracle_queries or max_workers
+        # Compartilhado com o AsyncJobRunner: um único teto de consultas no serviço
+        self.oracle_limiter = OracleLimiter(self.max_oracle_queries)
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._running = {}    # job_id -> execuções em andamento
+        self._queued = {}     # job_id -> execuções na fila
+        self._deferred = {}   # job_id -> _Task que roda quando a atual terminar (coalesce)
+        self._shutdown = False
+
+        # Métricas
+        self._counters = dict.fromkeys(('submitted', 'skipped', 'coalesced', 'completed', 'failed'), 0)
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._started_tasks = 0
+
+        self._workers = [
+            threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    # ------------------------------------------------------------------ submit
+
+    def submit_jobs(self, func, jobs):
+        """Admite os jobs conforme a política de cada um. Retorna a lista admitida."""
+        ready = []
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("JobExecutor is shut down")
+
+            for job in jobs:
+                job_id = job.job_id
+                busy = self._running.get(job_id, 0) or self._queued.get(job_id, 0)
+                policy = job.overlap_policy or 'skip'
+
+                if not busy or policy == 'allow':
+                    ready.append(job)
+                elif policy == 'coalesce' and job_id not in self._deferred and not self._queued.get(job_id, 0):
+                    # Roda uma única vez depois da execução atual
+                    self._deferred[job_id] = _Task(func, [job])
+                    self._counters['coalesced'] += 1
+                    log_debug(logger, f"Job '{job.name}' (ID: {job_id}) is running; coalesced into one follow-up run.", job_id=job_id)
+                else:
+                    self._counters['skipped'] += 1
+                    log_debug(logger, f"Job '{job.name}' (ID: {job_id}) is already running or queued; skipping this run.", job_id=job_id)
+
+            if ready:
+                self._enqueue(_Task(func, ready))
+        return ready
+
+    def submit_admitted(self, func, jobs):
+        """
+        Enfileira `func(jobs)` sem a política de sobreposição: a admissão já
+        foi feita por outro executor (ex.: AsyncJobRunner), que conta com a
+        execução e não pode vê-la descartada por skip/coalesce.
+        """
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("JobExecutor is shut down")
+            self._enqueue(_Task(func, list(jobs)))
+
+    def _enqueue(self, task):
+        task.enqueued_at = time.monotonic()
+        for job in task.jobs:
+            self._queued[job.job_id] = self._queued.get(job.job_id, 0) + 1
+        # heapq é de mínimo: prioridade negativa => maior prioridade primeiro
+        heapq.heappush(self._heap, (-task.priority, next(self._seq), task))
+        self._counters['submitted'] += 1
+        self._cond.notify()
+
+    # ------------------------------------------------------------------ workers
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._shutdown:
+                    self._cond.wait()
+                if not self._heap:
+                    return  # shutdown com a fila vazia
+                _, _, task = heapq.heappop(self._heap)
+
+                waited = time.monotonic() - task.enqueued_at
+                self._latency_total += waited
+                self._latency_max = max(self._latency_max, waited)
+                self._started_tasks += 1
+                for job in task.jobs:
+                    self._queued[job.job_id] -= 1
+                    self._running[job.job_id] = self._running.get(job.job_id, 0) + 1
+
+            try:
+                task.func(task.jobs)
+                outcome = 'completed'
+            except BaseException as e:
+                # Inclui SystemExit/KeyboardInterrupt levantados pelo job: o worker não pode morrer
+                outcome = 'failed'
+                log_exception(logger, f"Unhandled error running jobs {[job.job_id for job in task.jobs]}: {e}")
+
+            with self._cond:
+                self._counters[outcome] += 1
+                for job in task.jobs:
+                    self._running[job.job_id] -= 1
+                    if not self._running[job.job_id]:
+                        del self._running[job.job_id]
+                        deferred = self._deferred.pop(job.job_id, None)
+                        if deferred is not None and not self._shutdown:
+                            self._enqueue(deferred)
+
+    # ------------------------------------------------------------------ Oracle
+
+    def oracle_slot(self, count=1):
+        """Limita o número de consultas Oracle simultâneas em todo o serviço."""
+        return self.oracle_limiter.slot(count)
+
+    # ------------------------------------------------------------------ status
+
+    def is_running(self, job_id):
+        with self._cond:
+            return bool(self._running.get(job_id))
+
+    def stats(self):
+        """Métricas de fila: profundidade, latência, execuções e consultas Oracle ativas."""
+        with self._cond:
+            started = self._started_tasks
+            return dict(
+                self._counters,
+                workers=self.max_workers,
+                queue_depth=len(self._heap),
+                deferred=len(self._deferred),
+                running_jobs=sum(self._running.values()),
+                oracle_active=self.oracle_limiter.active,
+                oracle_limit=self.max_oracle_queries,
+                oracle_wait_seconds=round(self.oracle_limiter.wait_total, 3),
+                queue_latency_avg_ms=round(1000 * self._latency_total / started, 1) if started else 0.0,
+                queue_latency_max_ms=round(1000 * self._latency_max, 1),
+            )
+
+    def shutdown(self, wait=True):
+        """Para de aceitar jobs; com `wait`, termina o que já está na fila."""
+        with self._cond:
+            self._shutdown = True
+            self._deferred.clear()
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
@@ -0,0 +1,140 @@
+"""
+##----------------------------------------
+Nivelamento de carga dos disparos
+##----------------------------------------
+
+Horários redondos (08:00, 12:00...) fazem dezenas de regras vencerem no mesmo
+minuto. Um job com `start_tolerance` (minutos, em `jobs_he`) aceita começar
+em qualquer minuto da janela [slot, slot + tolerância]; o `LoadLeveler`
+escolhe esse minuto para achatar a carga prevista.
+
+A carga prevista é o número de jobs rodando ao mesmo tempo, minuto a minuto,
+pela duração típica de cada job (histórico de execuções, ver
+`scheduler._load_job_durations`). O plano de um dia é montado de uma vez,
+slot a slot em ordem de horário (maior prioridade e jobs mais longos
+primeiro): cada job com tolerância vai para o minuto da janela com o menor
+pico de carga ao longo da sua duração. Jobs sem tolerância não se movem, mas
+entram na conta.
+
+O plano é refeito quando as regras mudam (`invalidate`) e a cada dia novo.
+"""
+from datetime import datetime, time, timedelta
+import math
+import threading
+
+_MINUTE = timedelta(minutes=1)
+_DAY_MINUTES = 24 * 60
+
+
+def slots_on(rule, day):
+    """Disparos da regra no dia `day` (date), em ordem."""
+    start = datetime.combine(day, time.min)
+    end = start + timedelta(days=1)
+    current = start - timedelta(microseconds=1)
+    while True:
+        current = rule.next_fire(current)
+        if current is None or current >= end:
+            return
+        yield current
+
+
+def tolerance_minutes(rule):
+    """Janela (minutos) em que o disparo pode ser adiado; menor que a periodicidade da regra."""
+    tolerance = rule.job.start_tolerance or 0
+    if tolerance > 0 and rule.step is not None:
+        tolerance = min(tolerance, math.ceil(rule.step / _MINUTE) - 1)
+    return max(tolerance, 0)
+
+
+class LoadPlan:
+    """Horário escolhido para cada disparo de um dia e a carga prevista por minuto."""
+
+    __slots__ = ('day', 'fires', 'load', 'unleveled_peak')
+
+    def __init__(self, day, fires, load, unleveled_peak):
+        self.day = day
+        self.fires = fires                    # (chave da regra, slot) -> horário planejado
+        self.load = load                      # jobs simultâneos por minuto do dia
+        self.unleveled_peak = unleveled_peak  # pico se todos disparassem no slot
+
+    def timeline(self):
+        """Lista de (minuto, jobs simultâneos previstos) do dia."""
+        start = datetime.combine(self.day, time.min)
+        return [(start + index * _MINUTE, load) for index, load in enumerate(self.load[:_DAY_MINUTES])]
+
+    def peak(self):
+        """(minuto, carga) de maior carga prevista no dia."""
+        index = max(range(_DAY_MINUTES), key=self.load.__getitem__)
+        return datetime.combine(self.day, time.min) + index * _MINUTE, self.load[index]
+
+    def load_at(self, moment):
+        index = int((moment - datetime.combine(self.day, time.min)) / _MINUTE)
+        return self.load[index] if 0 <= index < len(self.load) else 0
+
+
+class LoadLeveler:
+    """
+    Monta e guarda os planos por dia. `durations()` devolve
+    ({job_id: duração típica em segundos}, duração dos jobs sem histórico).
+    """
+
+    def __init__(self, durations):
+        self.durations = durations
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """As regras mudaram: os planos são refeitos no próximo uso."""
+        with self._lock:
+            self._plans.clear()
+
+    def fire_time(self, rules, rule, slot):
+        """Horário planejado para o disparo `slot` da regra (o próprio slot se ela não tiver tolerância)."""
+        if not tolerance_minutes(rule):
+            return slot
+        return self.plan(rules, slot.date()).fires.get((rule.key, slot), slot)
+
+    def plan(self, rules, day):
+        with self._lock:
+            plan = self._plans.get(day)
+            if plan is None:
+                # Só interessam hoje e amanhã; dias antigos saem
+                for old in [d for d in self._plans if d < day]:
+                    del self._plans[old]
+                plan = self._plans[day] = self._build(rules, day)
+            return plan
+
+    def _build(self, rules, day):
+        durations, default = self.durations()
+        start = datetime.combine(day, time.min)
+
+        slots = []
+        for rule in rules:
+            minutes = max(1, math.ceil(durations.get(rule.job.job_id, default) / 60))
+            window = tolerance_minutes(rule)
+            for slot in slots_on(rule, day):
+                slots.append((slot, -(rule.job.priority or 0), -minutes, window, rule))
+        slots.sort(key=lambda item: item[:3])
+
+        longest = max((-minutes + window for _, _, minutes, window, _ in slots), default=0)
+        load = [0] * (_DAY_MINUTES + longest + 1)
+        unleveled = [0] * len(load)
+        fires = {}
+        for slot, _, minutes, window, rule in slots:
+            minutes = -minutes
+            first = int((slot - start) / _MINUTE)
+            for index in range(first, first + minutes):
+                unleveled[index] += 1
+
+            best_offset, best_score = 0, None
+            for offset in range(window + 1):
+                span = load[first + offset:first + offset + minutes]
+                score = (max(span), sum(span), offset)
+                if best_score is None or score < best_score:
+                    best_offset, best_score = offset, score
+
+            for index in range(first + best_offset, first + best_offset + minutes):
+                load[index] += 1
+            fires[(rule.key, slot)] = slot + best_offset * _MINUTE
+
+        return LoadPlan(day, fires, load, max(unleveled[:_DAY_MINUTES], default=0))
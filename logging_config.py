@@ -1,12 +1,13 @@
-from sqlalchemy import  text
+from models import Log
 import datetime
 import logging
+import threading
+import atexit
+import queue
+import time
 from config import cfg
 from typing import Optional
 
-# Configuração do postgresql
-LogSession = cfg.get_postgres_session()
-
 # --- Standard Logging Setup ---
 LOG_LEVEL = logging.INFO # Default level, can be changed
 LOG_LEVEL = logging.DEBUG # Uncomment for more detailed logs
@@ -22,36 +23,217 @@ logging.basicConfig(
     ]
 )
 
+
+class DBLogWriter:
+    """
+    Grava os logs no PostgreSQL em segundo plano.
+
+    Os registros entram em uma fila limitada e uma thread dedicada os grava
+    em lote (INSERT multi-linha) quando atinge `batch_size` registros ou a
+    cada `flush_interval` segundos. Quando a fila enche, aplica a política
+    `overflow`: 'drop_oldest', 'drop_newest' ou 'block'.
+    """
+
+    _STOP = object()
+
+    def __init__(self, session_factory, queue_size=10000, batch_size=500,
+                 flush_interval=2.0, overflow='drop_oldest'):
+        if overflow not in ('drop_oldest', 'drop_newest', 'block'):
+            raise ValueError(f"Invalid log overflow policy: {overflow}")
+
+        self._session_factory = session_factory
+        self._queue = queue.Queue(maxsize=int(queue_size))
+        self._batch_size = int(batch_size)
+        self._flush_interval = float(flush_interval)
+        self._overflow = overflow
+        self._dropped = 0
+        self._lock = threading.Lock()
+        # Serializa o teste de `_closed` com o put: nada entra na fila depois do STOP
+        self._submit_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, record: dict) -> None:
+        """Enfileira um registro sem bloquear a thread chamadora."""
+        with self._submit_lock:
+            if not self._closed:
+                self._ensure_started()
+                self._enqueue(record)
+                return
+        # Depois do close(): grava direto, sem a thread
+        self._write([record])
+
+    def _enqueue(self, record):
+        try:
+            if self._overflow == 'block':
+                self._queue.put(record)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            if self._overflow == 'drop_oldest':
+                try:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+                    self._queue.put_nowait(record)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def flush(self) -> None:
+        """Bloqueia até que todos os registros enfileirados sejam gravados."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Grava o que estiver pendente e encerra a thread."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='db-log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = []
+            stop = False
+            deadline = time.monotonic() + self._flush_interval
+
+            # Acumula até `batch_size` registros ou até o fim do intervalo
+            while len(batch) < self._batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+
+            taken = len(batch)
+            with self._lock:
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                batch.append(self._make_record(
+                    "WARNING", "logging", f"DB log queue overflow: {dropped} log records dropped."
+                ))
+
+            if batch:
+                self._write(batch)
+                for _ in range(taken):
+                    self._queue.task_done()
+
+            if stop:
+                return
+
+    def _write(self, batch):
+        session = self._session_factory()
+        try:
+            session.execute(Log.__table__.insert(), batch)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            # Avoid infinite loops if logging the error itself fails
+            print(f"CRITICAL: Failed to write {len(batch)} log(s) to database! Error: {e}")
+            for record in batch:
+                print(f"Original log message: {record['log_level']} - {record['logger_name']} - {record['log_text']}")
+        finally:
+            session.close()
+
+    @staticmethod
+    def _make_record(level, logger_name, message, job_id=None, user_name=None, duration_ms=None):
+        return {
+            "timestamp": datetime.datetime.now(),
+            "log_level": level,
+            "logger_name": logger_name,
+            "job_id": job_id,
+            "user_name": user_name,
+            "log_text": message,
+            "duration_ms": duration_ms
+        }
+
+
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
+# Nos processos filhos (modo de execução 'process') os registros não vão direto
+# ao banco: são entregues a este sink, que os envia ao processo pai.
+_db_log_sink = None
+
+
+def _get_log_writer():
+    """Cria o DBLogWriter no primeiro log (o engine do PostgreSQL só é criado aí)."""
+    global _log_writer
+    if _log_writer is None:
+        with _log_writer_lock:
+            if _log_writer is None:
+                # Configuração do postgresql
+                LogSession = cfg.get_postgres_session()
+                _log_writer = DBLogWriter(LogSession, **cfg.LOGGING)
+                atexit.register(_log_writer.close)
+    return _log_writer
+
+
 def log_to_db(level: str, logger_name: str, message: str, job_id: Optional[int] = None, user_name: Optional[str] = None, duration_ms: Optional[int] = None):
-    """Writes a log entry to the SQLite database."""
-    if not LogSession:
-        print(f"DB Logging Error (no session): {level} - {logger_name} - {message}")
+    """Enfileira uma entrada de log para gravação em lote no PostgreSQL."""
+    record = DBLogWriter._make_record(level, logger_name, message, job_id, user_name, duration_ms)
+    if _db_log_sink is not None:
+        _db_log_sink(record)
         return
 
-    session = LogSession()
     try:
-        # Use text() for raw SQL and parameter binding
-        stmt = text("""
-            INSERT INTO sql_scheduler.logs (timestamp, log_level, logger_name, job_id, user_name, log_text, duration_ms)
-            VALUES (:ts, :lvl, :ln, :jid, :un, :txt, :dur)
-        """)
-        session.execute(stmt, {
-            "ts": datetime.datetime.now(),
-            "lvl": level,
-            "ln": logger_name,
-            "jid": job_id,
-            "un": user_name,
-            "txt": message,
-            "dur": duration_ms
-        })
-        session.commit()
+        writer = _get_log_writer()
     except Exception as e:
-        session.rollback()
-        # Avoid infinite loops if logging the error itself fails
-        print(f"CRITICAL: Failed to write log to database! Error: {e}")
-        print(f"Original log message: {level} - {logger_name} - {message}")
-    finally:
-        session.close()
+        print(f"DB Logging Error (no session: {e}): {level} - {logger_name} - {message}")
+        return
+
+    writer.submit(record)
+
+
+def set_db_log_sink(sink):
+    """Desvia os registros de log_to_db para `sink(record)` (usado nos processos filhos)."""
+    global _db_log_sink
+    _db_log_sink = sink
+
+
+def forward_log_records(source_queue):
+    """
+    Inicia, no processo pai, a thread que grava no banco os registros
+    recebidos dos processos filhos. Termina ao receber None na fila.
+    """
+    def _forward():
+        while True:
+            record = source_queue.get()
+            if record is None:
+                return
+            try:
+                _get_log_writer().submit(record)
+            except Exception as e:
+                print(f"DB Logging Error (forwarded record: {e}): {record.get('log_level')} - {record.get('log_text')}")
+
+    thread = threading.Thread(target=_forward, name='child-log-forwarder', daemon=True)
+    thread.start()
+    return thread
+
+
+def shutdown_logging():
+    """Grava os logs pendentes no banco e encerra a thread de escrita."""
+    if _log_writer:
+        _log_writer.close()
 
 def get_logger(name: str):
     """Gets a logger instance."""
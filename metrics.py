@@ -0,0 +1,268 @@
+"""
+##----------------------------------------
+Métricas por execução dos jobs
+##----------------------------------------
+
+`RunMetrics` cronometra uma execução: abertura da consulta, tempo até a
+primeira linha, tempo acumulado de busca (`fetchmany`) e de conversão/escrita,
+linhas, blocos e maior bloco. O resumo de cada execução vai para a tabela
+`sql_scheduler.job_runs` (ver `scheduler._record_run`) e para o `registry`
+em memória, que gera o formato texto do Prometheus: em arquivo (textfile
+collector do node_exporter) e/ou em um endpoint HTTP `/metrics`.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+import time
+
+PREFIX = 'sqlexecutor'
+
+
+class RunMetrics:
+    """
+    Cronômetros de uma execução. `wrap_fetch` e `wrap_writer` instrumentam
+    as duas pontas do pipeline de `exporters.run_export`; a busca e a escrita
+    rodam em threads diferentes e cada uma só atualiza os seus campos.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_started = None
+        self.execute_seconds = 0.0
+        self.first_row_seconds = None
+        self.fetch_seconds = 0.0
+        self.write_seconds = 0.0
+        self.rows = 0
+        self.batches = 0
+        self.peak_batch = 0
+        self.arraysize = None
+
+    def start_query(self):
+        self.query_started = time.perf_counter()
+
+    def query_opened(self):
+        """Chamado quando o `execute` retorna (parse + abertura do cursor)."""
+        self.execute_seconds = time.perf_counter() - self.query_started
+
+    def wrap_fetch(self, fetch_batch):
+        def fetch():
+            started = time.perf_counter()
+            batch = fetch_batch()
+            self.record_fetch(batch, started)
+            return batch
+        return fetch
+
+    def record_fetch(self, batch, started):
+        """Contabiliza um bloco buscado a partir de `started` (perf_counter); usado também pela busca assíncrona."""
+        finished = time.perf_counter()
+        self.fetch_seconds += finished - started
+        if batch:
+            if self.first_row_seconds is None:
+                self.first_row_seconds = finished - (self.query_started or self.started)
+            self.rows += len(batch)
+            self.batches += 1
+            self.peak_batch = max(self.peak_batch, len(batch))
+
+    def wrap_writer(self, exporter):
+        return _TimedWriter(exporter, self)
+
+    def merge(self, parts):
+        """
+        Junta as métricas das partes de uma extração paralela: linhas, blocos
+        e tempos de busca/escrita são somados entre as conexões; o tempo até
+        a primeira linha é o da parte mais rápida.
+        """
+        for part in parts:
+            self.rows += part.rows
+            self.batches += part.batches
+            self.peak_batch = max(self.peak_batch, part.peak_batch)
+            self.fetch_seconds += part.fetch_seconds
+            self.write_seconds += part.write_seconds
+            if part.first_row_seconds is not None:
+                first_row = part.query_started + part.first_row_seconds - (self.query_started or self.started)
+                if self.first_row_seconds is None or first_row < self.first_row_seconds:
+                    self.first_row_seconds = first_row
+
+    def as_dict(self):
+        """Resumo serializável (volta de processos filhos e vira uma linha de `job_runs`)."""
+        def ms(seconds):
+            return None if seconds is None else int(seconds * 1000)
+
+        return {
+            'execute_ms': ms(self.execute_seconds),
+            'first_row_ms': ms(self.first_row_seconds),
+            'fetch_ms': ms(self.fetch_seconds),
+            'write_ms': ms(self.write_seconds),
+            'duration_ms': ms(time.perf_counter() - self.started),
+            'rows': self.rows,
+            'batches': self.batches,
+            'peak_batch_rows': self.peak_batch,
+            'arraysize': self.arraysize,
+        }
+
+
+class _TimedWriter:
+    """Soma em `metrics.write_seconds` o tempo de `write_batch` e `close` do exportador."""
+
+    def __init__(self, exporter, metrics):
+        self.exporter = exporter
+        self.metrics = metrics
+
+    def open(self, columns, description=None):
+        self.exporter.open(columns, description)
+
+    def write_batch(self, rows):
+        started = time.perf_counter()
+        try:
+            self.exporter.write_batch(rows)
+        finally:
+            self.metrics.write_seconds += time.perf_counter() - started
+
+    def abort(self):
+        if hasattr(self.exporter, 'abort'):
+            self.exporter.abort()
+
+    def close(self):
+        started = time.perf_counter()
+        try:
+            self.exporter.close()
+        finally:
+            self.metrics.write_seconds += time.perf_counter() - started
+
+
+def file_size(path):
+    """Tamanho do arquivo em bytes, ou 0 se ele não existir."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+"""
+##----------------------------------------
+Registro em memória e formato Prometheus
+##----------------------------------------
+"""
+
+# (nome, tipo, ajuda, chave do resumo, fator) das séries por job
+_JOB_SERIES = (
+    ('job_rows_total', 'counter', 'Rows exported.', 'rows', 1),
+    ('job_bytes_written_total', 'counter', 'Bytes written to export files.', 'bytes_written', 1),
+    ('job_fetch_seconds_total', 'counter', 'Time spent in fetchmany().', 'fetch_ms', 0.001),
+    ('job_write_seconds_total', 'counter', 'Time spent converting and writing batches.', 'write_ms', 0.001),
+    ('job_duration_seconds_total', 'counter', 'Wall time of job runs.', 'duration_ms', 0.001),
+)
+_LAST_SERIES = (
+    ('job_last_duration_seconds', 'Wall time of the last run.', 'duration_ms', 0.001),
+    ('job_last_first_row_seconds', 'Time to first row of the last run.', 'first_row_ms', 0.001),
+    ('job_last_execute_seconds', 'Time to open the cursor in the last run.', 'execute_ms', 0.001),
+    ('job_last_rows', 'Rows exported by the last run.', 'rows', 1),
+    ('job_last_peak_batch_rows', 'Largest fetched batch in the last run.', 'peak_batch_rows', 1),
+    ('job_last_arraysize', 'Fetch arraysize used by the last run.', 'arraysize', 1),
+    ('job_last_run_timestamp_seconds', 'Unix time the last run finished.', 'finished_at', 1),
+)
+
+
+def _format_value(value):
+    return str(value) if isinstance(value, int) else repr(round(float(value), 6))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """
+    Agrega os resumos das execuções por job e gera o texto no formato de
+    exposição do Prometheus. `add_collector(prefixo, função)` inclui valores
+    numéricos instantâneos (ex.: `JobExecutor.stats()`) como gauges.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}   # (job_id, status) -> execuções
+        self._sums = {}     # job_id -> {chave: soma}
+        self._last = {}     # job_id -> último resumo
+        self._collectors = []
+
+    def record_run(self, job_id, status, summary):
+        with self._lock:
+            self._totals[(job_id, status)] = self._totals.get((job_id, status), 0) + 1
+            sums = self._sums.setdefault(job_id, {})
+            for _, _, _, key, _ in _JOB_SERIES:
+                sums[key] = sums.get(key, 0) + (summary.get(key) or 0)
+            self._last[job_id] = dict(summary, finished_at=time.time())
+
+    def add_collector(self, prefix, collect):
+        self._collectors.append((prefix, collect))
+
+    def render(self):
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+        with self._lock:
+            header('job_runs_total', 'counter', 'Job runs by outcome.')
+            for (job_id, status), count in sorted(self._totals.items()):
+                lines.append(f'{PREFIX}_job_runs_total{{job_id="{_escape(job_id)}",status="{_escape(status)}"}} {count}')
+
+            for name, kind, help_text, key, factor in _JOB_SERIES:
+                header(name, kind, help_text)
+                for job_id, sums in sorted(self._sums.items()):
+                    lines.append(f'{PREFIX}_{name}{{job_id="{_escape(job_id)}"}} {_format_value(sums[key] * factor)}')
+
+            for name, help_text, key, factor in _LAST_SERIES:
+                header(name, 'gauge', help_text)
+                for job_id, last in sorted(self._last.items()):
+                    if last.get(key) is not None:
+                        lines.append(f'{PREFIX}_{name}{{job_id="{_escape(job_id)}"}} {_format_value(last[key] * factor)}')
+
+        for prefix, collect in self._collectors:
+            try:
+                values = collect()
+            except Exception:
+                continue  # fonte indisponível (ex.: engine ainda não criado)
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                header(f"{prefix}_{key}", 'gauge', f"{prefix} {key}.")
+                lines.append(f"{PREFIX}_{prefix}_{key} {_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """Grava o texto de forma atômica (o collector nunca lê um arquivo pela metade)."""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            handle.write(self.render())
+        os.replace(temp_path, path)
+
+
+registry = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # sem log de acesso no stderr
+
+
+def start_http_server(port, host='0.0.0.0'):
+    """Serve `/metrics` em uma thread daemon. Retorna o servidor (use `shutdown()` para parar)."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
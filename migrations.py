@@ -0,0 +1,108 @@
+"""
+##----------------------------------------
+Migração do schema sql_scheduler
+##----------------------------------------
+
+Colunas e tabelas que o serviço passou a usar depois da versão original dos
+modelos (`models.py`): formatos, compressão e modo de exportação,
+watermark, prioridade e sobreposição, modo de execução, arraysize,
+extração paralela, destino PostgreSQL, nivelamento, retomada, destinos
+extras, sonda de frescor, `updated_at` (ver change_watch) e a tabela
+`job_runs` (ver metrics).
+
+`MIGRATION_SQL` é idempotente (ADD COLUMN IF NOT EXISTS, CREATE ... IF NOT
+EXISTS, PostgreSQL 9.6+): rode antes de subir a versão nova do serviço,
+quantas vezes for preciso. Colunas NOT NULL entram com o mesmo DEFAULT do
+modelo, então as linhas existentes ficam com o comportamento antigo.
+
+    python migrations.py            aplica no PostgreSQL do datafile.json
+    python migrations.py --print    só imprime o SQL (para o DBA)
+"""
+import sys
+
+from sqlalchemy import inspect
+
+from models import Base
+
+MIGRATION_SQL = """
+ALTER TABLE sql_scheduler.jobs_he
+    ADD COLUMN IF NOT EXISTS export_format varchar(10) NOT NULL DEFAULT 'csv',
+    ADD COLUMN IF NOT EXISTS export_compression varchar(10),
+    ADD COLUMN IF NOT EXISTS compression_level integer,
+    ADD COLUMN IF NOT EXISTS export_mode varchar(12) NOT NULL DEFAULT 'full',
+    ADD COLUMN IF NOT EXISTS watermark_column text,
+    ADD COLUMN IF NOT EXISTS watermark_value text,
+    ADD COLUMN IF NOT EXISTS priority integer NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS overlap_policy varchar(10) NOT NULL DEFAULT 'skip',
+    ADD COLUMN IF NOT EXISTS execution_mode varchar(10) NOT NULL DEFAULT 'thread',
+    ADD COLUMN IF NOT EXISTS fetch_arraysize integer,
+    ADD COLUMN IF NOT EXISTS fetch_arraysize_learned integer,
+    ADD COLUMN IF NOT EXISTS split_strategy varchar(12),
+    ADD COLUMN IF NOT EXISTS split_column text,
+    ADD COLUMN IF NOT EXISTS split_table text,
+    ADD COLUMN IF NOT EXISTS split_parts integer,
+    ADD COLUMN IF NOT EXISTS split_output varchar(10) NOT NULL DEFAULT 'merge',
+    ADD COLUMN IF NOT EXISTS target_table text,
+    ADD COLUMN IF NOT EXISTS load_mode varchar(10) NOT NULL DEFAULT 'truncate',
+    ADD COLUMN IF NOT EXISTS start_tolerance integer NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS resume_key text,
+    ADD COLUMN IF NOT EXISTS sinks text,
+    ADD COLUMN IF NOT EXISTS freshness_sql text,
+    ADD COLUMN IF NOT EXISTS freshness_value text,
+    ADD COLUMN IF NOT EXISTS updated_at timestamp DEFAULT now();
+
+ALTER TABLE sql_scheduler.jobs_de
+    ADD COLUMN IF NOT EXISTS updated_at timestamp DEFAULT now();
+
+CREATE TABLE IF NOT EXISTS sql_scheduler.job_runs (
+    run_id          serial PRIMARY KEY,
+    job_id          integer NOT NULL,
+    started_at      timestamp NOT NULL,
+    finished_at     timestamp NOT NULL,
+    status          varchar(20) NOT NULL,
+    rows            bigint,
+    bytes_written   bigint,
+    batches         integer,
+    peak_batch_rows integer,
+    arraysize       integer,
+    execute_ms      integer,
+    first_row_ms    integer,
+    fetch_ms        integer,
+    write_ms        integer,
+    duration_ms     integer,
+    error_text      text
+);
+
+CREATE INDEX IF NOT EXISTS ix_sql_scheduler_job_runs_job_id ON sql_scheduler.job_runs (job_id);
+"""
+
+
+def migrate(engine):
+    """Aplica `MIGRATION_SQL` em uma transação."""
+    with engine.begin() as connection:
+        connection.exec_driver_sql(MIGRATION_SQL)
+
+
+def missing_schema(engine):
+    """
+    Tabelas e colunas dos modelos que não existem no banco ('tabela' ou
+    'tabela.coluna'). Lista vazia => schema em dia.
+    """
+    inspector = inspect(engine)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name, schema=table.schema):
+            missing.append(table.name)
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name, schema=table.schema)}
+        missing.extend(f"{table.name}.{column.name}" for column in table.columns if column.name not in existing)
+    return missing
+
+
+if __name__ == '__main__':
+    if '--print' in sys.argv[1:]:
+        print(MIGRATION_SQL.strip())
+    else:
+        from config import cfg
+        migrate(cfg.postgres_engine)
+        print("Schema sql_scheduler atualizado.")
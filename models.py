@@ -1,7 +1,7 @@
 from datetime import datetime
 from sqlalchemy import (
-    Column, Integer, String, Text, DateTime,
-    ForeignKey
+    Column, Integer, BigInteger, String, Text, DateTime,
+    ForeignKey, func
 )
 from sqlalchemy.orm import relationship, declarative_base
 
@@ -34,6 +34,44 @@ class JobHE(Base):
     export_name = Column(Text, nullable=False)
     sql_script  = Column(Text)
     last_exec   = Column(DateTime)
+    export_format = Column(String(10), nullable=False, default='csv', server_default='csv')  # 'csv', 'parquet', 'arrow', 'postgres' ou 'checksum'
+    export_compression = Column(String(10))    # None, 'gzip' ou 'zstd'
+    compression_level  = Column(Integer)       # None => padrão do codec
+    # Exportação incremental: o SQL usa o bind :watermark
+    export_mode      = Column(String(12), nullable=False, default='full', server_default='full')  # 'full', 'delta' ou 'append'
+    watermark_column = Column(Text)  # coluna do resultado cujo máximo vira o próximo watermark; None => horário da execução
+    # Último watermark bem-sucedido (ISO datetime ou número). Na primeira execução é NULL: preencha com o
+    # ponto de partida ou escreva o filtro como (:watermark IS NULL OR col > :watermark) para a carga inicial
+    watermark_value  = Column(Text)
+    # Execução: maior prioridade roda antes; política quando o job já está rodando
+    priority       = Column(Integer, nullable=False, default=0, server_default='0')
+    overlap_policy = Column(String(10), nullable=False, default='skip', server_default='skip')  # 'skip', 'coalesce' ou 'allow'
+    execution_mode = Column(String(10), nullable=False, default='thread', server_default='thread')  # 'thread' ou 'process'
+    # Busca no Oracle: override manual do arraysize e o valor aprendido nas execuções (ver fetch_tuning)
+    fetch_arraysize         = Column(Integer)
+    fetch_arraysize_learned = Column(Integer)
+    # Extração paralela (ver partitioned): estratégia, coluna/tabela, número de partes e saída
+    split_strategy = Column(String(12))  # None, 'key_range', 'rowid' ou 'partition'
+    split_column   = Column(Text)        # key_range: coluna numérica ou de data do resultado
+    split_table    = Column(Text)        # rowid/partition: tabela ('DONO.TABELA' ou 'TABELA')
+    split_parts    = Column(Integer)     # conexões simultâneas; None => scheduler.max_oracle_queries
+    split_output   = Column(String(10), nullable=False, default='merge', server_default='merge')  # 'merge' ou 'parts'
+    # Destino PostgreSQL (export_format 'postgres'): tabela e modo de carga (ver exporters.PostgresCopyExporter)
+    target_table = Column(Text)  # 'schema.tabela' ou 'tabela'
+    load_mode    = Column(String(10), nullable=False, default='truncate', server_default='truncate')  # 'truncate' ou 'swap'
+    # Nivelamento de carga: minutos que o disparo pode ser adiado após o slot (ver leveling); 0 => no horário
+    start_tolerance = Column(Integer, nullable=False, default=0, server_default='0')
+    # Retomada (ver checkpoint): coluna única e não nula do resultado que ordena a consulta; None => sem checkpoints
+    resume_key = Column(Text)
+    # Destinos extras alimentados pela mesma consulta: lista JSON de {format, path, name, compression,
+    # level, target_table, load_mode}; None => só o destino do próprio job (ver scheduler._sink_jobs)
+    sinks = Column(Text)
+    # Sonda de frescor: SELECT barato (ex.: MAX(updated_at), COUNT(*)) que roda antes da consulta; se o
+    # resultado for o mesmo da última execução bem-sucedida, a exportação é pulada ('skipped-unchanged')
+    freshness_sql   = Column(Text)
+    freshness_value = Column(Text)  # resultado da sonda na última execução bem-sucedida (JSON)
+    # Última mudança de configuração (ver change_watch); os triggers do PostgreSQL mantêm atualizado
+    updated_at = Column(DateTime, default=datetime.now, server_default=func.now())
 
     # Relação de agendamentos
     schedule = relationship(
@@ -61,6 +99,7 @@ class JobDE(Base):
     start_hour  = Column(Text, nullable=False)
     end_hour    = Column(Text)
     job_iter    = Column(Text)
+    updated_at  = Column(DateTime, default=datetime.now, server_default=func.now())
 
     # Relações reversas
     job     = relationship('JobHE',    back_populates='schedule')
@@ -79,3 +118,26 @@ class Log(Base):
     user_name   = Column(Text)
     log_text    = Column(Text, nullable=False)
     duration_ms = Column(Integer)
+
+
+# Uma linha por execução de job, com as métricas de busca e escrita (ver metrics.RunMetrics)
+class JobRun(Base):
+    __tablename__ = 'job_runs'
+    __table_args__ = {'schema': 'sql_scheduler'}
+
+    run_id          = Column(Integer, primary_key=True)
+    job_id          = Column(Integer, nullable=False, index=True)
+    started_at      = Column(DateTime, nullable=False)
+    finished_at     = Column(DateTime, nullable=False)
+    status          = Column(String(20), nullable=False)  # 'success', 'failed' ou 'skipped-unchanged'
+    rows            = Column(BigInteger)
+    bytes_written   = Column(BigInteger)
+    batches         = Column(Integer)
+    peak_batch_rows = Column(Integer)
+    arraysize       = Column(Integer)  # arraysize final usado na busca
+    execute_ms      = Column(Integer)  # execute(): parse + abertura do cursor
+    first_row_ms    = Column(Integer)  # do início da consulta até o primeiro bloco
+    fetch_ms        = Column(Integer)  # soma dos fetchmany()
+    write_ms        = Column(Integer)  # conversão + escrita + fechamento do arquivo
+    duration_ms     = Column(Integer)
+    error_text      = Column(Text)
@@ -0,0 +1,328 @@
+"""
+##----------------------------------------
+Extração paralela particionada
+##----------------------------------------
+
+Um job com `split_strategy` tem a consulta dividida em partes que rodam ao
+mesmo tempo, cada uma em sua própria conexão do pool Oracle:
+
+    'key_range'  faixas de uma coluna numérica ou de data (`split_column`):
+                 o SQL do job é envolvido em
+                 SELECT * FROM (sql) WHERE coluna >= :split_lo AND coluna < :split_hi
+                 com os limites tirados de MIN/MAX da coluna;
+    'rowid'      faixas de ROWID da tabela `split_table` (do usuário
+                 conectado), montadas a partir de USER_EXTENTS como no
+                 DBMS_PARALLEL_EXECUTE; o SQL precisa filtrar a tabela com
+                 ROWID BETWEEN :split_lo AND :split_hi;
+    'partition'  uma parte por partição de `split_table`; o SQL usa o
+                 marcador {partition}, ex.: FROM vendas PARTITION ({partition}).
+
+Saída (`split_output`):
+    'merge'  um único arquivo, na ordem das partes: a parte 0 grava direto
+             e as demais guardam os blocos em arquivos temporários enquanto
+             isso, copiados em ordem depois;
+    'parts'  um arquivo numerado por parte e um manifesto JSON. Cada parte
+             grava em `<arquivo>.partial`; só quando todas terminam os
+             temporários tomam o lugar dos arquivos e o manifesto é gravado,
+             por último. Uma execução que falha não toca nas partes nem no
+             manifesto da anterior.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date
+import json
+import os
+import pickle
+import re
+import tempfile
+
+from sqlalchemy import text
+
+from checkpoint import partial_path
+from exporters import run_export
+from metrics import file_size
+
+SPLIT_STRATEGIES = ('key_range', 'rowid', 'partition')
+SPLIT_OUTPUTS = ('merge', 'parts')
+PARTITION_MARKER = '{partition}'
+
+_ROWID_EXTENTS_SQL = """
+SELECT DBMS_ROWID.ROWID_CREATE(1, o.data_object_id, e.relative_fno, e.block_id, 0),
+       DBMS_ROWID.ROWID_CREATE(1, o.data_object_id, e.relative_fno, e.block_id + e.blocks - 1, 32767),
+       e.blocks
+  FROM user_extents e
+  JOIN user_objects o
+    ON o.object_name = e.segment_name
+   AND NVL(o.subobject_name, '-') = NVL(e.partition_name, '-')
+ WHERE e.segment_name = :table_name
+   AND o.object_type LIKE 'TABLE%'
+ ORDER BY o.data_object_id, e.relative_fno, e.block_id
+"""
+
+_PARTITIONS_SQL = """
+SELECT partition_name
+  FROM all_tab_partitions
+ WHERE table_owner = NVL(:owner, SYS_CONTEXT('USERENV', 'CURRENT_SCHEMA'))
+   AND table_name = :table_name
+ ORDER BY partition_position
+"""
+
+
+class Part:
+    """Uma parte da consulta: SQL, parâmetros e um rótulo para o log/manifesto."""
+
+    __slots__ = ('index', 'sql', 'params', 'label')
+
+    def __init__(self, index, sql, params, label):
+        self.index = index
+        self.sql = sql
+        self.params = params
+        self.label = label
+
+
+def _quote_identifier(name):
+    if re.fullmatch(r'[A-Za-z][\w$#]*', name):
+        return name
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _split_table_name(name):
+    """'DONO.TABELA' ou 'TABELA' => (dono ou None, tabela), em maiúsculas."""
+    owner, _, table = name.strip().upper().rpartition('.')
+    return owner or None, table
+
+
+def _range_bounds(low, high, count):
+    """Até count+1 limites crescentes entre low e high (números ou datas), sem repetição."""
+    if isinstance(low, (datetime, date)):
+        step = (high - low) / count
+        bounds = [low + step * i for i in range(count)]
+    elif isinstance(low, int) and isinstance(high, int):
+        bounds = [low + (high - low) * i // count for i in range(count)]
+    else:
+        bounds = [low + (high - low) * i / count for i in range(count)]
+    bounds.append(high)
+    return sorted(set(bounds))
+
+
+def plan_key_range(session, sql, params, column, count):
+    sql = sql.strip().rstrip(';')
+    column = _quote_identifier(column)
+    low, high = session.execute(
+        text(f"SELECT MIN(split_src.{column}), MAX(split_src.{column}) FROM ({sql}) split_src"),
+        params
+    ).one()
+    if low is None:
+        return [Part(0, sql, params, 'empty')]
+
+    bounds = _range_bounds(low, high, count)
+    if len(bounds) == 1:
+        bounds = bounds * 2  # um único valor: uma parte com lo = hi
+    parts = []
+    for index, (lo, hi) in enumerate(zip(bounds, bounds[1:])):
+        last = index == len(bounds) - 2
+        parts.append(Part(
+            index,
+            f"SELECT * FROM ({sql}) split_src WHERE split_src.{column} >= :split_lo "
+            f"AND split_src.{column} {'<=' if last else '<'} :split_hi",
+            dict(params, split_lo=lo, split_hi=hi),
+            f"{column} [{lo}, {hi}{']' if last else ')'}"
+        ))
+    return parts
+
+
+def plan_rowid(session, sql, params, table, count):
+    if not (re.search(r':split_lo\b', sql) and re.search(r':split_hi\b', sql)):
+        raise ValueError("Split strategy 'rowid' requires the SQL to filter with ROWID BETWEEN :split_lo AND :split_hi")
+    _, table_name = _split_table_name(table)
+    extents = session.execute(text(_ROWID_EXTENTS_SQL), {'table_name': table_name}).all()
+    if not extents:
+        raise ValueError(f"No extents found for table '{table}' (rowid split needs a table owned by the connected user)")
+
+    # Extensões consecutivas agrupadas em `count` faixas com blocos parecidos
+    per_part = sum(blocks for _, _, blocks in extents) / count
+    groups, current, current_blocks = [], [], 0
+    for extent in extents:
+        current.append(extent)
+        current_blocks += extent[2]
+        if current_blocks >= per_part and len(groups) < count - 1:
+            groups.append(current)
+            current, current_blocks = [], 0
+    if current:
+        groups.append(current)
+
+    return [
+        Part(index, sql, dict(params, split_lo=group[0][0], split_hi=group[-1][1]), f"ROWID {group[0][0]}..{group[-1][1]}")
+        for index, group in enumerate(groups)
+    ]
+
+
+def plan_partition(session, sql, params, table):
+    if PARTITION_MARKER not in sql:
+        raise ValueError(f"Split strategy 'partition' requires the SQL to contain the marker {PARTITION_MARKER}")
+    owner, table_name = _split_table_name(table)
+    names = session.execute(text(_PARTITIONS_SQL), {'owner': owner, 'table_name': table_name}).scalars().all()
+    if not names:
+        raise ValueError(f"Table '{table}' has no partitions")
+    return [
+        Part(index, sql.replace(PARTITION_MARKER, _quote_identifier(name)), params, f"PARTITION {name}")
+        for index, name in enumerate(names)
+    ]
+
+
+def plan_parts(session, job, params, count):
+    """Monta as partes do job conforme `split_strategy`. Levanta ValueError se a configuração for inválida."""
+    strategy = job.split_strategy
+    if strategy == 'key_range':
+        if not job.split_column:
+            raise ValueError("Split strategy 'key_range' requires split_column")
+        return plan_key_range(session, job.sql_script, params, job.split_column, count)
+    if strategy in ('rowid', 'partition') and not job.split_table:
+        raise ValueError(f"Split strategy '{strategy}' requires split_table")
+    if strategy == 'rowid':
+        return plan_rowid(session, job.sql_script, params, job.split_table, count)
+    if strategy == 'partition':
+        return plan_partition(session, job.sql_script, params, job.split_table)
+    raise ValueError(f"Invalid split strategy '{strategy}'. Expected one of: {', '.join(SPLIT_STRATEGIES)}.")
+
+
+"""
+##----------------------------------------
+Execução das partes
+##----------------------------------------
+"""
+
+
+def _spool(columns, description, fetch_batch):
+    """Guarda os blocos da parte em um arquivo temporário. Retorna (arquivo, linhas)."""
+    handle = tempfile.TemporaryFile()
+    rows = 0
+    try:
+        while True:
+            batch = fetch_batch()
+            if not batch:
+                break
+            pickle.dump([tuple(row) for row in batch], handle, protocol=pickle.HIGHEST_PROTOCOL)
+            rows += len(batch)
+    except BaseException:
+        handle.close()
+        raise
+    handle.seek(0)
+    return handle, rows
+
+
+def _replay(handle, exporter):
+    with handle:
+        while True:
+            try:
+                batch = pickle.load(handle)
+            except EOFError:
+                return
+            exporter.write_batch(batch)
+
+
+def _discard_spools(futures):
+    for future in futures:
+        if not future.cancelled() and future.exception() is None:
+            future.result()[0].close()
+
+
+def export_merged(parts, parallelism, run_part, exporter, queue_depth=2):
+    """
+    Roda as partes em até `parallelism` conexões e grava tudo em `exporter`
+    na ordem das partes. `run_part(part, consume)` executa a consulta da
+    parte e chama `consume(columns, description, fetch_batch)`.
+    Retorna o total de linhas.
+    """
+    def first(columns, description, fetch_batch):
+        exporter.open(columns, description)
+        return run_export(fetch_batch, exporter, queue_depth=queue_depth)
+
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='split-part') as pool:
+        head = pool.submit(run_part, parts[0], first)
+        pending = [pool.submit(run_part, part, _spool) for part in parts[1:]]
+        try:
+            total = head.result()
+            while pending:
+                handle, rows = pending.pop(0).result()
+                _replay(handle, exporter)
+                total += rows
+            return total
+        except BaseException:
+            # Cancela o que não começou, espera o resto e apaga os spools prontos
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+            _discard_spools(pending)
+            raise
+
+
+def export_parts(parts, parallelism, run_part, make_exporter, queue_depth=2):
+    """
+    Cada parte em seu próprio arquivo, em paralelo. `make_exporter(index)`
+    devolve (caminho, exportador gravando em `partial_path(caminho)`). Se todas as partes terminam, os temporários substituem os
+    arquivos; se alguma falha, os temporários são apagados e os arquivos
+    existentes ficam como estavam. Retorna a lista de partes do manifesto.
+    """
+    written = {}
+
+    def consume_for(part):
+        def consume(columns, description, fetch_batch):
+            path, exporter = make_exporter(part.index)
+            written[part.index] = path
+            try:
+                exporter.open(columns, description)
+                rows = run_export(fetch_batch, exporter, queue_depth=queue_depth)
+            finally:
+                exporter.close()
+            return {
+                'index': part.index, 'file': os.path.basename(path), 'rows': rows,
+                'bytes': file_size(partial_path(path)), 'range': part.label,
+            }
+        return consume
+
+    try:
+        with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='split-part') as pool:
+            futures = [pool.submit(run_part, part, consume_for(part)) for part in parts]
+            try:
+                entries = [future.result() for future in futures]
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    except BaseException:
+        # O `with` já esperou as partes em andamento: nenhum temporário está aberto
+        for path in written.values():
+            _remove_quietly(partial_path(path))
+        raise
+
+    for path in written.values():
+        os.replace(partial_path(path), path)
+    return entries
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def part_file_name(export_name, index, extension):
+    return f"{export_name}_part{index:04d}{extension}"
+
+
+def remove_stale_parts(directory, export_name, extension, keep):
+    """Apaga arquivos de partes de execuções anteriores que não fazem parte desta."""
+    pattern = re.compile(re.escape(export_name) + r'_part(\d{4})' + re.escape(extension) + '$')
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match and int(match.group(1)) >= keep:
+            os.remove(os.path.join(directory, name))
+
+
+def write_manifest(path, manifest):
+    """Grava o manifesto de forma atômica (quem lê nunca vê um manifesto incompleto)."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2, default=str)
+    os.replace(temp_path, path)
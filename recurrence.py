@@ -0,0 +1,348 @@
+"""
+##----------------------------------------
+Motor de recorrência dos jobs
+##----------------------------------------
+
+Em vez de expandir cada linha de `jobs_de` em uma lista de horários "HH:MM"
+(um registro e uma entrada de agendamento por slot), cada linha vira uma
+única regra (`ScheduleRule`) que calcula sob demanda apenas o próximo disparo.
+As regras ficam em um min-heap ordenado pelo próximo disparo, então memória e
+custo de despacho crescem com o número de regras, não com o número de slots.
+"""
+from datetime import datetime, timedelta
+import heapq
+import itertools
+import threading
+
+
+class JobSpec:
+    """Dados de um job (`jobs_he`), compartilhados por todas as suas regras."""
+
+    __slots__ = (
+        'job_id', 'name', 'export_path', 'export_name', 'sql_script',
+        'export_format', 'export_compression', 'compression_level',
+        'export_mode', 'watermark_column', 'priority', 'overlap_policy',
+        'execution_mode', 'fetch_arraysize', 'split_strategy', 'split_column',
+        'split_table', 'split_parts', 'split_output', 'target_table', 'load_mode',
+        'start_tolerance', 'resume_key', 'sinks', 'freshness_sql'
+    )
+
+    def __init__(self, job_id, name, export_path, export_name, sql_script, export_format='csv',
+                 export_compression=None, compression_level=None, export_mode='full',
+                 watermark_column=None, priority=0, overlap_policy='skip', execution_mode='thread',
+                 fetch_arraysize=None, split_strategy=None, split_column=None, split_table=None,
+                 split_parts=None, split_output='merge', target_table=None, load_mode='truncate',
+                 start_tolerance=0, resume_key=None, sinks=None, freshness_sql=None):
+        self.job_id = job_id
+        self.name = name
+        self.export_path = export_path
+        self.export_name = export_name
+        self.sql_script = sql_script
+        self.export_format = export_format
+        self.export_compression = export_compression
+        self.compression_level = compression_level
+        self.export_mode = export_mode
+        self.watermark_column = watermark_column
+        self.priority = priority
+        self.overlap_policy = overlap_policy
+        self.execution_mode = execution_mode
+        self.fetch_arraysize = fetch_arraysize
+        self.split_strategy = split_strategy
+        self.split_column = split_column
+        self.split_table = split_table
+        self.split_parts = split_parts
+        self.split_output = split_output
+        self.target_table = target_table
+        self.load_mode = load_mode
+        self.start_tolerance = start_tolerance
+        self.resume_key = resume_key
+        self.sinks = sinks
+        self.freshness_sql = freshness_sql
+
+    @classmethod
+    def from_model(cls, job):
+        """Cria a partir de um objeto `models.JobHE`."""
+        return cls(
+            job.job_id, job.job_name, job.export_path, job.export_name, job.sql_script,
+            export_format=(job.export_format or 'csv').lower(),
+            export_compression=job.export_compression,
+            compression_level=job.compression_level,
+            export_mode=(job.export_mode or 'full').lower(),
+            watermark_column=job.watermark_column,
+            priority=job.priority or 0,
+            overlap_policy=(job.overlap_policy or 'skip').lower(),
+            execution_mode=(job.execution_mode or 'thread').lower(),
+            fetch_arraysize=job.fetch_arraysize,
+            split_strategy=job.split_strategy.lower() if job.split_strategy else None,
+            split_column=job.split_column,
+            split_table=job.split_table,
+            split_parts=job.split_parts,
+            split_output=(job.split_output or 'merge').lower(),
+            target_table=job.target_table,
+            load_mode=(job.load_mode or 'truncate').lower(),
+            start_tolerance=job.start_tolerance or 0,
+            resume_key=job.resume_key,
+            sinks=job.sinks,
+            freshness_sql=job.freshness_sql
+        )
+
+    def replace(self, **changes):
+        """Cópia do job com alguns campos trocados (ex.: os destinos extras)."""
+        values = {attr: getattr(self, attr) for attr in self.__slots__}
+        values.update(changes)
+        return type(self)(**values)
+
+    def signature(self):
+        """Tupla que muda sempre que algum dado relevante do job mudar."""
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+
+class ScheduleRule:
+    """
+    Uma linha de `jobs_de`: dia da semana, hora inicial, hora final opcional e
+    periodicidade em minutos. Sem hora final, dispara uma vez no dia.
+    """
+
+    __slots__ = ('schedule_id', 'job', 'weekday', 'start', 'end', 'step')
+
+    def __init__(self, schedule_id, job, weekday, start, end=None, step=None):
+        self.schedule_id = schedule_id
+        self.job = job
+        self.weekday = weekday    # 0 = segunda ... 6 = domingo
+        self.start = start        # timedelta desde a meia-noite
+        self.end = end            # timedelta desde a meia-noite ou None
+        self.step = step          # timedelta ou None
+
+    @classmethod
+    def from_model(cls, sched, job, weekday):
+        """
+        Cria a partir de um `models.JobDE`. `job` é o JobSpec compartilhado e
+        `weekday` o número do dia (0 = segunda). Levanta ValueError se os
+        horários ou a periodicidade forem inválidos.
+        """
+        start = _parse_hhmm(sched.start_hour)
+        if sched.end_hour is None:
+            return cls(sched.schedule_id, job, weekday, start)
+
+        end = _parse_hhmm(sched.end_hour)
+        step = timedelta(minutes=float(sched.job_iter))
+        if step <= timedelta(0):
+            raise ValueError(f"Invalid job_iter '{sched.job_iter}': must be greater than zero")
+        return cls(sched.schedule_id, job, weekday, start, end, step)
+
+    @property
+    def key(self):
+        return (self.job.job_id, self.schedule_id)
+
+    def signature(self):
+        """Tupla que muda sempre que a regra ou o job associado mudarem."""
+        return (self.weekday, self.start, self.end, self.step) + self.job.signature()
+
+    def next_fire(self, after):
+        """Próximo disparo estritamente posterior a `after`, ou None."""
+        if self.end is not None and self.end < self.start:
+            return None
+
+        base_day = datetime.combine(after.date(), datetime.min.time())
+
+        for offset in range(8):
+            day = base_day + timedelta(days=offset)
+            if day.weekday() != self.weekday:
+                continue
+
+            first = day + self.start
+            if first > after:
+                return first
+            if self.end is None:
+                continue
+
+            # Primeiro slot do dia depois de `after`
+            elapsed = after - first
+            candidate = first + (elapsed // self.step + 1) * self.step
+            if candidate <= day + self.end:
+                return candidate
+
+        return None
+
+    def slot_count(self):
+        """Quantidade de disparos por semana (apenas informativo)."""
+        if self.end is None:
+            return 1
+        if self.end < self.start:
+            return 0
+        return (self.end - self.start) // self.step + 1
+
+
+class PeriodicTask:
+    """Tarefa interna executada a cada `interval` (ex.: reload dos jobs)."""
+
+    __slots__ = ('key', 'interval', 'callback')
+
+    def __init__(self, key, interval, callback):
+        self.key = key
+        self.interval = interval
+        self.callback = callback
+
+    def next_fire(self, after):
+        return after + self.interval
+
+
+class _Deferred:
+    """Disparo de uma regra adiado dentro da tolerância do job (ver leveling)."""
+
+    __slots__ = ('rule',)
+
+    def __init__(self, rule):
+        self.rule = rule
+
+    @property
+    def key(self):
+        return self.rule.key
+
+
+class RuleScheduler:
+    """
+    Agenda regras em um min-heap pelo próximo disparo.
+
+    Remoções e substituições são preguiçosas: a entrada antiga do heap fica
+    lá e é descartada quando chega ao topo, se a regra não for mais a atual.
+    Regras de jobs vencidas são entregues em lote para `dispatch`, que recebe
+    a lista de `ScheduleRule` devidas no mesmo instante.
+
+    Com um `leveler` (ver leveling.LoadLeveler), o slot de um job com
+    tolerância vira um disparo adiado para o minuto escolhido no plano do dia.
+    """
+
+    def __init__(self, dispatch, leveler=None):
+        self._dispatch = dispatch
+        self._leveler = leveler
+        self._rules = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __contains__(self, key):
+        return key in self._rules
+
+    def get(self, key):
+        return self._rules.get(key)
+
+    def keys(self):
+        with self._lock:
+            return list(self._rules)
+
+    def add(self, rule, now=None):
+        """Adiciona (ou substitui, se a chave já existir) uma regra."""
+        with self._lock:
+            self._rules[rule.key] = rule
+            self._push(rule, rule.next_fire(now or datetime.now()))
+            self._invalidate(rule)
+
+    def set_dispatch(self, dispatch):
+        """Troca o destino dos disparos (ex.: runtime asyncio, ver async_runtime)."""
+        with self._lock:
+            self._dispatch = dispatch
+
+    def every(self, key, interval, callback, now=None):
+        """Registra uma tarefa interna periódica."""
+        self.add(PeriodicTask(key, interval, callback), now)
+
+    def remove(self, key):
+        with self._lock:
+            rule = self._rules.pop(key, None)
+            self._invalidate(rule)
+            return rule
+
+    def clear(self):
+        with self._lock:
+            self._rules.clear()
+            self._heap.clear()
+            if self._leveler is not None:
+                self._leveler.invalidate()
+
+    def _invalidate(self, rule):
+        if self._leveler is not None and isinstance(rule, ScheduleRule):
+            self._leveler.invalidate()
+
+    def job_rules(self):
+        with self._lock:
+            return [rule for rule in self._rules.values() if isinstance(rule, ScheduleRule)]
+
+    def load_plan(self, day=None):
+        """Plano de carga do dia (hoje por padrão), ou None sem `leveler`."""
+        if self._leveler is None:
+            return None
+        return self._leveler.plan(self.job_rules(), day or datetime.now().date())
+
+    def _push(self, rule, when):
+        if when is not None:
+            heapq.heappush(self._heap, (when, next(self._seq), rule))
+
+    def _prune(self):
+        # Descarta entradas de regras removidas ou substituídas (inclusive disparos adiados delas)
+        while self._heap:
+            entry = self._heap[0][2]
+            if self._rules.get(entry.key) is (entry.rule if isinstance(entry, _Deferred) else entry):
+                return
+            heapq.heappop(self._heap)
+
+    @property
+    def next_run(self):
+        with self._lock:
+            self._prune()
+            return self._heap[0][0] if self._heap else None
+
+    def idle_seconds(self, now=None):
+        """Segundos até o próximo disparo (negativo se atrasado) ou None."""
+        next_run = self.next_run
+        if next_run is None:
+            return None
+        return (next_run - (now or datetime.now())).total_seconds()
+
+    def run_pending(self, now=None):
+        """
+        Dispara tudo o que venceu até `now`. Cada regra é reagendada a partir
+        de `now`, então slots perdidos (ex.: processo parado) não se acumulam.
+        Retorna a quantidade de regras de jobs despachadas.
+        """
+        now = now or datetime.now()
+        due, tasks = [], []
+        job_rules = None  # regras do plano de carga, montadas uma vez por chamada
+
+        with self._lock:
+            while True:
+                self._prune()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                when, _, rule = heapq.heappop(self._heap)
+                if isinstance(rule, _Deferred):
+                    due.append(rule.rule)
+                    continue
+                self._push(rule, rule.next_fire(now))
+                if isinstance(rule, PeriodicTask):
+                    tasks.append(rule)
+                    continue
+                if self._leveler is None:
+                    fire_at = when
+                else:
+                    if job_rules is None:
+                        job_rules = self.job_rules()
+                    fire_at = self._leveler.fire_time(job_rules, rule, when)
+                if fire_at > now:
+                    self._push(_Deferred(rule), fire_at)
+                else:
+                    due.append(rule)
+
+        for task in tasks:
+            task.callback()
+        if due:
+            self._dispatch(due)
+        return len(due)
+
+
+def _parse_hhmm(value):
+    parsed = datetime.strptime(value, "%H:%M")
+    return timedelta(hours=parsed.hour, minutes=parsed.minute)
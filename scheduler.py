@@ -1,311 +1,1379 @@
 from config import cfg
-from models import JobHE, JobDE, Weekday, Log
-from sqlalchemy import text
-from auxils import is_select_query
+from models import JobHE, JobDE, Weekday, Log, JobRun
+from sqlalchemy import text, func, select
+from sqlalchemy.orm import joinedload
+from auxils import is_select_query, normalize_sql, set_locale
+from recurrence import JobSpec, ScheduleRule, RuleScheduler
+from leveling import LoadLeveler
+from change_watch import ChangeWatcher, ChangeListener, TRIGGERS_SQL
+from exporters import get_exporter_class, run_export, FanOutExporter, PostgresCopyExporter
+from job_runner import JobExecutor
+from async_runtime import AsyncJobRunner, AsyncDBLogWriter, run_timer_loop, run_export_async
+from fetch_tuning import FetchSizing
+from checkpoint import Checkpoint, CheckpointWriter, partial_path, checkpoint_path, resume_sql, signature_for, discard as discard_checkpoint
+from partitioned import (
+    SPLIT_STRATEGIES, SPLIT_OUTPUTS, plan_parts, export_merged, export_parts,
+    part_file_name, remove_stale_parts, write_manifest
+)
+from metrics import RunMetrics, file_size, registry as metrics_registry, start_http_server
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack, ExitStack, nullcontext
 
-from concurrent.futures import ThreadPoolExecutor
-
+import asyncio
+import json
+import multiprocessing
+import threading
 import oracledb
-import schedule
-import csv
 import time
 import os
+import re
 
 # --- Import Logging ---
-from logging_config import get_logger, log_info, log_warning, log_error, log_exception, log_debug
+from logging_config import get_logger, log_info, log_warning, log_error, log_exception, log_debug, shutdown_logging, set_db_log_sink, forward_log_records
 logger = get_logger('scheduler')
 # --- End Logging Import ---
 
 ## CONSTANTES
 
-# abreviações PT → método schedule em inglês
+# abreviações PT → número do dia da semana (datetime.weekday())
 DAY_MAP = {
-    'Seg': 'monday',
-    'Ter': 'tuesday',
-    'Qua': 'wednesday',
-    'Qui': 'thursday',
-    'Sex': 'friday',
-    'Sáb': 'saturday',
-    'Dom': 'sunday'
+    'Seg': 0,
+    'Ter': 1,
+    'Qua': 2,
+    'Qui': 3,
+    'Sex': 4,
+    'Sáb': 5,
+    'Dom': 6
 }
 
-# Thread pool (ajuste max_workers conforme CPUs / volume de jobs)
-# TODO: Implementar numero de workers no datafile.json
-executor = ThreadPoolExecutor(max_workers=6)
+# Intervalo do reload periódico dos jobs
+RELOAD_INTERVAL = timedelta(hours=2)
+
+# full: reexporta tudo; delta: um arquivo por execução só com as linhas novas;
+# append: acrescenta as linhas novas ao arquivo existente (apenas CSV)
+EXPORT_MODES = ('full', 'delta', 'append')
+
+# Filtro que trata o :watermark nulo da primeira execução (carga inicial completa)
+_NULL_WATERMARK = re.compile(r':watermark\s+IS\s+NULL|\b(?:NVL|COALESCE)\s*\(\s*:watermark\b', re.IGNORECASE)
+
+# Horário do Oracle para o watermark por tempo (sem fuso, como as colunas DATE/TIMESTAMP)
+DB_NOW_SQL = "SELECT CAST(SYSTIMESTAMP AS TIMESTAMP) FROM DUAL"
+
+# Resultado de uma execução pulada pela sonda de frescor (jobs_he.freshness_sql)
+SKIPPED_UNCHANGED = 'skipped-unchanged'
+
+# Executor dos jobs (ajuste scheduler.max_workers e scheduler.max_oracle_queries no
+# datafile.json conforme CPUs / volume de jobs; o pool de conexões Oracle usa o mesmo
+# tamanho por padrão). Criado no primeiro uso.
+_executor = None
+_executor_lock = threading.Lock()
 
 
-def generate_time_slots(hora_ini, hora_fim, periodicity):
-    fmt   = "%H:%M"
-    inicio = datetime.strptime(hora_ini, fmt)
-    slots = []
-    
-    if hora_fim is None:
-        slots.append(inicio.strftime(fmt))
-    else:        
-        fim    = datetime.strptime(hora_fim, fmt)
-        delta = timedelta(minutes=float(periodicity))
+def get_executor():
+    global _executor
+    if _executor is None:
+        # Duas threads no primeiro uso criariam dois executores, cada um com o seu OracleLimiter
+        with _executor_lock:
+            if _executor is None:
+                _executor = JobExecutor(cfg.MAX_WORKERS, cfg.MAX_ORACLE_QUERIES)
+    return _executor
 
-        atual    = inicio
-        # Vai adicionando até chegar (ou ultrapassar) o fim
-        while atual <= fim:
-            slots.append(atual.strftime(fmt))
-            atual += delta
-        
-        del fim, delta, atual
-    
-    del inicio, hora_ini, hora_fim, periodicity
 
-    return slots
+# Intervalo do log de estatísticas do executor e do pool Oracle
+STATS_INTERVAL = timedelta(minutes=15)
 
 
 def fetch_jobs(job_id=None):
+    """
+    Carrega os jobs ativos e seus agendamentos em uma única consulta
+    (JOIN com `jobs_de`) e devolve uma `ScheduleRule` por linha de `jobs_de`.
+    Todas as regras de um mesmo job compartilham o mesmo `JobSpec`.
+
+    Retorna None em caso de erro, para que o chamador consiga distinguir
+    "nenhum job ativo" de "falha ao consultar o banco".
+    """
     PostgreSession = cfg.get_postgres_session()
 
     log_debug(logger, f"Fetching jobs from DB. Specific job_id: {job_id if job_id else 'All active'}")
 
     try:
-        # só traz aqueles com status = 'Y' (ativo)
-        if job_id is None:
-            with PostgreSession() as session:
-                jobs = session.query(JobHE).filter_by(job_status='Y').all()
-        else:
-            with PostgreSession() as session:
-                jobs = session.query(JobHE).filter_by(job_status='Y', job_id=job_id).all()
-
         result = []
 
-        job_ids_fetched = [j.job_id for j in jobs]
-        if not job_ids_fetched:
+        with PostgreSession() as session:
+            # só traz aqueles com status = 'Y' (ativo), já com os agendamentos
+            query = session.query(JobHE).options(joinedload(JobHE.schedule)).filter_by(job_status='Y')
+            if job_id is not None:
+                query = query.filter_by(job_id=job_id)
+            jobs = query.all()
+
+            if not jobs:
                 log_debug(logger, "No active jobs found matching criteria.")
                 return result # Vazio
 
-        for job in jobs:
-            # coleta os horários/dias associados
-
-            with PostgreSession() as session:
-                scheds = session.query(JobDE).filter_by(job_id=job.job_id).all()
-            
-            # Cada linha de scheds é um dia da semana
-            for s in scheds:
-
-                # cria slots de hora
-                """
-                Obtem `start_hour`, `end_hour` e `job_iter`
-                e cria uma lista com todos os horários possíveis com as combinações.
-                """
-                time_slots = generate_time_slots(s.start_hour, s.end_hour, s.job_iter)
-
-                for ts in time_slots:
-                    result.append({
-                        'job_id': job.job_id,
-                        'schedule_id': s.schedule_id,
-                        'name': job.job_name,
-                        'export_path': job.export_path,
-                        'export_name': job.export_name,
-                        'sql_script': job.sql_script,
-                        'day': s.job_day,
-                        'time': ts
-                    })
-        
-        log_debug(logger, f"Fetched {len(result)} job schedule instances.")
+            for job in jobs:
+                spec = JobSpec.from_model(job)
+
+                # Cada linha de job.schedule é um dia da semana
+                for s in job.schedule:
+                    weekday = DAY_MAP.get(s.job_day)
+                    if weekday is None:
+                        log_warning(logger, f"Invalid day '{s.job_day}' for job '{job.job_name}' (ID: {job.job_id}). Skipping this schedule.", job_id=job.job_id)
+                        continue
+                    try:
+                        result.append(ScheduleRule.from_model(s, spec, weekday))
+                    except (TypeError, ValueError) as e:
+                        log_warning(logger, f"Invalid schedule {s.schedule_id} for job '{job.job_name}' (ID: {job.job_id}): {e}. Skipping this schedule.", job_id=job.job_id)
+
+        log_debug(logger, f"Fetched {len(result)} schedule rules.")
         return result
     except Exception as e:
         log_exception(logger, f"Error fetching jobs from database: {e}")
-        return [] # Return empty list on error
+        return None
+
+
+def _parse_watermark(value):
+    """Converte o watermark salvo em texto de volta para datetime, int ou Decimal."""
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return value
 
 
-def execute_job(job_data):
-    start_time = time.time()
+def _format_watermark(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _load_watermark(job_id):
+    """Lê o watermark atual do job direto do banco (o JobSpec pode estar defasado)."""
     PostgreSession = cfg.get_postgres_session()
-    job_logger = get_logger('executor')
+    with PostgreSession() as session:
+        job_row = session.get(JobHE, job_id)
+        return _parse_watermark(job_row.watermark_value) if job_row else None
 
-    # job infos
-    job_id = job_data.get('job_id', None)
-    job_name = job_data.get('name', 'Unknown Job')
-    absolute_path = None
 
-    log_info(job_logger, f"Starting job execution: '{job_name}'", job_id=job_id)
-    
-    def set_exec_time():
-        with PostgreSession() as session:
-            job = session.get(JobHE, job_id)
+def _load_learned_arraysize(job_id):
+    """arraysize aprendido nas execuções anteriores do job (ver fetch_tuning)."""
+    PostgreSession = cfg.get_postgres_session()
+    with PostgreSession() as session:
+        job_row = session.get(JobHE, job_id)
+        return job_row.fetch_arraysize_learned if job_row else None
 
-            if job:
-                job.last_exec = datetime.now()
-                session.commit()
 
-    try:
-        archive_path = job_data['export_path']
-        archive_name_with_extention = job_data['export_name'] + '.csv'
+def _save_learned_arraysize(job_ids, arraysize):
+    PostgreSession = cfg.get_postgres_session()
+    with PostgreSession() as session:
+        for job_row in session.query(JobHE).filter(JobHE.job_id.in_(job_ids)):
+            job_row.fetch_arraysize_learned = arraysize
+        session.commit()
 
-        sql = job_data['sql_script']
 
-        if not sql:
-            log_error(job_logger, f"Job '{job_name}' has no SQL script defined.", job_id=job_id)
-            return
-    
-        absolute_path = os.path.join(archive_path, archive_name_with_extention)
-        log_debug(job_logger, f"Job '{job_name}': Export path: {absolute_path}", job_id=job_id)
+def _track_max(fetch_batch, index, state):
+    """Envolve `fetch_batch` guardando em state['max'] o maior valor da coluna `index`."""
+    def fetch():
+        batch = fetch_batch()
+        _update_max(batch, index, state)
+        return batch
+    return fetch
+
+
+def _update_max(batch, index, state):
+    values = [row[index] for row in batch if row[index] is not None]
+    if values:
+        batch_max = max(values)
+        if state.get('max') is None or batch_max > state['max']:
+            state['max'] = batch_max
+
+
+class ExportTarget:
+    """Destino de um job em uma execução: arquivo, exportador e estado do watermark."""
+
+    __slots__ = (
+        'job', 'sql', 'params', 'path', 'write_path', 'exporter', 'tracked', 'error', 'rows',
+        'resumed_rows', 'size_before', 'bytes_written', 'sink'
+    )
+
+    def __init__(self, job, params, path, exporter=None, sql=None, write_path=None):
+        self.job = job
+        self.sink = None  # destino extra do job (ver _sink_jobs): rótulo para os logs
+        self.sql = sql or job.sql_script
+        self.params = params
+        self.path = path
+        self.write_path = write_path or path  # arquivo temporário até o rename final (ver checkpoint)
+        self.exporter = exporter
+        self.tracked = {}
+        self.error = None
+        self.rows = 0
+        self.resumed_rows = 0  # linhas já gravadas por uma execução anterior (retomada)
+        self.size_before = 0   # modo append ou retomada: o arquivo já tem dados
+        self.bytes_written = 0
+
+
+def _prepare_target(job, job_logger, run_started):
+    """
+    Valida o job e monta o seu destino (ainda não aberto).
+    Retorna None se o job não puder rodar; o motivo já fica registrado no log.
+    """
+    job_id = job.job_id
+    job_name = job.name or 'Unknown Job'
+
+    archive_path = job.export_path
+    exporter_class = get_exporter_class(job.export_format)
+    extension = exporter_class.extension_for(job.export_compression)
+    export_mode = job.export_mode
+
+    if export_mode not in EXPORT_MODES:
+        log_error(job_logger, f"Job '{job_name}': Invalid export mode '{export_mode}'. Expected one of: {', '.join(EXPORT_MODES)}.", job_id=job_id)
+        return None
+
+    if job.split_strategy:
+        if job.split_strategy not in SPLIT_STRATEGIES:
+            log_error(job_logger, f"Job '{job_name}': Invalid split strategy '{job.split_strategy}'. Expected one of: {', '.join(SPLIT_STRATEGIES)}.", job_id=job_id)
+            return None
+        if job.split_output not in SPLIT_OUTPUTS:
+            log_error(job_logger, f"Job '{job_name}': Invalid split output '{job.split_output}'. Expected one of: {', '.join(SPLIT_OUTPUTS)}.", job_id=job_id)
+            return None
+        if export_mode != 'full':
+            log_error(job_logger, f"Job '{job_name}': Parallel split is only supported with export mode 'full'.", job_id=job_id)
+            return None
+
+    if job.resume_key:
+        if job.export_mode != 'full' or (job.export_format or 'csv') != 'csv' or job.split_strategy:
+            log_error(job_logger, f"Job '{job_name}': Resumable exports (resume_key) require CSV format, export mode 'full' and no parallel split.", job_id=job_id)
+            return None
+
+    if job.sinks:
+        if job.export_mode != 'full' or job.split_strategy or job.resume_key:
+            log_error(job_logger, f"Job '{job_name}': Extra sinks require export mode 'full', no parallel split and no resume_key.", job_id=job_id)
+            return None
+
+    if job.export_format == 'postgres':
+        if not job.target_table:
+            log_error(job_logger, f"Job '{job_name}': Export format 'postgres' requires target_table.", job_id=job_id)
+            return None
+        if export_mode == 'delta':
+            log_error(job_logger, f"Job '{job_name}': Export format 'postgres' does not support export mode 'delta'; use 'append'.", job_id=job_id)
+            return None
+        if job.split_strategy and job.split_output == 'parts':
+            log_error(job_logger, f"Job '{job_name}': Export format 'postgres' does not support split output 'parts'.", job_id=job_id)
+            return None
+
+    if export_mode == 'delta':
+        # Um arquivo novo por execução, apenas com as linhas novas
+        archive_name_with_extention = f"{job.export_name}_{run_started:%Y%m%d_%H%M%S}{extension}"
+    else:
+        archive_name_with_extention = job.export_name + extension
 
+    sql = job.sql_script
+
+    if not sql:
+        log_error(job_logger, f"Job '{job_name}' has no SQL script defined.", job_id=job_id)
+        return None
+
+    params = {}
+    if export_mode != 'full':
+        params['watermark'] = _load_watermark(job_id)
+        if not re.search(r':watermark\b', sql):
+            log_warning(job_logger, f"Job '{job_name}': Incremental job SQL does not reference :watermark; every run will export all rows.", job_id=job_id)
+        elif params['watermark'] is None and not _NULL_WATERMARK.search(sql):
+            # `col > NULL` não traz nenhuma linha: a carga inicial sumiria sem aviso
+            log_error(job_logger, f"Job '{job_name}': No watermark yet and the SQL filter drops every row when :watermark is NULL. Set jobs_he.watermark_value to the starting point or write the filter as (:watermark IS NULL OR col > :watermark).", job_id=job_id)
+            return None
+        log_debug(job_logger, f"Job '{job_name}': Using watermark {params['watermark']!r}", job_id=job_id)
+
+    if job.export_format == 'postgres':
+        # Sem arquivo: o destino é a tabela
+        absolute_path = job.target_table
+    else:
+        absolute_path = os.path.join(archive_path, archive_name_with_extention)
         # Ensure target directory exists
         os.makedirs(archive_path, exist_ok=True)
+    log_debug(job_logger, f"Job '{job_name}': Export path: {absolute_path}", job_id=job_id)
 
-        # Verifica se o comando é DQL
-        if not is_select_query(sql):
-            log_error(job_logger, f"Job '{job_name}': SQL is not a SELECT query. Aborting.", job_id=job_id)
-            return
+    # Verifica se o comando é DQL
+    if not is_select_query(sql):
+        log_error(job_logger, f"Job '{job_name}': SQL is not a SELECT query. Aborting.", job_id=job_id)
+        return None
+    if job.freshness_sql and not is_select_query(job.freshness_sql):
+        log_error(job_logger, f"Job '{job_name}': Freshness probe SQL is not a SELECT query. Aborting.", job_id=job_id)
+        return None
+
+    if job.export_format == 'postgres' or export_mode == 'append':
+        # Tabela (transacional) ou acréscimo ao arquivo existente: grava direto no destino
+        target = ExportTarget(job, params, absolute_path)
+    else:
+        # Grava em um temporário; o arquivo definitivo só muda no rename final
+        target = ExportTarget(job, params, absolute_path, write_path=partial_path(absolute_path))
+
+    if job.resume_key:
+        _prepare_resume(target, job_logger)
+    else:
+        target.exporter = _new_exporter(job, target.write_path)
+    return target
+
+
+# Chaves de cada item de `jobs_he.sinks` → campo do job
+SINK_OPTIONS = {
+    'format': 'export_format',
+    'path': 'export_path',
+    'name': 'export_name',
+    'compression': 'export_compression',
+    'level': 'compression_level',
+    'target_table': 'target_table',
+    'load_mode': 'load_mode',
+}
+
+
+def _sink_jobs(job):
+    """
+    Destinos extras do job (`jobs_he.sinks`), cada um como uma cópia do job
+    com o formato e as opções do destino. Pasta e nome vêm do job quando
+    omitidos; compressão e modo de carga não são herdados. Levanta
+    ValueError se a lista for inválida.
+    """
+    try:
+        specs = json.loads(job.sinks)
+    except ValueError:
+        raise ValueError("sinks must be a JSON list of objects") from None
+    if not isinstance(specs, list) or not all(isinstance(spec, dict) for spec in specs):
+        raise ValueError("sinks must be a JSON list of objects")
+
+    sink_jobs = []
+    for spec in specs:
+        unknown = sorted(set(spec) - set(SINK_OPTIONS))
+        if unknown:
+            raise ValueError(f"Unknown sink option(s) {', '.join(unknown)}. Expected: {', '.join(SINK_OPTIONS)}")
+        export_format = (spec.get('format') or 'csv').lower()
+        get_exporter_class(export_format)
+        sink_jobs.append(job.replace(
+            export_format=export_format,
+            export_path=spec.get('path') or job.export_path,
+            export_name=spec.get('name') or job.export_name,
+            export_compression=spec.get('compression'),
+            compression_level=spec.get('level'),
+            target_table=spec.get('target_table'),
+            load_mode=(spec.get('load_mode') or 'truncate').lower(),
+            sinks=None
+        ))
+    return sink_jobs
+
+
+def _prepare_job_targets(job, job_logger, run_started):
+    """
+    Destino do job e os dos seus destinos extras (todos alimentados pela
+    mesma consulta). Lista vazia se o job não puder rodar.
+    """
+    target = _prepare_target(job, job_logger, run_started)
+    if target is None or not job.sinks:
+        return [] if target is None else [target]
+
+    try:
+        sink_jobs = _sink_jobs(job)
+    except ValueError as error:
+        log_error(job_logger, f"Job '{job.name}': Invalid sinks: {error}", job_id=job.job_id)
+        return []
+
+    targets = [target]
+    for number, sink_job in enumerate(sink_jobs, start=1):
+        sink_target = _prepare_target(sink_job, job_logger, run_started)
+        if sink_target is None:
+            return []
+        sink_target.sink = f"sink {number} ({sink_job.export_format})"
+        if any(t.path == sink_target.path for t in targets):
+            log_error(job_logger, f"Job '{job.name}': {sink_target.sink} writes to '{sink_target.path}', already used by another output of the job.", job_id=job.job_id)
+            return []
+        targets.append(sink_target)
+    return targets
+
+
+def _prepare_resume(target, job_logger):
+    """
+    Job retomável: consulta ordenada pela chave e checkpoints durante a
+    escrita. Se a execução anterior deixou um checkpoint válido, continua
+    dele (parcial truncado no ponto salvo, só as linhas depois da chave).
+    """
+    job = target.job
+    signature = signature_for(job.sql_script, job.export_format, job.export_compression, job.resume_key)
+    state = Checkpoint.load(target.path, signature)
+    if state is None:
+        discard_checkpoint(target.path)
+        state = Checkpoint(signature)
+    else:
+        os.truncate(target.write_path, state.offset)
+        target.params['resume_key'] = state.last_key
+        target.resumed_rows = state.rows
+        target.size_before = state.offset
+        log_info(job_logger, f"Job '{job.name}': Resuming from checkpoint after {state.rows} rows ({job.resume_key} > {state.last_key!r}).", job_id=job.job_id)
+
+    target.sql = resume_sql(job.sql_script, job.resume_key, resuming=state.rows > 0)
+    target.exporter = CheckpointWriter(
+        _new_exporter(job, target.write_path, append=state.rows > 0), target.path, state, job.resume_key,
+        every_rows=cfg.CHECKPOINT_ROWS, every_seconds=cfg.CHECKPOINT_SECONDS
+    )
+
+
+def _new_exporter(job, path, append=None):
+    if append is None:
+        append = job.export_mode == 'append'
+    if job.export_format == 'postgres':
+        return PostgresCopyExporter(
+            path, append=append, load_mode=job.load_mode,
+            connect=cfg.postgres_engine.raw_connection
+        )
+    return get_exporter_class(job.export_format)(
+        path, job.export_compression, job.compression_level,
+        buffer_size=cfg.EXPORT_WRITE_BUFFER, append=append
+    )
+
+
+def _written_bytes(target):
+    """Bytes gravados pela execução: crescimento do arquivo ou, no PostgreSQL, o CSV enviado ao COPY."""
+    if target.job.export_format == 'postgres':
+        return target.exporter.bytes_written
+    return max(file_size(target.write_path) - target.size_before, 0)
+
+
+def _commit_output(target):
+    """Sucesso: o temporário substitui o arquivo definitivo (rename atômico) e o checkpoint sai."""
+    if target.write_path != target.path:
+        os.replace(target.write_path, target.path)
+    if target.job.resume_key:
+        discard_checkpoint(target.path)
+
+
+def _discard_output(target):
+    """
+    Falha: o arquivo definitivo fica como estava. O temporário só é mantido
+    se houver um checkpoint para a próxima execução retomar; retorna True nesse caso.
+    """
+    if target.write_path == target.path:
+        return False
+    if target.job.resume_key and os.path.exists(checkpoint_path(target.path)):
+        return True
+    try:
+        os.remove(target.write_path)
+    except FileNotFoundError:
+        pass
+    return False
+
+
+def _set_exec_time(job_id, watermark=None):
+    PostgreSession = cfg.get_postgres_session()
+    with PostgreSession() as session:
+        job_row = session.get(JobHE, job_id)
 
-        log_debug(job_logger, f"Job '{job_name}': Executing SQL:\n{sql[:200]}...", job_id=job_id)
-        rows_exported = 0
-
-        OracleSession = cfg.get_oracle_session()
-
-        # Execução do SQL e exportação com fetchmany()
-        with OracleSession() as session:
-            # 2) Executa o seu SQL com stream_results para permitir fetchmany
-            stmt = text(sql).execution_options(stream_results=True)
-            result = session.execute(stmt)
-
-            # 4) Abre CSV e escreve cabeçalho
-            with open(absolute_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile, delimiter=';')
-                writer.writerow(result.keys())
-
-                # 5) Itera em blocos de até `arraysize`
-                while True:
-                    batch = result.fetchmany()
-                    if not batch:
-                        break
-                    writer.writerows(batch)
-                    rows_exported += len(batch)
-                    log_debug(
+        if job_row:
+            job_row.last_exec = datetime.now()
+            # O watermark só avança em execuções bem-sucedidas
+            if watermark is not None:
+                job_row.watermark_value = _format_watermark(watermark)
+            session.commit()
+
+
+def _log_failure(job_logger, target, error, duration_ms):
+    job_id = target.job.job_id
+    label = f"Job '{target.job.name or 'Unknown Job'}'"
+    if target.sink:
+        label += f" {target.sink}"
+
+    if isinstance(error, FileNotFoundError):
+        message = f"{label}: Error creating/writing file at '{target.path}'. Check path and permissions."
+    elif isinstance(error, oracledb.DatabaseError):
+        message = f"{label}: Oracle Database Error during execution: {error}"
+    else:
+        message = f"{label}: Unexpected error during execution: {error}"
+    log_error(job_logger, message, job_id=job_id, duration_ms=duration_ms, exc_info=error)
+
+
+def _record_run(job_logger, target, run_started, summary):
+    """Grava a execução e as suas métricas em `job_runs`. Falhas aqui não afetam o job."""
+    if not cfg.METRICS.get('persist_runs', True):
+        return
+    try:
+        PostgreSession = cfg.get_postgres_session()
+        with PostgreSession() as session:
+            session.add(JobRun(
+                job_id=target.job.job_id,
+                started_at=run_started,
+                finished_at=datetime.now(),
+                status=summary['status'],
+                rows=summary['rows'],
+                bytes_written=summary['bytes_written'],
+                batches=summary['batches'],
+                peak_batch_rows=summary['peak_batch_rows'],
+                arraysize=summary['arraysize'],
+                execute_ms=summary['execute_ms'],
+                first_row_ms=summary['first_row_ms'],
+                fetch_ms=summary['fetch_ms'],
+                write_ms=summary['write_ms'],
+                duration_ms=summary['duration_ms'],
+                error_text=None if target.error is None else repr(target.error)
+            ))
+            session.commit()
+    except Exception as e:
+        log_warning(job_logger, f"Job '{target.job.name}': Could not record run metrics: {e}", job_id=target.job.job_id)
+
+
+def _finish_target(job_logger, target, run_started, summary):
+    """Registra o resultado de um destino: watermark, last_exec, métricas e log."""
+    job = target.job
+    duration_ms = summary['duration_ms']
+
+    if target.error is None:
+        if job.export_mode == 'delta' and target.rows == 0:
+            # Nada mudou desde o último watermark: não deixa arquivo vazio
+            os.remove(target.write_path)
+            summary['bytes_written'] = 0
+        else:
+            try:
+                _commit_output(target)
+            except OSError as error:
+                target.error = error
+                summary['status'] = 'failed'
+
+    if target.error is not None:
+        kept = _discard_output(target)
+        _set_exec_time(job.job_id)
+        _record_run(job_logger, target, run_started, summary)
+        _log_failure(job_logger, target, target.error, duration_ms)
+        if kept:
+            log_info(job_logger, f"Job '{job.name}': Progress checkpoint kept; the next run resumes from it.", job_id=job.job_id)
+        return
+
+    new_watermark = None
+    if job.export_mode != 'full':
+        # Por chave: maior valor exportado (mantém o anterior se não houve linhas);
+        # por tempo: horário do banco logo antes da consulta
+        new_watermark = target.tracked.get('max') if job.watermark_column else target.tracked['db_now']
+
+    _set_exec_time(job.job_id, watermark=new_watermark)
+    _record_run(job_logger, target, run_started, summary)
+
+    if job.export_format == 'postgres':
+        rate = target.rows / max(duration_ms / 1000, 0.001)
+        log_info(job_logger, f"Job '{job.name}' finished successfully. Loaded {target.rows} rows into '{target.path}' ({rate:.0f} rows/s).", job_id=job.job_id, duration_ms=duration_ms)
+        return
+    if target.sink:
+        log_info(job_logger, f"Job '{job.name}' {target.sink} finished successfully. Wrote {target.rows} rows to '{target.path}'.", job_id=job.job_id, duration_ms=duration_ms)
+        return
+    log_info(job_logger, f"Job '{job.name}' finished successfully. Exported {target.rows} rows.", job_id=job.job_id, duration_ms=duration_ms)
+
+
+def _csv_conversions(targets):
+    """
+    Conversores da busca (ver fetch_converters) quando todos os destinos são
+    CSV e nenhum acompanha watermark por coluna (que compara os tipos originais)
+    nem é retomável.
+    """
+    conversions = cfg.CSV_CONVERSIONS
+    if conversions is None:
+        return None
+    for target in targets:
+        job = target.job
+        if (job.export_format or 'csv').lower() != 'csv' or (job.export_mode != 'full' and job.watermark_column):
+            return None
+        if job.resume_key:
+            # A chave do checkpoint volta como bind e precisa do tipo original
+            return None
+    return conversions
+
+
+def _open_target(target, columns, description):
+    """Abre o exportador do destino; em caso de erro ele fica em `target.error`. Retorna True se abriu."""
+    try:
+        if target.job.export_mode == 'append' and target.job.export_format != 'postgres':
+            target.size_before = file_size(target.write_path)
+        target.exporter.open(columns, description)
+        return True
+    except Exception as error:
+        target.error = error
+        return False
+
+
+def _tracks_time(targets):
+    return any(t.job.export_mode != 'full' and not t.job.watermark_column for t in targets)
+
+
+def _set_db_now(targets, db_now):
+    for target in targets:
+        target.tracked['db_now'] = db_now
+
+
+def _database_now(session):
+    """
+    Horário atual do banco de origem. O watermark por tempo vem do relógio
+    do Oracle, não do deste servidor: uma diferença entre os dois não pode
+    fazer a próxima execução pular linhas.
+    """
+    if session.get_bind().dialect.name == 'oracle':
+        return session.execute(text(DB_NOW_SQL)).scalar()
+    return session.execute(select(func.current_timestamp())).scalar()
+
+
+def _fetch_blocks(result, sizing, conversions):
+    """
+    Busca de um bloco do resultado. Sem conversores, o tamanho vai explícito:
+    com stream_results, `Result.fetchmany()` sem tamanho devolve o resultado
+    inteiro de uma vez (BufferedRowCursorFetchStrategy do dialeto Oracle).
+    """
+    if conversions is not None:
+        return conversions.fetch(result)
+    return lambda: result.fetchmany(sizing.arraysize)
+
+
+def _fan_out(opened):
+    queue_depth = cfg.SINK_QUEUE_DEPTH if len(opened) > 1 else 0
+    return FanOutExporter([t.exporter for t in opened], queue_depth=queue_depth)
+
+
+def _export_shared(targets, sizing, run_metrics, job_logger):
+    """
+    Executa a consulta uma vez e grava o mesmo fluxo de linhas em todos os
+    destinos. Erros de um destino ficam em `target.error`; erros da consulta
+    são levantados.
+    """
+    leader = targets[0]
+    opened = []
+    OracleSession = cfg.get_oracle_session()
+    conversions = _csv_conversions(targets)
+    options = sizing.execution_options()
+    if conversions is not None:
+        options.update(conversions.execution_options())
+        sizing.freeze()
+
+    # Execução do SQL e exportação com fetchmany()
+    with _oracle_slot(), OracleSession() as session, ExitStack() as cleanup:
+        if _tracks_time(targets):
+            _set_db_now(targets, _database_now(session))
+
+        # 2) Executa o seu SQL com stream_results para permitir fetchmany
+        stmt = text(leader.sql).execution_options(stream_results=True, **options)
+        run_metrics.start_query()
+        result = session.execute(stmt, leader.params)
+        # Fecha o cursor antes de devolver a conexão, mesmo com a busca
+        # interrompida (no CSV a busca vai direto no cursor, sem o Result)
+        cleanup.callback(result.close)
+        run_metrics.query_opened()
+        sizing.after_execute(result.cursor)
+        columns = list(result.keys())
+        upper_columns = [c.upper() for c in columns]
+
+        # 3) CSV: tuplas direto do cursor, já convertidas; demais formatos: linhas do SQLAlchemy
+        fetch_batch = run_metrics.wrap_fetch(sizing.wrap_fetch(_fetch_blocks(result, sizing, conversions), result.cursor))
+        for target in targets:
+            job = target.job
+            # Watermark por chave: acompanha o maior valor da coluna configurada
+            if job.export_mode != 'full' and job.watermark_column:
+                if job.watermark_column.upper() not in upper_columns:
+                    target.error = ValueError(f"Watermark column '{job.watermark_column}' not found in query result")
+                    continue
+                fetch_batch = _track_max(fetch_batch, upper_columns.index(job.watermark_column.upper()), target.tracked)
+
+            # 4) Abre o arquivo no formato do job (tipos vindos do cursor.description)
+            if _open_target(target, columns, result.cursor.description):
+                opened.append(target)
+
+        if opened:
+            # Um destino com erro é descartado sem interromper os demais; com
+            # vários, cada um grava em sua thread (um lento não segura os outros)
+            fan_out = _fan_out(opened)
+            sink = run_metrics.wrap_writer(fan_out)
+            try:
+                # 5) Busca em blocos de até `arraysize`; a escrita de cada bloco
+                #    roda em outra thread enquanto o próximo é buscado
+                rows_exported = run_export(
+                    fetch_batch, sink,
+                    queue_depth=cfg.EXPORT_QUEUE_DEPTH,
+                    on_batch=lambda batch_rows, total: log_debug(
                         job_logger,
-                        f"Job '{job_name}': Fetched/wrote {len(batch)} rows (Total: {rows_exported})",
-                        job_id=job_id
+                        f"Job '{leader.job.name}': Fetched {batch_rows} rows (Total: {total})",
+                        job_id=leader.job.job_id
                     )
-        
-        end_time = time.time()
-        duration_ms = int((end_time - start_time) * 1000)
+                )
+            except BaseException:
+                # Destinos transacionais (PostgreSQL) desfazem a carga no close()
+                sink.abort()
+                raise
+            finally:
+                sink.close()
 
-        set_exec_time()
+            for index, target in enumerate(opened):
+                target.error = fan_out.errors.get(index)
+                target.rows = target.resumed_rows + rows_exported
+                target.bytes_written = _written_bytes(target)
 
-        log_info(job_logger, f"Job '{job_name}' finished successfully. Exported {rows_exported} rows.", job_id=job_id, duration_ms=duration_ms)
 
-    except FileNotFoundError:
-        set_exec_time()
-        log_exception(job_logger, f"Job '{job_name}': Error creating/writing file at '{absolute_path}'. Check path and permissions.", job_id=job_id)
-    except oracledb.DatabaseError as ora_err:
-         set_exec_time()
-         log_exception(job_logger, f"Job '{job_name}': Oracle Database Error during execution: {ora_err}", job_id=job_id)
+def _export_split(target, sizing, run_metrics, run_started, job_logger):
+    """
+    Extração paralela (ver `partitioned`): planeja as partes, roda cada uma
+    em sua conexão e grava um arquivo único ('merge') ou um arquivo por
+    parte com manifesto ('parts').
+    """
+    job = target.job
+    parallelism = job.split_parts or cfg.MAX_ORACLE_QUERIES
+    if _in_worker_process:
+        # Sem vaga por parte no filho: o pai reservou `_split_slots(job)` vagas para o job inteiro
+        parallelism = min(parallelism, _split_slots(job))
+    OracleSession = cfg.get_oracle_session()
+
+    # Planejamento (MIN/MAX, extensões ou partições) conta como o execute da consulta
+    run_metrics.start_query()
+    with _oracle_slot(), OracleSession() as session:
+        parts = plan_parts(session, job, target.params, parallelism)
+    run_metrics.query_opened()
+    log_info(job_logger, f"Job '{job.name}': Split into {len(parts)} parts ({job.split_strategy}, {min(parallelism, len(parts))} at a time).", job_id=job.job_id)
+
+    part_metrics = {}
+    conversions = _csv_conversions([target])
+
+    def run_part(part, consume):
+        metrics = part_metrics[part.index] = RunMetrics()
+        # A parte 0 usa (e ensina) o sizing do job; as demais medem cada uma o seu cursor
+        part_sizing = sizing if part.index == 0 else sizing.clone()
+        options = part_sizing.execution_options()
+        if conversions is not None:
+            options.update(conversions.execution_options())
+            part_sizing.freeze()
+        with _oracle_slot(), OracleSession() as session, ExitStack() as cleanup:
+            stmt = text(part.sql).execution_options(stream_results=True, **options)
+            metrics.start_query()
+            result = session.execute(stmt, part.params)
+            cleanup.callback(result.close)
+            metrics.query_opened()
+            part_sizing.after_execute(result.cursor)
+            fetch_batch = metrics.wrap_fetch(part_sizing.wrap_fetch(_fetch_blocks(result, part_sizing, conversions), result.cursor))
+            return consume(list(result.keys()), result.cursor.description, fetch_batch)
+
+    try:
+        if job.split_output == 'merge':
+            sink = run_metrics.wrap_writer(target.exporter)
+            try:
+                target.rows = export_merged(parts, parallelism, run_part, sink, queue_depth=cfg.EXPORT_QUEUE_DEPTH)
+            except BaseException:
+                sink.abort()
+                raise
+            finally:
+                sink.close()
+            target.bytes_written = _written_bytes(target)
+            return
+
+        directory = os.path.dirname(target.path)
+        extension = get_exporter_class(job.export_format).extension_for(job.export_compression)
+
+        def make_exporter(index):
+            path = os.path.join(directory, part_file_name(job.export_name, index, extension))
+            return path, part_metrics[index].wrap_writer(_new_exporter(job, partial_path(path)))
+
+        # As partes só substituem as anteriores se todas terminarem; o manifesto vem por último
+        entries = export_parts(parts, parallelism, run_part, make_exporter, queue_depth=cfg.EXPORT_QUEUE_DEPTH)
+        target.rows = sum(entry['rows'] for entry in entries)
+        target.bytes_written = sum(entry['bytes'] for entry in entries)
+        target.path = target.write_path = os.path.join(directory, f"{job.export_name}.manifest.json")
+        write_manifest(target.path, {
+            'job_id': job.job_id,
+            'job_name': job.name,
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'strategy': job.split_strategy,
+            'format': job.export_format,
+            'compression': job.export_compression,
+            'rows': target.rows,
+            'parts': entries,
+        })
+        remove_stale_parts(directory, job.export_name, extension, keep=len(parts))
+    finally:
+        # As linhas contadas pelas partes somam-se às do job (o merge não usa wrap_fetch no job)
+        run_metrics.merge(part_metrics.values())
+
+
+def execute_job(job):
+    """Executa um único job."""
+    execute_jobs([job])
+
+
+def execute_jobs(jobs):
+    """
+    Executa a consulta uma única vez e grava o mesmo fluxo de linhas no
+    destino de cada job. Todos os jobs devem ter o mesmo SQL e os mesmos
+    parâmetros (ver `dispatch_rules`); logs e `last_exec` são por job.
+
+    Retorna um resumo por job: {'job_id', 'rows', 'error', 'metrics'} (erro em
+    texto e métricas em dict, para poder voltar de um processo filho).
+    """
+    run_metrics = RunMetrics()
+    run_started = datetime.now()
+    job_logger = get_logger('executor')
+
+    targets = _prepare_targets(jobs, job_logger, run_started)
+    if not targets:
+        return []
+
+    leader = targets[0]
+    probe = None
+    if leader.job.freshness_sql:
+        # Fonte sem mudanças desde a última execução: nem roda a consulta
+        probe = _run_probe(leader.job, run_metrics, job_logger)
+        if probe is not None and _source_unchanged(targets, probe):
+            return _skip_unchanged(targets, run_metrics, run_started, job_logger)
+
+    _log_query_start(targets, job_logger)
+
+    sizing = None
+    try:
+        # 1) Tamanho dos blocos: override do job, valor aprendido ou estimativa pelas colunas
+        sizing = _new_sizing(leader.job)
+
+        if leader.job.split_strategy and len(targets) == 1:
+            # Extração paralela: várias consultas, cada uma em sua conexão
+            _export_split(leader, sizing, run_metrics, run_started, job_logger)
+        else:
+            _export_shared(targets, sizing, run_metrics, job_logger)
+
     except Exception as error:
-        set_exec_time()
-        end_time = time.time()
-        duration_ms = int((end_time - start_time) * 1000)
-        # Use log_exception to include traceback
-        log_exception(job_logger, f"Job '{job_name}': Unexpected error during execution: {error}", job_id=job_id, duration_ms=duration_ms)
-        # Optionally re-raise if needed elsewhere, but likely not in a scheduled task
-        # return # Ensure function exits on error
+        # Falha na consulta (ou na busca): afeta todos os destinos ainda sem erro
+        for target in targets:
+            if target.error is None:
+                target.error = error
 
-def schedule_job(jobs=None):
+    results = _finish_run(targets, sizing, run_metrics, run_started, job_logger)
+    _remember_probe(targets, probe, job_logger)
+    return results
+
+
+def _prepare_targets(jobs, job_logger, run_started):
+    """Destinos dos jobs que podem rodar (os demais já ficam registrados no log)."""
+    targets = []
+    for job in jobs:
+        log_info(job_logger, f"Starting job execution: '{job.name or 'Unknown Job'}'", job_id=job.job_id)
+        try:
+            targets.extend(_prepare_job_targets(job, job_logger, run_started))
+        except Exception as error:
+            _set_exec_time(job.job_id)
+            log_exception(job_logger, f"Job '{job.name or 'Unknown Job'}': Unexpected error during execution: {error}", job_id=job.job_id)
+    return targets
+
+
+def _log_query_start(targets, job_logger):
+    leader = targets[0]
+    sql = leader.job.sql_script
+    jobs = [t.job for t in targets if not t.sink]
+    if len(jobs) > 1:
+        names = ', '.join(f"'{job.name}'" for job in jobs)
+        log_info(job_logger, f"Running shared query once for {len(jobs)} jobs: {names}", job_id=leader.job.job_id)
+    if len(targets) > len(jobs):
+        log_info(job_logger, f"Job '{leader.job.name}': Feeding {len(targets)} outputs from one query.", job_id=leader.job.job_id)
+    log_debug(job_logger, f"Job '{leader.job.name}': Executing SQL:\n{sql[:200]}...", job_id=leader.job.job_id)
+
+
+def _new_sizing(job):
+    """Tamanho dos blocos: override do job, valor aprendido ou estimativa pelas colunas."""
+    return FetchSizing(
+        cfg.FETCH_BATCH_BYTES, cfg.ARRAYSIZE, cfg.MIN_ARRAYSIZE, cfg.MAX_ARRAYSIZE,
+        override=job.fetch_arraysize,
+        learned=None if job.fetch_arraysize else _load_learned_arraysize(job.job_id)
+    )
+
+
+def _finish_run(targets, sizing, run_metrics, run_started, job_logger):
+    """Arraysize aprendido, last_exec/watermark, métricas e log de cada destino. Retorna os resumos."""
+    leader = targets[0]
+    if sizing is not None:
+        run_metrics.arraysize = sizing.arraysize
+        learned = sizing.learned_arraysize()
+        ok_jobs = [t.job.job_id for t in targets if t.error is None]
+        if learned is not None and ok_jobs:
+            try:
+                _save_learned_arraysize(ok_jobs, learned)
+                log_debug(job_logger, f"Job '{leader.job.name}': Learned fetch arraysize {learned} (used {sizing.arraysize}).", job_id=leader.job.job_id)
+            except Exception as e:
+                log_warning(job_logger, f"Job '{leader.job.name}': Could not save learned fetch arraysize: {e}", job_id=leader.job.job_id)
+
+    measured = run_metrics.as_dict()
+    results = []
+    by_job = {}
+    for target in targets:
+        summary = dict(
+            measured,
+            status='success' if target.error is None else 'failed',
+            bytes_written=target.bytes_written
+        )
+        try:
+            _finish_target(job_logger, target, run_started, summary)
+        except Exception as error:
+            log_exception(job_logger, f"Job '{target.job.name}': Unexpected error during execution: {error}", job_id=target.job.job_id, duration_ms=summary['duration_ms'])
+
+        result = by_job.get(target.job.job_id) if target.sink else None
+        if result is not None:
+            # Destino extra: entra no resultado do job (uma execução por job nas métricas)
+            metrics = result['metrics'] = dict(result['metrics'])
+            metrics['bytes_written'] = (metrics['bytes_written'] or 0) + (summary['bytes_written'] or 0)
+            if target.error is not None and result['error'] is None:
+                result['error'] = repr(target.error)
+                metrics['status'] = 'failed'
+            continue
+        result = by_job[target.job.job_id] = {
+            'job_id': target.job.job_id,
+            'rows': target.rows,
+            'error': None if target.error is None else repr(target.error),
+            'metrics': summary
+        }
+        results.append(result)
+    return results
+
+
+"""
+##----------------------------------------
+Sonda de frescor (jobs_he.freshness_sql)
+##----------------------------------------
+"""
+
+# Antes da consulta principal o job roda a sua sonda (um SELECT barato, ex.:
+# MAX(updated_at), ORA_ROWSCN ou COUNT(*)) e compara a primeira linha com a da
+# última execução bem-sucedida. Se for a mesma e as saídas ainda existirem,
+# nada é exportado e a execução fica como 'skipped-unchanged'. A sonda roda
+# antes da consulta: uma mudança entre as duas só faz a próxima execução
+# exportar de novo. Se a sonda falhar, o job roda normalmente.
+
+
+def _probe_text(row):
+    """Primeira linha da sonda em texto (JSON), para guardar e comparar."""
+    if row is None:
+        return json.dumps(None)
+    return json.dumps([None if value is None else _format_watermark(value) for value in row])
+
+
+def _run_probe(job, run_metrics, job_logger):
+    """Roda a sonda do job; None se ela falhar (o job roda normalmente)."""
+    OracleSession = cfg.get_oracle_session()
+    try:
+        with _oracle_slot(), OracleSession() as session:
+            run_metrics.start_query()
+            row = session.execute(text(job.freshness_sql)).first()
+            run_metrics.query_opened()
+    except Exception as e:
+        log_warning(job_logger, f"Job '{job.name}': Freshness probe failed, exporting anyway: {e}", job_id=job.job_id)
+        return None
+    return _probe_text(row)
+
+
+def _source_unchanged(targets, probe):
     """
-    - Se job for None: carrega TODOS os registros do banco e agenda cada um.
-    - Se job for um dict: agenda apenas esse job em memória.
-    - Se job for um int (job_id): busca esse registro no banco e agenda.
+    True se a sonda devolveu o mesmo da última execução bem-sucedida e as
+    saídas do job ainda existem (arquivo apagado => exporta de novo).
     """
-    log_source = "database (all active)"
-    if jobs is None:
-        jobs = fetch_jobs()
-        log_info(logger, f"Scheduling all active jobs from database.")
+    job = targets[0].job
+    PostgreSession = cfg.get_postgres_session()
+    with PostgreSession() as session:
+        job_row = session.get(JobHE, job.job_id)
+        last = job_row.freshness_value if job_row else None
+    if last is None or last != probe:
+        return False
+    return all(
+        t.job.export_format == 'postgres' or t.job.export_mode == 'delta' or os.path.exists(t.path)
+        for t in targets
+    )
 
-        # a cada 2 horas, faz o reload completo:
-        schedule.every(2).hours.do(lambda: (
-            schedule.clear(),   # limpa tudo
-            schedule_job()      # recarrega todos
-        ))
-        log_info(logger, "Scheduled periodic job reload every 2 hours.")
-    elif type(jobs) == int:
-        log_source = f"database (ID: {jobs})"
-        jobs = fetch_jobs(job_id=jobs)
-        log_info(logger, f"Scheduling specific job from database: ID {jobs}.")
-    elif type(jobs) == dict:
-        log_source = "provided list"
-        log_info(logger, f"Scheduling {len(jobs)} jobs from provided list.")
-        # Assume list of dicts is correctly formatted
-    else:
-        log_error(logger, f"Invalid input type for schedule_job: {type(jobs)}. Expected None, int, or list[dict].")
+
+def _save_freshness(job_id, probe):
+    PostgreSession = cfg.get_postgres_session()
+    with PostgreSession() as session:
+        job_row = session.get(JobHE, job_id)
+        if job_row:
+            job_row.freshness_value = probe
+            session.commit()
+
+
+def _skip_unchanged(targets, run_metrics, run_started, job_logger):
+    """Fonte sem mudanças: registra o resultado 'skipped-unchanged' com o tempo da sonda."""
+    leader = targets[0]
+    summary = dict(run_metrics.as_dict(), status=SKIPPED_UNCHANGED, bytes_written=0)
+    _set_exec_time(leader.job.job_id)
+    _record_run(job_logger, leader, run_started, summary)
+    # Sem duration_ms no log: a média dos logs entra no nivelamento de carga
+    log_info(job_logger, f"Job '{leader.job.name}': Source unchanged since the last run; export skipped (probe took {summary['duration_ms']} ms).", job_id=leader.job.job_id)
+    return [{'job_id': leader.job.job_id, 'rows': 0, 'error': None, 'metrics': summary}]
+
+
+def _remember_probe(targets, probe, job_logger):
+    """Execução concluída: guarda o resultado da sonda se todas as saídas do job foram gravadas."""
+    if probe is None or any(t.error is not None for t in targets):
         return
-    
-    scheduled_count = 0
+    leader = targets[0]
+    try:
+        _save_freshness(leader.job.job_id, probe)
+    except Exception as e:
+        log_warning(job_logger, f"Job '{leader.job.name}': Could not save freshness probe result: {e}", job_id=leader.job.job_id)
+
+
+"""
+##----------------------------------------
+Execução em processos (modo 'process')
+##----------------------------------------
+"""
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+_child_log_queue = None
+_child_log_forwarder = None
+
+# True dentro de um processo filho do pool
+_in_worker_process = False
+
+
+def _init_worker_process(log_queue):
+    """Inicializa o processo filho: logs de banco vão para o pai; engines são criados no primeiro uso."""
+    global _in_worker_process
+    _in_worker_process = True
+    set_db_log_sink(log_queue.put)
+
+
+def get_process_pool():
+    """Pool de processos para jobs com execution_mode = 'process', criado no primeiro uso."""
+    global _process_pool, _child_log_queue, _child_log_forwarder
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                # spawn: processo limpo (sem threads/conexões herdadas), igual em Windows e Linux
+                context = multiprocessing.get_context('spawn')
+                _child_log_queue = context.Queue()
+                _child_log_forwarder = forward_log_records(_child_log_queue)
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=cfg.PROCESS_WORKERS,
+                    mp_context=context,
+                    initializer=_init_worker_process,
+                    initargs=(_child_log_queue,)
+                )
+    return _process_pool
+
+
+def shutdown_process_pool():
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True)
+        _child_log_queue.put(None)
+        _child_log_forwarder.join()
+
+
+def _oracle_slot():
+    # O limite global de consultas é controlado no processo pai
+    return nullcontext() if _in_worker_process else get_executor().oracle_slot()
+
+
+def _split_slots(job):
+    """Consultas simultâneas de um job de extração paralela, limitadas ao total do serviço."""
+    return min(job.split_parts or cfg.MAX_ORACLE_QUERIES, cfg.MAX_ORACLE_QUERIES)
+
+
+def _oracle_slots_for(jobs):
+    """Vagas que o pai reserva para um lote em processo filho: uma por parte na extração paralela."""
+    return max(_split_slots(job) if job.split_strategy else 1 for job in jobs)
+
+
+def run_jobs(jobs):
+    """
+    Ponto de entrada do executor. Jobs com execution_mode = 'process' rodam em
+    um processo filho (conversão de valores e escrita do CSV fora do GIL do
+    processo principal); a thread do executor espera o resultado, mantendo as
+    vagas de consulta Oracle (uma por parte na extração paralela, ver
+    `_oracle_slots_for`) e as políticas de sobreposição.
+    """
+    if not any(job.execution_mode == 'process' for job in jobs):
+        results = execute_jobs(jobs)
+    else:
+        with get_executor().oracle_slot(_oracle_slots_for(jobs)):
+            results = get_process_pool().submit(execute_jobs, jobs).result()
+        for result in results:
+            log_debug(logger, f"Process run finished for job ID {result['job_id']}: {result['rows']} rows, error={result['error']}", job_id=result['job_id'])
 
-    # TODO: Implementar outra alternativa para este LOOP, a variavel job pode possivelmente não existir.
-    # O loop foi refatorado para que o tratamento de exceção ocorra por item,
-    # garantindo que a variável 'job' sempre exista no bloco 'except' e permitindo
-    # que o processo continue mesmo se um job individual falhar.
+    _record_results(results)
+    return results
 
-    log_info(logger, "Starting job scheduling...")
-    scheduled_count = 0
 
-    # Adicionamos um 'try' externo para capturar erros com a própria lista de jobs (ex: se for None ou não iterável)
+def _record_results(results):
+    # Agregado do /metrics fica no processo principal (inclusive para o modo 'process')
+    for result in results:
+        metrics_registry.record_run(result['job_id'], result['metrics']['status'], result['metrics'])
+
+
+def dispatch_rules(rules):
+    """
+    Envia para o executor os jobs das regras que venceram.
+
+    Jobs devidos juntos com o mesmo SQL normalizado rodam a consulta uma vez só
+    e recebem o mesmo fluxo de linhas (single-flight). Jobs incrementais não
+    são agrupados, pois cada um tem o seu próprio watermark, nem os de
+    extração paralela, que abrem várias consultas próprias, nem os retomáveis,
+    que podem continuar de pontos diferentes, nem os com sonda de frescor,
+    que decidem sozinhos se exportam.
+    """
+    for group in group_rules(rules):
+        # O executor aplica a política de sobreposição de cada job (skip/coalesce/allow)
+        admitted = get_executor().submit_jobs(run_jobs, group)
+        for job in admitted:
+            log_debug(logger, f"Submitted job '{job.name}' (ID: {job.job_id}) to executor.", job_id=job.job_id)
+
+
+def group_rules(rules):
+    """Agrupa as regras vencidas em execuções (listas de JobSpec), ver `dispatch_rules`."""
+    groups = {}
+    for rule in rules:
+        job = rule.job
+        if (job.export_mode == 'full' and job.sql_script and not job.split_strategy
+                and not job.resume_key and not job.freshness_sql):
+            key = ('sql', normalize_sql(job.sql_script))
+        else:
+            key = ('job', job.job_id)
+        # Duas regras do mesmo job no mesmo instante => uma execução
+        groups.setdefault(key, {}).setdefault(job.job_id, job)
+    return [list(group.values()) for group in groups.values()]
+
+
+def _load_job_durations():
+    """
+    Duração típica (segundos) de cada job para o nivelamento de carga: média
+    das últimas `leveling.history_runs` execuções bem-sucedidas em `job_runs`;
+    sem elas, média do `duration_ms` dos logs do job nos últimos
+    `leveling.history_days` dias. Retorna (por job, duração padrão).
+    """
+    history_runs = int(cfg.LEVELING.get('history_runs', 20))
+    history_days = int(cfg.LEVELING.get('history_days', 14))
+    default = float(cfg.LEVELING.get('default_duration_seconds', 60))
+
+    durations = {}
     try:
-        # Verificamos se a lista de jobs existe e não está vazia antes de iterar
-        if not jobs:
-            log_warning(logger, "Job list is empty or None. No jobs to schedule.")
+        PostgreSession = cfg.get_postgres_session()
+        with PostgreSession() as session:
+            since = datetime.now() - timedelta(days=history_days)
+            for job_id, avg_ms in session.execute(
+                select(Log.job_id, func.avg(Log.duration_ms))
+                .where(Log.job_id.is_not(None), Log.duration_ms.is_not(None), Log.timestamp >= since)
+                .group_by(Log.job_id)
+            ):
+                durations[job_id] = float(avg_ms) / 1000
+
+            recent = select(
+                JobRun.job_id, JobRun.duration_ms,
+                func.row_number().over(partition_by=JobRun.job_id, order_by=JobRun.started_at.desc()).label('n')
+            ).where(JobRun.status == 'success', JobRun.duration_ms.is_not(None)).subquery()
+            for job_id, avg_ms in session.execute(
+                select(recent.c.job_id, func.avg(recent.c.duration_ms))
+                .where(recent.c.n <= history_runs)
+                .group_by(recent.c.job_id)
+            ):
+                durations[job_id] = float(avg_ms) / 1000
+    except Exception as e:
+        log_warning(logger, f"Could not load job durations for load leveling: {e}")
+    return durations, default
+
+
+# Escolhe o minuto de disparo dos jobs com tolerância (jobs_he.start_tolerance)
+leveler = LoadLeveler(_load_job_durations)
+
+# Regras agendadas em memória, indexadas por (job_id, schedule_id)
+engine = RuleScheduler(dispatch_rules, leveler=leveler)
+
+
+def projected_load(day=None):
+    """Carga prevista (jobs simultâneos) por minuto do dia: lista de (minuto, carga)."""
+    return engine.load_plan(day).timeline()
+
+
+def _load_plan_stats():
+    plan = engine.load_plan()
+    peak_at, peak = plan.peak()
+    return {
+        'projected_now': plan.load_at(datetime.now()),
+        'projected_peak': peak,
+        'projected_peak_minute': peak_at.hour * 60 + peak_at.minute,
+        'unleveled_peak': plan.unleveled_peak,
+    }
+
+
+def log_runtime_stats():
+    """Registra as métricas do executor (fila, latência) e do pool Oracle."""
+    log_info(logger, f"Executor stats: {get_executor().stats()}")
+    if _async_runner is not None:
+        log_info(logger, f"Async runtime stats: {_async_runner.stats()}")
+    log_info(logger, f"Oracle pool stats: {cfg.oracle_pool_status()}")
+    plan = engine.load_plan()
+    peak_at, peak = plan.peak()
+    log_info(logger, f"Projected load: {plan.load_at(datetime.now())} jobs now, peak {peak} at {peak_at:%H:%M} (without leveling: {plan.unleveled_peak}).")
+
+
+def write_metrics_textfile(path):
+    try:
+        metrics_registry.write_textfile(path)
+    except Exception as e:
+        log_warning(logger, f"Could not write metrics file '{path}': {e}")
+
+
+def start_metrics_exporters():
+    """Liga o endpoint HTTP e/ou o arquivo de métricas conforme a seção `metrics` do datafile.json."""
+    metrics_registry.add_collector('executor', lambda: get_executor().stats())
+    metrics_registry.add_collector('oracle_pool', cfg.oracle_pool_status)
+    metrics_registry.add_collector('load_plan', _load_plan_stats)
+
+    port = int(cfg.METRICS.get('http_port') or 0)
+    if port:
+        host = cfg.METRICS.get('http_host', '0.0.0.0')
+        start_http_server(port, host)
+        log_info(logger, f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+
+    path = cfg.METRICS.get('textfile')
+    if path:
+        interval = timedelta(seconds=float(cfg.METRICS.get('textfile_interval', 60)))
+        engine.every('metrics', interval, lambda: write_metrics_textfile(path))
+        log_info(logger, f"Writing Prometheus metrics to '{path}' every {interval.total_seconds():g} seconds.")
+
+
+def sync_schedule(rules, job_id=None):
+    """
+    Compara a lista de regras com o que já está agendado em memória e aplica
+    apenas as diferenças, por (job_id, schedule_id): regras novas são
+    adicionadas, as que sumiram são removidas e as alteradas são substituídas.
+    As demais continuam agendadas sem intervalo.
+
+    Se `job_id` for informado, apenas as regras desse job são comparadas.
+    """
+    incoming = {rule.key: rule for rule in rules}
+
+    current = [key for key in engine.keys() if isinstance(key, tuple) and (job_id is None or key[0] == job_id)]
+    removed = [key for key in current if key not in incoming]
+    for key in removed:
+        engine.remove(key)
+
+    added = replaced = 0
+    for key, rule in incoming.items():
+        existing = engine.get(key)
+        if existing is not None:
+            if existing.signature() == rule.signature():
+                continue
+            replaced += 1
         else:
-            for job in jobs:
-                try:
-                    # A lógica de processamento de um único job fica dentro deste 'try'
-                    day_key = job['day']
-                    tag = job['job_id']
-                    hhmm = job['time']
-
-                    day_method = DAY_MAP.get(day_key)
-                    if not day_method:
-                        log_warning(logger, f"Invalid day '{day_key}' for job '{job['name']}' (ID: {tag}). Skipping this schedule.", job_id=tag)
-                        continue  # Pula para o próximo job
-
-                    # Usar uma função anônima (lambda) é mais conciso aqui
-                    job_wrapper = lambda job_data=job: (
-                        log_debug(logger, f"Submitting job '{job_data['name']}' (ID: {job_data['job_id']}) to executor.", job_id=job_data['job_id']),
-                        executor.submit(execute_job, job_data)
-                    )
+            added += 1
+        engine.add(rule)
+
+    log_info(
+        logger,
+        f"Schedule synced: {added} added, {replaced} replaced, {len(removed)} removed "
+        f"({len(engine)} rules registered)."
+    )
+    return added, replaced, len(removed)
+
+
+def reload_jobs(job_id=None):
+    """Busca os jobs no banco e sincroniza o agendamento em memória com eles."""
+    rules = fetch_jobs(job_id=job_id)
+    if rules is None:
+        log_warning(logger, "Could not fetch jobs from database. Keeping current schedule.")
+        return
+    sync_schedule(rules, job_id=job_id)
+
 
-                    # Comentado: Gera muitos logs
-                    # log_info(logger, f"Scheduling job '{job['name']}' (Tag: {tag}) for {day_key} at {hhmm}", job_id=tag)
-                    getattr(schedule.every(), day_method).at(hhmm).do(job_wrapper).tag(tag)
-                    
-                    # Incrementa o contador apenas se o agendamento for bem-sucedido
-                    scheduled_count += 1
-
-                except KeyError as e:
-                    # Este 'except' agora captura erros de um job específico.
-                    # A variável 'job' está garantida de existir aqui.
-                    job_id = job.get('job_id', 'N/A')
-                    log_error(logger, f"Missing key {e} in data for job '{job.get('name', 'Unknown')}'. Skipping this schedule.", job_id=job_id)
-                except Exception as e:
-                    # O mesmo vale para outras exceções inesperadas.
-                    job_id = job.get('job_id', 'N/A')
-                    log_exception(logger, f"Unexpected error scheduling job '{job.get('name', 'Unknown')}': {e}", job_id=job_id)
-
-    except TypeError:
-        # Este 'except' captura o erro se 'jobs' não for uma lista/iterável.
-        log_error(logger, "Job configuration is invalid. 'jobs' is not an iterable collection.")
+def _job_snapshot():
+    """Assinatura de cada job (status, updated_at e agendamentos) para detectar mudanças; None em erro."""
+    try:
+        PostgreSession = cfg.get_postgres_session()
+        with PostgreSession() as session:
+            rows = session.execute(
+                select(
+                    JobHE.job_id, JobHE.job_status, JobHE.updated_at,
+                    func.count(JobDE.schedule_id), func.max(JobDE.updated_at), func.sum(JobDE.schedule_id)
+                )
+                .outerjoin(JobDE, JobDE.job_id == JobHE.job_id)
+                .group_by(JobHE.job_id, JobHE.job_status, JobHE.updated_at)
+            ).all()
+        return {row[0]: tuple(row[1:]) for row in rows}
     except Exception as e:
-        # Captura qualquer outro erro inesperado no nível superior.
-        log_exception(logger, f"A critical error occurred during the scheduling process: {e}")
+        log_warning(logger, f"Could not check jobs for changes: {e}")
+        return None
+
+
+def _reload_changed(job_ids):
+    log_info(logger, f"Configuration changed for job IDs {job_ids}. Reloading them.")
+    for job_id in job_ids:
+        reload_jobs(job_id=job_id)
+
+
+def _listen_connection():
+    connection = cfg.postgres_engine.raw_connection()
+    connection.detach()  # fica fora do pool enquanto escuta
+    return connection.driver_connection
+
+
+# Recarrega só os jobs alterados (ver change_watch); ligado por start_change_watch()
+change_watcher = ChangeWatcher(_job_snapshot, _reload_changed)
+
+
+def start_change_watch():
+    """
+    Liga a detecção de mudanças conforme a seção `reload` do datafile.json.
+    Chamar antes da carga inicial dos jobs: a situação atual vira a referência.
+    """
+    settings = cfg.RELOAD
+    if settings.get('install_triggers', False):
+        try:
+            with cfg.postgres_engine.begin() as connection:
+                connection.exec_driver_sql(TRIGGERS_SQL)
+            log_info(logger, "Installed job change triggers on sql_scheduler.jobs_he/jobs_de.")
+        except Exception as e:
+            log_warning(logger, f"Could not install job change triggers: {e}")
+
+    change_watcher.poll_seconds = float(settings.get('poll_seconds', 5))
+    change_watcher.prime()
+    interval = change_watcher.poll_seconds
+    if settings.get('listen', False):
+        ChangeListener(
+            _listen_connection, change_watcher,
+            on_error=lambda e: log_warning(logger, f"Job change listener disconnected: {e}. Polling continues.")
+        ).start()
+        interval = 1  # só esvazia os NOTIFY recebidos; a consulta segue a cada poll_seconds
+    engine.every('changes', timedelta(seconds=interval), change_watcher.check)
+    log_info(logger, f"Watching job changes every {change_watcher.poll_seconds:g} seconds{' and via LISTEN/NOTIFY' if settings.get('listen', False) else ''}.")
 
 
-    log_info(logger, f"Finished scheduling. Added {scheduled_count} schedule entries.")
+def schedule_job(jobs=None):
+    """
+    - Se job for None: carrega TODOS os registros do banco e agenda cada um.
+    - Se job for uma ScheduleRule: agenda apenas essa regra em memória.
+    - Se job for um int (job_id): busca esse registro no banco e agenda.
+    """
+    if jobs is None:
+        log_info(logger, f"Scheduling all active jobs from database.")
+        reload_jobs()
+
+        # a cada 2 horas, sincroniza com o banco (apenas as diferenças); as mudanças
+        # normalmente já chegaram antes pelo change_watcher
+        if 'reload' not in engine:
+            engine.every('reload', RELOAD_INTERVAL, reload_jobs)
+            log_info(logger, "Scheduled periodic job reload every 2 hours.")
+    elif type(jobs) == int:
+        log_info(logger, f"Scheduling specific job from database: ID {jobs}.")
+        reload_jobs(job_id=jobs)
+    elif isinstance(jobs, ScheduleRule):
+        log_info(logger, f"Scheduling job '{jobs.job.name}' (schedule {jobs.schedule_id}) from provided rule.")
+        engine.add(jobs)
+    else:
+        log_error(logger, f"Invalid input type for schedule_job: {type(jobs)}. Expected None, int, or ScheduleRule.")
 
 
 def run_loop():
     log_info(logger, "Scheduler run_loop starting.")
-    log_info(logger, f"Next scheduled run at: {schedule.next_run}")
+    log_info(logger, f"Next scheduled run at: {engine.next_run}")
     while True:
         try:
-            schedule.run_pending()
+            engine.run_pending()
 
-            idle = schedule.idle_seconds()
+            idle = engine.idle_seconds()
             if idle is None:
                 # No jobs scheduled
                 log_debug(logger, "No jobs scheduled. Sleeping for 120 seconds.")
@@ -316,10 +1384,7 @@ def run_loop():
                 sleep_time = min(idle, 60)
                 log_debug(logger, f"Next job in {idle:.2f} seconds. Sleeping for {sleep_time:.2f} seconds.")
                 time.sleep(sleep_time)
-            else:
-                # Jobs might be due now or overdue, sleep very briefly
-                 log_debug(logger, "Jobs pending or due. Short sleep (1s).")
-                 time.sleep(10) # Short sleep if jobs ran or are due
+            # else: jobs due now or overdue, run_pending again right away
 
         except KeyboardInterrupt:
              log_info(logger, "Scheduler run_loop interrupted by user (KeyboardInterrupt). Exiting.")
@@ -329,13 +1394,291 @@ def run_loop():
              time.sleep(30) # Sleep a bit longer after an error in the loop itself
 
 
+"""
+##----------------------------------------
+Runtime asyncio (scheduler.runtime = 'async')
+##----------------------------------------
+"""
+
+# Criado por run_async_loop(); None no runtime de threads
+_async_runner = None
+
+
+def _async_eligible(jobs):
+    """Jobs que rodam na API assíncrona do oracledb; os demais vão para o JobExecutor de threads."""
+    if cfg.oracle_async_pool is None:
+        return False
+    if len(jobs) == 1 and jobs[0].split_strategy:
+        return False
+    return not any(job.execution_mode == 'process' for job in jobs)
+
+
+def _decimal_numbers(cursor, metadata):
+    """
+    `outputtypehandler` do cursor assíncrono sem conversores: NUMBER que não
+    é inteiro declarado vem como Decimal, como no dialeto do SQLAlchemy do
+    caminho síncrono (o float padrão do driver perderia dígitos).
+    """
+    if metadata.type_code is oracledb.DB_TYPE_NUMBER and metadata.scale != 0:
+        return cursor.var(Decimal, arraysize=cursor.arraysize)
+    return None
+
+
+def _bind_params(sql, params):
+    # O driver recusa parâmetros que o SQL não usa (o text() do SQLAlchemy os ignora)
+    return {name: value for name, value in params.items() if re.search(rf':{name}\b', sql)}
+
+
+async def _export_shared_async(targets, sizing, run_metrics, job_logger):
+    """
+    Mesmo fluxo de `_export_shared` com a API assíncrona do oracledb: a
+    corrotina espera o banco sem ocupar uma thread; abertura, escrita e
+    fechamento dos arquivos rodam no executor de I/O do runtime.
+    """
+    leader = targets[0]
+    loop = asyncio.get_running_loop()
+    io_executor = _async_runner.io_executor
+    conversions = _csv_conversions(targets)
+
+    async with _async_runner.oracle_slot(), cfg.oracle_async_pool.acquire() as connection, AsyncExitStack() as cleanup:
+        # O NLS (config.NLS_SESSION_SQL) já vem da criação da sessão (session_callback do pool assíncrono)
+        cursor = connection.cursor()
+        # Fecha o cursor também quando a execução ou a busca falham (mesmo cuidado do `_export_shared`)
+        cleanup.callback(cursor.close)
+        if _tracks_time(targets):
+            await cursor.execute(DB_NOW_SQL)
+            _set_db_now(targets, (await cursor.fetchone())[0])
+
+        # 1) Tamanhos e conversores direto no cursor (sem os eventos do engine)
+        cursor.arraysize = sizing.arraysize
+        if sizing.prefetchrows is not None:
+            cursor.prefetchrows = sizing.prefetchrows
+        if conversions is not None:
+            cursor.outputtypehandler = conversions.output_type_handler
+            sizing.freeze()
+        else:
+            cursor.outputtypehandler = _decimal_numbers
+
+        # 2) Executa o SQL do job
+        run_metrics.start_query()
+        await cursor.execute(leader.sql, _bind_params(leader.sql, leader.params))
+        run_metrics.query_opened()
+        sizing.after_execute(cursor)
+        # Mesmos nomes de coluna do SQLAlchemy (maiúsculas do Oracle viram minúsculas)
+        normalize_name = cfg.oracle_engine.dialect.normalize_name
+        columns = [str(normalize_name(column[0])) for column in cursor.description]
+        upper_columns = [c.upper() for c in columns]
+
+        tracked = []
+        opened = []
+        for target in targets:
+            job = target.job
+            if job.export_mode != 'full' and job.watermark_column:
+                if job.watermark_column.upper() not in upper_columns:
+                    target.error = ValueError(f"Watermark column '{job.watermark_column}' not found in query result")
+                    continue
+                tracked.append((upper_columns.index(job.watermark_column.upper()), target.tracked))
+
+            # 3) Abre o arquivo no formato do job
+            if await loop.run_in_executor(io_executor, _open_target, target, columns, cursor.description):
+                opened.append(target)
+
+        async def fetch_batch():
+            started = time.perf_counter()
+            batch = await cursor.fetchmany()
+            run_metrics.record_fetch(batch, started)
+            sizing.observe(batch, cursor)
+            for index, state in tracked:
+                _update_max(batch, index, state)
+            return batch
+
+        if opened:
+            fan_out = _fan_out(opened)
+            sink = run_metrics.wrap_writer(fan_out)
+            try:
+                # 4) Busca em blocos de `arraysize`; a escrita de cada bloco roda
+                #    no executor de I/O enquanto o próximo é buscado
+                rows_exported = await run_export_async(
+                    fetch_batch, sink, io_executor,
+                    on_batch=lambda batch_rows, total: log_debug(
+                        job_logger,
+                        f"Job '{leader.job.name}': Fetched {batch_rows} rows (Total: {total})",
+                        job_id=leader.job.job_id
+                    )
+                )
+            except BaseException:
+                await loop.run_in_executor(io_executor, sink.abort)
+                raise
+            finally:
+                await loop.run_in_executor(io_executor, sink.close)
+
+            for index, target in enumerate(opened):
+                target.error = fan_out.errors.get(index)
+                target.rows = target.resumed_rows + rows_exported
+                target.bytes_written = _written_bytes(target)
+
+
+async def execute_jobs_async(jobs):
+    """
+    `execute_jobs` no runtime asyncio. Preparação e registro do resultado
+    (consultas ao PostgreSQL) rodam em threads; a consulta Oracle e a busca
+    são assíncronas. Retorna os mesmos resumos de `execute_jobs`.
+    """
+    run_metrics = RunMetrics()
+    run_started = datetime.now()
+    job_logger = get_logger('executor')
+
+    targets = await asyncio.to_thread(_prepare_targets, jobs, job_logger, run_started)
+    if not targets:
+        return []
+
+    leader = targets[0]
+    probe = None
+    if leader.job.freshness_sql:
+        probe = await _run_probe_async(leader.job, run_metrics, job_logger)
+        if probe is not None and await asyncio.to_thread(_source_unchanged, targets, probe):
+            return await asyncio.to_thread(_skip_unchanged, targets, run_metrics, run_started, job_logger)
+
+    _log_query_start(targets, job_logger)
+
+    sizing = None
+    try:
+        sizing = await asyncio.to_thread(_new_sizing, leader.job)
+        await _export_shared_async(targets, sizing, run_metrics, job_logger)
+    except Exception as error:
+        for target in targets:
+            if target.error is None:
+                target.error = error
+
+    results = await asyncio.to_thread(_finish_run, targets, sizing, run_metrics, run_started, job_logger)
+    await asyncio.to_thread(_remember_probe, targets, probe, job_logger)
+    return results
+
+
+async def _run_probe_async(job, run_metrics, job_logger):
+    """`_run_probe` com a API assíncrona do oracledb."""
+    try:
+        async with _async_runner.oracle_slot(), cfg.oracle_async_pool.acquire() as connection, AsyncExitStack() as cleanup:
+            cursor = connection.cursor()
+            cleanup.callback(cursor.close)
+            run_metrics.start_query()
+            await cursor.execute(job.freshness_sql)
+            row = await cursor.fetchone()
+            run_metrics.query_opened()
+    except Exception as e:
+        log_warning(job_logger, f"Job '{job.name}': Freshness probe failed, exporting anyway: {e}", job_id=job.job_id)
+        return None
+    return _probe_text(row)
+
+
+async def _run_jobs_threaded(jobs):
+    """Entrega os jobs ao JobExecutor de threads (modo thick, split, 'process') e espera o resultado."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(result, error):
+        if not future.done():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def run(admitted):
+        try:
+            results = run_jobs(admitted)
+        except BaseException as error:
+            loop.call_soon_threadsafe(settle, None, error)
+            return
+        loop.call_soon_threadsafe(settle, results, None)
+
+    # A admissão já foi feita pelo AsyncJobRunner; o JobExecutor só roda a execução
+    get_executor().submit_admitted(run, jobs)
+    return await future
+
+
+async def run_jobs_async(jobs):
+    """Ponto de entrada do AsyncJobRunner: API assíncrona quando possível, threads nos demais casos."""
+    if not _async_eligible(jobs):
+        return await _run_jobs_threaded(jobs)
+    results = await execute_jobs_async(jobs)
+    _record_results(results)
+    return results
+
+
+def _log_async_submitted(jobs):
+    for job in jobs:
+        log_debug(logger, f"Submitted job '{job.name}' (ID: {job.job_id}) to async runtime.", job_id=job.job_id)
+
+
+def dispatch_rules_async(rules):
+    """`dispatch_rules` do runtime asyncio (chamado na thread do `run_pending`)."""
+    for group in group_rules(rules):
+        _async_runner.submit_threadsafe(run_jobs_async, group, on_admitted=_log_async_submitted)
+
+
+async def _run_async():
+    global _async_runner
+    # Mesmo limitador do JobExecutor: jobs assíncronos e em threads dividem scheduler.max_oracle_queries
+    _async_runner = AsyncJobRunner(cfg.ASYNC_MAX_JOBS, get_executor().oracle_limiter, cfg.ASYNC_IO_WORKERS)
+    _async_runner.start()
+    metrics_registry.add_collector('async_runtime', _async_runner.stats)
+    engine.set_dispatch(dispatch_rules_async)
+
+    # Logs em lote pelo asyncpg, se instalado; sem ele seguem na thread do DBLogWriter
+    log_writer = None
+    try:
+        log_writer = AsyncDBLogWriter(cfg.postgres_dsn, **cfg.LOGGING)
+    except RuntimeError as e:
+        log_info(logger, f"{e} Database logs stay on the background writer thread.")
+    if log_writer is not None:
+        log_writer.start()
+        set_db_log_sink(log_writer.submit)
+
+    pool = cfg.oracle_async_pool
+    if pool is None:
+        log_info(logger, "Oracle async API unavailable (thick mode or disabled); jobs run on the thread executor.")
+
+    log_info(logger, f"Async scheduler starting ({cfg.ASYNC_MAX_JOBS} concurrent runs). Next scheduled run at: {engine.next_run}")
+    try:
+        await run_timer_loop(engine)
+    finally:
+        await _async_runner.shutdown()
+        if pool is not None:
+            await pool.close()
+        if log_writer is not None:
+            set_db_log_sink(None)
+            await log_writer.close()
+
+
+def run_async_loop():
+    """Alternativa ao `run_loop`: disparos no horário exato e execuções como corrotinas (ver async_runtime)."""
+    try:
+        asyncio.run(_run_async())
+    except KeyboardInterrupt:
+        log_info(logger, "Scheduler async loop interrupted by user (KeyboardInterrupt). Exiting.")
+
+
 if __name__ == '__main__':
     log_info(logger, "*** Scheduler Service Starting ***")
+    set_locale()
+    if not cfg.check_connections():
+        shutdown_logging()
+        exit(1)
     try:
+        if cfg.ORACLE_POOL.get('prewarm', True):
+            log_info(logger, f"Pre-warmed {cfg.prewarm_oracle_pool()} Oracle connections.")
+        engine.every('stats', STATS_INTERVAL, log_runtime_stats)
+        start_metrics_exporters()
+        start_change_watch()
         schedule_job() # Initial scheduling
-        run_loop()
+        if cfg.RUNTIME == 'async':
+            run_async_loop()
+        else:
+            run_loop()
     except Exception as e:
         log_exception(logger, "*** Scheduler Service Crashed Unhandled Exception ***")
     finally:
         log_info(logger, "*** Scheduler Service Shutting Down ***")
-        executor.shutdown(wait=True) # Wait for running jobs to finish if possible
\ No newline at end of file
+        get_executor().shutdown(wait=True) # Wait for running jobs to finish if possible
+        shutdown_process_pool()
+        shutdown_logging() # Flush pending DB logs
\ No newline at end of file
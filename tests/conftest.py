@@ -0,0 +1,113 @@
+"""
+Fixtures dos testes: o serviço roda com dois SQLite no lugar dos bancos
+(mesma ideia do `benchmarks/bench_export.py`), ligados com `cfg.override()`.
+
+O SQLite que faz o papel do Oracle é forçado a usar cursores de servidor,
+como o dialeto Oracle com `stream_results`: o SQLAlchemy passa a buscar com
+a `BufferedRowCursorFetchStrategy`, que é a que roda em produção.
+"""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# Módulos do serviço ficam na raiz do repositório (layout plano)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _streaming_engine(path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import QueuePool
+
+    # 'sqlite://' escolheria o SingletonThreadPool, que fecha conexões de outras
+    # threads ainda em uso quando passa de pool_size threads (ex.: partes do split)
+    engine = create_engine(
+        'sqlite://', creator=lambda: sqlite3.connect(path, check_same_thread=False),
+        poolclass=QueuePool, pool_size=8
+    )
+
+    class StreamingContext(engine.dialect.execution_ctx_cls):
+        def create_server_side_cursor(self):
+            return self.create_default_cursor()
+
+    engine.dialect.execution_ctx_cls = StreamingContext
+    engine.dialect.supports_server_side_cursors = True
+    return engine
+
+
+@pytest.fixture(scope='session')
+def databases(tmp_path_factory):
+    """(engine do 'PostgreSQL', engine do 'Oracle') ligados ao serviço."""
+    from sqlalchemy import create_engine, event
+    from config import cfg
+    from models import Base
+
+    workdir = tmp_path_factory.mktemp('databases')
+    scheduler_path = str(workdir / 'sql_scheduler.db')
+    postgres_engine = create_engine(
+        f"sqlite:///{workdir / 'catalog.db'}", connect_args={'timeout': 60, 'check_same_thread': False}
+    )
+
+    @event.listens_for(postgres_engine, 'connect')
+    def attach_schema(dbapi_connection, connection_record):
+        dbapi_connection.execute(f"ATTACH DATABASE '{scheduler_path}' AS sql_scheduler")
+
+    oracle_engine = _streaming_engine(str(workdir / 'source.db'))
+    cfg.override(
+        parameters={
+            'scheduler': {'max_workers': 4, 'max_oracle_queries': 4},
+            'export': {'min_arraysize': 10, 'checkpoint_seconds': 3600},
+            'logging': {'flush_interval': 0.2},
+            'metrics': {'persist_runs': True},
+        },
+        postgres_engine=postgres_engine,
+        oracle_engine=oracle_engine
+    )
+    Base.metadata.create_all(postgres_engine)
+    return postgres_engine, oracle_engine
+
+
+@pytest.fixture
+def scheduler(databases):
+    import scheduler
+    return scheduler
+
+
+@pytest.fixture
+def source(databases):
+    """Cria no 'Oracle' a tabela `nome` com as colunas (id, name) e ids de 1 a `rows`."""
+    oracle_engine = databases[1]
+
+    def create(name, rows):
+        with oracle_engine.begin() as connection:
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {name}")
+            connection.exec_driver_sql(f"CREATE TABLE {name} (id INTEGER, name TEXT)")
+            connection.exec_driver_sql(
+                f"INSERT INTO {name} WITH RECURSIVE s(v) AS (SELECT 1 UNION ALL SELECT v + 1 FROM s WHERE v < {rows}) "
+                f"SELECT v, 'name ' || v FROM s"
+            )
+        return name
+    return create
+
+
+@pytest.fixture
+def job_row(databases):
+    """Grava o job em `jobs_he` (watermark, last_exec e afins são lidos/gravados lá)."""
+    from sqlalchemy.orm import Session
+    from models import JobHE
+
+    def add(job_id, **columns):
+        with Session(databases[0]) as session:
+            existing = session.get(JobHE, job_id)
+            if existing is not None:
+                session.delete(existing)
+                session.flush()
+            columns.setdefault('job_name', f'job_{job_id}')
+            columns.setdefault('job_status', 'Y')
+            columns.setdefault('export_path', '.')
+            columns.setdefault('export_name', f'job_{job_id}')
+            columns.setdefault('sql_script', 'SELECT 1')
+            session.add(JobHE(job_id=job_id, **columns))
+            session.commit()
+    return add
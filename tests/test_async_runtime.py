@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+from async_runtime import AsyncJobRunner
+from job_runner import JobExecutor
+
+
+def test_async_and_thread_queries_share_one_oracle_limit():
+    executor = JobExecutor(2, max_oracle_queries=1)
+    held, release = threading.Event(), threading.Event()
+
+    def thread_query():
+        with executor.oracle_slot():
+            held.set()
+            release.wait(5)
+
+    async def main():
+        runner = AsyncJobRunner(2, executor.oracle_limiter, 1)
+        runner.start()
+        worker = threading.Thread(target=thread_query)
+        worker.start()
+        await asyncio.to_thread(held.wait, 5)
+
+        async def async_query():
+            async with runner.oracle_slot():
+                return executor.stats()['oracle_active']
+
+        query = asyncio.ensure_future(async_query())
+        await asyncio.sleep(0.2)
+        # A vaga única está com a thread: a corrotina espera, sem ocupar outra
+        assert not query.done()
+        assert runner.stats()['oracle_active'] == 1
+
+        release.set()
+        assert await asyncio.wait_for(query, 5) == 1
+        await asyncio.to_thread(worker.join)
+        stats = runner.stats()
+        await runner.shutdown()
+        return stats
+
+    stats = asyncio.run(main())
+    executor.shutdown()
+
+    assert stats['oracle_active'] == 0
+    assert stats['oracle_limit'] == 1
+    assert stats['oracle_wait_seconds'] > 0
+
+
+class _FailingCursor:
+    def __init__(self):
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self.closed = False
+
+    async def execute(self, sql, parameters=None):
+        raise RuntimeError('ORA-03113: end-of-file on communication channel')
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeAsyncPool:
+    def __init__(self):
+        self.cursors = []
+
+    def acquire(self):
+        pool = self
+
+        class Acquired:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc_info):
+                return False
+
+            def cursor(self):
+                cursor = _FailingCursor()
+                pool.cursors.append(cursor)
+                return cursor
+        return Acquired()
+
+
+def test_async_export_closes_the_cursor_when_the_query_fails(scheduler, tmp_path, monkeypatch):
+    from config import cfg
+    from recurrence import JobSpec
+
+    pool = _FakeAsyncPool()
+    monkeypatch.setattr(cfg, '_oracle_async_pool', pool)
+    job = JobSpec(501, 'async_failure', str(tmp_path), 'async_failure', 'SELECT id FROM async_failure')
+
+    async def main():
+        runner = AsyncJobRunner(1, scheduler.get_executor().oracle_limiter, 1)
+        runner.start()
+        monkeypatch.setattr(scheduler, '_async_runner', runner)
+        try:
+            return await scheduler.execute_jobs_async([job])
+        finally:
+            await runner.shutdown()
+
+    [result] = asyncio.run(main())
+
+    assert 'ORA-03113' in result['error']
+    assert pool.cursors and all(cursor.closed for cursor in pool.cursors)
+
+
+def test_threaded_fallback_runs_a_batch_the_async_runner_admitted(scheduler, tmp_path, monkeypatch):
+    from recurrence import JobSpec
+
+    job = JobSpec(502, 'admitted', str(tmp_path), 'admitted', 'SELECT 1', overlap_policy='coalesce')
+    started, release = threading.Event(), threading.Event()
+
+    def long_run(jobs):
+        started.set()
+        release.wait(5)
+
+    # O mesmo job ainda rodando no JobExecutor não pode descartar o lote já admitido
+    executor = scheduler.get_executor()
+    assert executor.submit_jobs(long_run, [job])
+    assert started.wait(5)
+    monkeypatch.setattr(scheduler, 'run_jobs', lambda jobs: [{'job_id': job.job_id} for job in jobs])
+    try:
+        results = asyncio.run(asyncio.wait_for(scheduler._run_jobs_threaded([job]), 5))
+    finally:
+        release.set()
+
+    assert results == [{'job_id': 502}]
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from auxils import is_select_query, normalize_sql
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT 1 FROM dual",
+    "select id, updated_at, created_by FROM t;\n",
+    "  -- delete everything\n/* drop */ (SELECT 1 FROM dual);  -- end",
+    "SELECT q'[DELETE FROM t; DROP TABLE t]' AS txt FROM dual",
+    "SELECT q'{it's; UPDATE}' FROM dual",
+    "SELECT nq'!INSERT!' FROM dual",
+    'SELECT "DROP", "a;b" FROM "DELETE"',
+    "SELECT 'it''s; DELETE' FROM dual",
+    "WITH x AS (SELECT 1 AS n FROM dual) SELECT * FROM x",
+])
+def test_read_only_scripts_are_accepted(sql):
+    assert is_select_query(sql)
+
+
+@pytest.mark.parametrize('sql', [
+    "DELETE FROM t",
+    "WITH x AS (SELECT 1 AS n FROM dual) DELETE FROM t WHERE n IN (SELECT n FROM x)",
+    "WITH x AS (SELECT 1 FROM dual) INSERT INTO t SELECT * FROM x",
+    "SELECT 1 FROM dual; SELECT 2 FROM dual",
+    "SELECT 1 FROM dual;\n-- next\nDROP TABLE t",
+    "SELECT 1 FROM dual /* ok */; UPDATE t SET a = 1",
+    "SELECT a FROM t;\n\n        \n        \n        SELECT b FROM u",
+    "/* only a comment */",
+    "",
+])
+def test_writes_and_multi_statement_scripts_are_refused(sql):
+    assert not is_select_query(sql)
+
+
+@pytest.mark.parametrize('sql', [
+    'SELECT 1 FROM dual;' + ' ' * 26 + 'x',
+    'SELECT a FROM t;' + '\n        ' * 2000 + 'SELECT b FROM u',
+    'SELECT 1 FROM dual;' + ' ;' * 5000 + ' x',
+    'SELECT 1 FROM dual;' + '-- a\n' * 5000 + 'x',
+])
+def test_trailing_text_after_semicolon_is_linear(sql):
+    is_select_query.cache_clear()
+    started = time.perf_counter()
+    assert not is_select_query(sql)
+    assert time.perf_counter() - started < 1.0
+
+
+def test_normalize_sql_ignores_comments_case_and_final_semicolon():
+    assert normalize_sql("select  a -- x\nFROM t;") == normalize_sql("SELECT a FROM T")
+    assert normalize_sql("SELECT 'a' FROM t") != normalize_sql("SELECT 'A' FROM t")
@@ -0,0 +1,181 @@
+import socket
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from change_watch import ChangeListener, ChangeWatcher
+from models import JobDE
+
+
+class _Snapshots:
+    def __init__(self, *snapshots):
+        self.snapshots = list(snapshots)
+
+    def __call__(self):
+        return self.snapshots.pop(0) if len(self.snapshots) > 1 else self.snapshots[0]
+
+
+def test_poll_reports_changed_new_and_deleted_jobs():
+    changes = []
+    watcher = ChangeWatcher(_Snapshots({1: 'a', 2: 'b', 3: 'c'}, {1: 'a', 2: 'B', 4: 'd'}), changes.append, poll_seconds=0)
+    watcher.prime()
+
+    assert watcher.check() == {2, 3, 4}
+    assert changes == [[2, 3, 4]]
+    # Sem diferença na consulta seguinte, nada é recarregado
+    assert watcher.check() == set()
+    assert changes == [[2, 3, 4]]
+
+
+def test_failed_poll_keeps_the_previous_reference():
+    changes = []
+    watcher = ChangeWatcher(_Snapshots({1: 'a'}, None, {1: 'b'}), changes.append, poll_seconds=0)
+    watcher.prime()
+
+    assert watcher.check() == set()
+    assert watcher.check() == {1}
+    assert changes == [[1]]
+
+
+def test_notified_jobs_reload_without_waiting_for_the_poll():
+    changes = []
+    watcher = ChangeWatcher(_Snapshots({}), changes.append, poll_seconds=3600)
+    watcher.prime()
+    watcher.notify(7)
+    watcher.notify(7)
+
+    assert watcher.check() == {7}
+    assert changes == [[7]]
+
+
+class _ListenConnection:
+    """Conexão psycopg2 falsa: o socket fica legível quando chega um NOTIFY."""
+
+    class _Notify:
+        def __init__(self, payload):
+            self.payload = payload
+
+    def __init__(self):
+        self._reader, self._writer = socket.socketpair()
+        self.notifies = []
+        self._pending = []
+        self.statements = []
+        self.autocommit = False
+
+    def fileno(self):
+        return self._reader.fileno()
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def execute(self, statement):
+                connection.statements.append(statement)
+        return Cursor()
+
+    def send(self, payload):
+        self._pending.append(payload)
+        self._writer.send(b'x')
+
+    def poll(self):
+        self._reader.recv(1024)
+        self.notifies.extend(self._Notify(payload) for payload in self._pending)
+        self._pending.clear()
+
+    def close(self):
+        self._reader.close()
+        self._writer.close()
+
+
+def test_listener_forwards_numeric_payloads_to_the_watcher():
+    connection = _ListenConnection()
+    watcher = ChangeWatcher(_Snapshots({}), lambda job_ids: None, poll_seconds=3600)
+    watcher.prime()
+    listener = ChangeListener(lambda: connection, watcher)
+    listener.start()
+    try:
+        connection.send('12')
+        connection.send('not-a-job')
+        connection.send('13')
+        deadline = time.monotonic() + 5
+        changed = set()
+        while changed != {12, 13} and time.monotonic() < deadline:
+            changed |= watcher.check()
+            time.sleep(0.01)
+    finally:
+        listener.stop()
+
+    assert changed == {12, 13}
+    assert connection.autocommit
+    assert connection.statements == ['LISTEN sql_scheduler_jobs']
+
+
+def _touch_schedule(databases, job_id, schedule_id, start_hour):
+    with Session(databases[0]) as session:
+        session.merge(JobDE(schedule_id=schedule_id, job_id=job_id, job_day='Qua', start_hour=start_hour,
+                            updated_at=datetime.now() + timedelta(seconds=schedule_id)))
+        session.commit()
+
+
+def _watch_reloads(scheduler, poll_seconds):
+    reloaded = []
+
+    def on_change(job_ids):
+        reloaded.append(job_ids)
+        scheduler._reload_changed(job_ids)
+
+    watcher = ChangeWatcher(scheduler._job_snapshot, on_change, poll_seconds=poll_seconds)
+    watcher.prime()
+    return watcher, reloaded
+
+
+def _scheduled(scheduler, job_id):
+    return {key for key in scheduler.engine.keys() if key[0] == job_id}
+
+
+def test_polled_schedule_change_reloads_only_that_job(scheduler, databases, job_row):
+    job_row(701)
+    job_row(702)
+    _touch_schedule(databases, 701, 7011, '06:00')
+    _touch_schedule(databases, 702, 7021, '06:00')
+    scheduler.reload_jobs(job_id=701)
+    scheduler.reload_jobs(job_id=702)
+    watcher, reloaded = _watch_reloads(scheduler, poll_seconds=0)
+    try:
+        _touch_schedule(databases, 701, 7012, '07:00')
+
+        assert watcher.check() == {701}
+        assert reloaded == [[701]]
+        assert _scheduled(scheduler, 701) == {(701, 7011), (701, 7012)}
+        assert _scheduled(scheduler, 702) == {(702, 7021)}
+    finally:
+        scheduler.sync_schedule([], job_id=701)
+        scheduler.sync_schedule([], job_id=702)
+
+
+def test_change_notification_triggers_a_reload(scheduler, databases, job_row):
+    job_row(703)
+    _touch_schedule(databases, 703, 7031, '06:00')
+    scheduler.reload_jobs(job_id=703)
+    # Consulta só de hora em hora: quem dispara o reload é o NOTIFY
+    watcher, reloaded = _watch_reloads(scheduler, poll_seconds=3600)
+    try:
+        with Session(databases[0]) as session:
+            session.query(JobDE).filter_by(schedule_id=7031).delete()
+            session.commit()
+        assert watcher.check() == set()
+
+        watcher.notify(703)
+
+        assert watcher.check() == {703}
+        assert reloaded == [[703]]
+        assert _scheduled(scheduler, 703) == set()
+    finally:
+        scheduler.sync_schedule([], job_id=703)
@@ -0,0 +1,56 @@
+import dependencies
+from config import cfg
+
+
+def _installed_except(*absent):
+    return lambda package: package not in absent
+
+
+def test_active_jobs_and_their_sinks_require_packages(databases, job_row, monkeypatch):
+    job_row(1001, export_format='parquet')
+    job_row(1002, export_format='csv', export_compression='zstd')
+    job_row(1003, sinks='[{"format": "arrow"}, {"format": "csv", "compression": "zstd"}]')
+    # Parquet com zstd usa o codec do pyarrow; jobs inativos não contam
+    job_row(1004, export_format='parquet', export_compression='zstd')
+    job_row(1005, export_format='arrow', job_status='N')
+    monkeypatch.setattr(dependencies, 'is_installed', _installed_except('pyarrow', 'zstandard', 'asyncpg'))
+    try:
+        missing = dependencies.missing_packages(databases[0])
+    finally:
+        for job_id in (1001, 1002, 1003, 1004, 1005):
+            job_row(job_id, job_status='N')
+
+    assert missing == {
+        'pyarrow': ['job 1001', 'job 1003', 'job 1004'],
+        'zstandard': ['job 1002', 'job 1003'],
+    }
+
+
+def test_missing_asyncpg_only_warns(databases, monkeypatch, capsys):
+    monkeypatch.setattr(dependencies, 'is_installed', _installed_except('asyncpg'))
+    monkeypatch.setattr(cfg, 'RUNTIME', 'async')
+
+    assert cfg._check_packages()
+    output = capsys.readouterr().out
+    assert "'asyncpg' não instalado" in output
+    assert "pip install -r requirements-optional.txt" in output
+
+
+def test_missing_package_of_an_active_job_fails_the_startup_check(databases, job_row, monkeypatch, capsys):
+    job_row(1006, export_format='parquet')
+    monkeypatch.setattr(dependencies, 'is_installed', _installed_except('pyarrow'))
+    try:
+        assert not cfg._check_packages()
+    finally:
+        job_row(1006, job_status='N')
+    assert "'pyarrow' não instalado (usado por: job 1006)" in capsys.readouterr().out
+
+
+def test_nothing_missing_when_packages_are_installed(databases, job_row, monkeypatch, capsys):
+    job_row(1007, export_format='parquet')
+    monkeypatch.setattr(dependencies, 'is_installed', lambda package: True)
+    try:
+        assert cfg._check_packages()
+    finally:
+        job_row(1007, job_status='N')
+    assert capsys.readouterr().out == ''
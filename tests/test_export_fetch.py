@@ -0,0 +1,27 @@
+from recurrence import JobSpec
+
+
+def test_untyped_exports_fetch_in_arraysize_blocks(scheduler, source, tmp_path):
+    source('fetch_rows', 5000)
+    job = JobSpec(101, 'fetch_checksum', str(tmp_path), 'fetch_checksum', 'SELECT id, name FROM fetch_rows',
+                  export_format='checksum', fetch_arraysize=500)
+
+    [result] = scheduler.execute_jobs([job])
+
+    assert result['error'] is None
+    assert result['rows'] == 5000
+    assert result['metrics']['peak_batch_rows'] == 500
+    assert result['metrics']['batches'] == 10
+
+
+def test_split_parts_fetch_in_arraysize_blocks(scheduler, source, tmp_path):
+    source('split_rows', 3000)
+    job = JobSpec(102, 'fetch_split', str(tmp_path), 'fetch_split', 'SELECT id, name FROM split_rows',
+                  export_format='checksum', fetch_arraysize=200,
+                  split_strategy='key_range', split_column='id', split_parts=3)
+
+    [result] = scheduler.execute_jobs([job])
+
+    assert result['error'] is None
+    assert result['rows'] == 3000
+    assert result['metrics']['peak_batch_rows'] == 200
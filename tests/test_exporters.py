@@ -0,0 +1,242 @@
+from decimal import Decimal
+import os
+import time
+
+import oracledb
+import pytest
+
+import exporters
+
+
+def _number(name, precision, scale):
+    # Entrada do cursor.description: (name, type_code, display_size, internal_size, precision, scale, null_ok)
+    return (name, oracledb.DB_TYPE_NUMBER, None, None, precision, scale, True)
+
+
+def test_parquet_number_columns_accept_decimal(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    pa = pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'numbers.parquet')
+    columns = ['id', 'price', 'ratio', 'big']
+    description = [_number('ID', 10, 0), _number('PRICE', 12, 2), _number('RATIO', 0, -127), _number('BIG', 0, -127)]
+
+    exporter = exporters.ParquetExporter(path)
+    exporter.open(columns, description)
+    exporter.write_batch([(1, Decimal('10.50'), Decimal('0.125'), 2 ** 53 + 1), (2, None, Decimal('3'), None)])
+    exporter.write_batch([(3, Decimal('7'), None, Decimal('12345678901234567890.123456789'))])
+    exporter.close()
+
+    table = pq.read_table(path)
+    assert table.schema.field('price').type == pa.decimal128(12, 2)
+    assert table.schema.field('ratio').type == pa.string()
+    assert table.column('price').to_pylist() == [Decimal('10.50'), None, Decimal('7.00')]
+    assert table.column('ratio').to_pylist() == ['0.125', '3', None]
+    # NUMBER sem precisão não passa por float: nenhum dígito se perde
+    assert table.column('big').to_pylist() == ['9007199254740993', None, '12345678901234567890.123456789']
+
+
+def test_arrow_type_for_unconstrained_number_is_lossless():
+    pa = pytest.importorskip('pyarrow')
+    exporters._load_pyarrow('arrow')
+    assert exporters.arrow_type_for(_number('N', None, None)) == pa.string()
+    assert exporters.arrow_type_for(_number('N', 0, -127)) == pa.string()
+    # FLOAT(126) do Oracle: NUMBER com precisão binária e escala -127
+    assert exporters.arrow_type_for(_number('N', 126, -127)) == pa.string()
+    assert exporters.arrow_type_for(_number('N', 18, 0)) == pa.int64()
+    assert exporters.arrow_type_for(_number('N', 30, 0)) == pa.decimal128(30, 0)
+    assert exporters.arrow_type_for(_number('N', 5, -2)) == pa.int64()
+    assert exporters.arrow_type_for(_number('N', 30, -5)) == pa.decimal128(35, 0)
+    assert exporters.arrow_type_for(_number('N', 3, 5)) == pa.decimal128(3, 5)
+    binary_double = ('N', oracledb.DB_TYPE_BINARY_DOUBLE, None, None, None, None, True)
+    assert exporters.arrow_type_for(binary_double) == pa.float64()
+
+
+def test_async_cursor_fetches_fractional_numbers_as_decimal(scheduler):
+    class Metadata:
+        def __init__(self, type_code, scale):
+            self.type_code, self.scale = type_code, scale
+
+    class Cursor:
+        arraysize = 100
+
+        def var(self, type_, arraysize):
+            return (type_, arraysize)
+
+    cursor = Cursor()
+    assert scheduler._decimal_numbers(cursor, Metadata(oracledb.DB_TYPE_NUMBER, -127)) == (Decimal, 100)
+    assert scheduler._decimal_numbers(cursor, Metadata(oracledb.DB_TYPE_NUMBER, 2)) == (Decimal, 100)
+    assert scheduler._decimal_numbers(cursor, Metadata(oracledb.DB_TYPE_NUMBER, 0)) is None
+    assert scheduler._decimal_numbers(cursor, Metadata(oracledb.DB_TYPE_VARCHAR, None)) is None
+
+
+class _DriverCursor:
+    """Cursor no lugar do psycopg2: guarda os comandos e o que o COPY recebeu."""
+
+    def __init__(self):
+        self.statements = []
+        self.copied = b''
+
+    def execute(self, statement):
+        self.statements.append(statement.as_string(self))
+
+    def copy_expert(self, statement, stream):
+        self.statements.append(statement)
+        self.copied += stream.read()
+
+    def close(self):
+        pass
+
+
+class _PooledConnection:
+    """Como o `_ConnectionFairy` de `raw_connection()`: não é uma conexão psycopg2, mas entrega o cursor do driver."""
+
+    def __init__(self):
+        self.driver_cursor = _DriverCursor()
+        self.committed = False
+
+    def cursor(self):
+        return self.driver_cursor
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_postgres_copy_quotes_with_the_driver_cursor(monkeypatch):
+    psycopg2_extensions = pytest.importorskip('psycopg2.extensions')
+
+    def strict_quote_ident(name, scope):
+        # Mesma checagem do psycopg2: só aceita conexão ou cursor do driver
+        if not isinstance(scope, _DriverCursor):
+            raise TypeError('argument 2 must be a connection or a cursor')
+        return '"' + name.replace('"', '""') + '"'
+
+    monkeypatch.setattr(psycopg2_extensions, 'quote_ident', strict_quote_ident)
+    connection = _PooledConnection()
+    exporter = exporters.PostgresCopyExporter('public.Sales', connect=lambda: connection)
+
+    exporter.open(['ID', 'Name'])
+    exporter.write_batch([(1, 'a'), (2, None)])
+    exporter.close()
+
+    statements = connection.driver_cursor.statements
+    assert statements[0] == 'TRUNCATE TABLE "public"."Sales"'
+    assert statements[1] == 'COPY "public"."Sales" ("id", "Name") FROM STDIN WITH (FORMAT csv)'
+    assert connection.driver_cursor.copied == b'1,a\r\n2,\r\n'
+    assert connection.committed
+
+
+def test_postgres_copy_against_a_real_database():
+    dsn = os.environ.get('SQL_SCHEDULER_TEST_PG_DSN')
+    if not dsn:
+        pytest.skip('SQL_SCHEDULER_TEST_PG_DSN not set')
+    from sqlalchemy import create_engine
+
+    engine = create_engine(dsn)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE IF EXISTS copy_exporter_test")
+        connection.exec_driver_sql("CREATE TABLE copy_exporter_test (id integer, name text)")
+    try:
+        exporter = exporters.PostgresCopyExporter('copy_exporter_test', connect=engine.raw_connection)
+        exporter.open(['ID', 'NAME'])
+        exporter.write_batch([(1, 'a'), (2, None)])
+        exporter.close()
+        with engine.connect() as connection:
+            rows = connection.exec_driver_sql("SELECT id, name FROM copy_exporter_test ORDER BY id").all()
+        assert [tuple(row) for row in rows] == [(1, 'a'), (2, None)]
+    finally:
+        with engine.begin() as connection:
+            connection.exec_driver_sql("DROP TABLE IF EXISTS copy_exporter_test")
+        engine.dispose()
+
+
+class _ListExporter:
+    """Destino em memória; `fail_on` = número do bloco (1, 2...) em que a escrita falha."""
+
+    def __init__(self, fail_on=None, delay=0):
+        self.rows = []
+        self.batches = 0
+        self.closed = False
+        self._fail_on = fail_on
+        self._delay = delay
+
+    def write_batch(self, rows):
+        self.batches += 1
+        if self.batches == self._fail_on:
+            raise OSError('disk full')
+        time.sleep(self._delay)
+        self.rows.extend(rows)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.parametrize('queue_depth', [0, 2], ids=['inline', 'threads'])
+def test_fan_out_isolates_a_failing_sink(queue_depth):
+    healthy, failing, slow = _ListExporter(), _ListExporter(fail_on=2), _ListExporter(delay=0.01)
+    fan_out = exporters.FanOutExporter([healthy, failing, slow], queue_depth=queue_depth)
+    batches = [[(block, line) for line in range(3)] for block in range(5)]
+
+    for batch in batches:
+        fan_out.write_batch(batch)
+    fan_out.close()
+
+    expected = [row for batch in batches for row in batch]
+    assert healthy.rows == expected
+    assert slow.rows == expected
+    # O destino com erro recebeu só o primeiro bloco e não recebe mais nada depois da falha
+    assert failing.rows == batches[0]
+    assert failing.batches == 2
+    assert list(fan_out.errors) == [1]
+    assert isinstance(fan_out.errors[1], OSError)
+    assert healthy.closed and failing.closed and slow.closed
+
+
+def test_fan_out_raises_only_when_every_sink_failed():
+    fan_out = exporters.FanOutExporter([_ListExporter(fail_on=1), _ListExporter(fail_on=2)])
+    fan_out.write_batch([(1,)])
+
+    with pytest.raises(OSError):
+        fan_out.write_batch([(2,)])
+    fan_out.close()
+    assert sorted(fan_out.errors) == [0, 1]
+
+
+def test_job_with_extra_sinks_writes_every_output(scheduler, source, tmp_path):
+    from recurrence import JobSpec
+
+    source('sink_rows', 120)
+    sinks = '[{"format": "checksum"}, {"format": "csv", "name": "sink_rows_copy"}]'
+    job = JobSpec(801, 'sink_rows', str(tmp_path), 'sink_rows', 'SELECT id, name FROM sink_rows', sinks=sinks)
+
+    [result] = scheduler.execute_jobs([job])
+
+    assert result['error'] is None and result['rows'] == 120
+    assert (tmp_path / 'sink_rows.csv').read_bytes() == (tmp_path / 'sink_rows_copy.csv').read_bytes()
+    assert '"rows": 120' in (tmp_path / 'sink_rows.checksum.json').read_text()
+
+
+def test_failing_sink_leaves_the_other_outputs_complete(scheduler, source, tmp_path, monkeypatch):
+    from recurrence import JobSpec
+
+    source('sink_fail_rows', 300)
+    sinks = '[{"format": "checksum"}, {"format": "csv", "name": "sink_fail_copy"}]'
+    job = JobSpec(802, 'sink_fail', str(tmp_path), 'sink_fail', 'SELECT id, name FROM sink_fail_rows',
+                  fetch_arraysize=50, sinks=sinks)
+
+    def failing_write(self, rows):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(exporters.ChecksumExporter, 'write_batch', failing_write)
+    [result] = scheduler.execute_jobs([job])
+
+    assert 'disk full' in result['error']
+    assert result['metrics']['status'] == 'failed'
+    main = (tmp_path / 'sink_fail.csv').read_text().splitlines()
+    assert len(main) == 1 + 300
+    assert (tmp_path / 'sink_fail_copy.csv').read_text().splitlines() == main
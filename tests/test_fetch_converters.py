@@ -0,0 +1,69 @@
+from recurrence import JobSpec
+
+
+def test_typed_csv_keeps_rows_buffered_by_the_result(scheduler, source, tmp_path):
+    source('typed_rows', 1234)
+    job = JobSpec(301, 'typed_csv', str(tmp_path), 'typed_csv', 'SELECT id, name FROM typed_rows ORDER BY id',
+                  fetch_arraysize=100)
+
+    [result] = scheduler.execute_jobs([job])
+
+    assert result['error'] is None
+    assert result['rows'] == 1234
+    with open(tmp_path / 'typed_csv.csv', encoding='utf-8') as handle:
+        lines = handle.read().splitlines()
+    assert lines[:2] == ['id;name', '1;name 1']
+    assert len(lines) == 1 + 1234
+    assert result['metrics']['peak_batch_rows'] == 100
+
+
+def test_typed_and_untyped_csv_bytes_are_identical(scheduler, databases, tmp_path, monkeypatch):
+    from config import cfg
+
+    with databases[1].begin() as connection:
+        connection.exec_driver_sql("DROP TABLE IF EXISTS mixed_rows")
+        connection.exec_driver_sql("CREATE TABLE mixed_rows (id INTEGER, amount REAL, label TEXT)")
+        connection.exec_driver_sql(
+            "INSERT INTO mixed_rows VALUES (1, 1.5, 'a;b'), (2, 0.25, NULL), (3, -12.75, 'say \"hi\"'), (4, NULL, '')"
+        )
+    sql = 'SELECT id, amount, label FROM mixed_rows ORDER BY id'
+
+    [typed] = scheduler.execute_jobs([JobSpec(302, 'typed', str(tmp_path), 'typed', sql)])
+    monkeypatch.setattr(cfg, 'CSV_CONVERSIONS', None)
+    [untyped] = scheduler.execute_jobs([JobSpec(303, 'untyped', str(tmp_path), 'untyped', sql)])
+
+    assert typed['error'] is None and untyped['error'] is None
+    assert (tmp_path / 'typed.csv').read_bytes() == (tmp_path / 'untyped.csv').read_bytes()
+
+
+class _Metadata:
+    def __init__(self, type_code):
+        self.type_code = type_code
+
+
+class _Cursor:
+    arraysize = 100
+
+    def var(self, type_code, size=None, arraysize=None, outconverter=None):
+        return type_code, outconverter
+
+
+def _oracle_number_text(value):
+    # TO_CHAR de um NUMBER sem máscara: sem zero antes do ponto ('.5', '-.25')
+    text = str(value)
+    return text.replace('0.', '.', 1) if text.lstrip('-').startswith('0.') else text
+
+
+def test_number_text_matches_the_untyped_csv_text():
+    import oracledb
+    from decimal import Decimal
+    from config import NLS_SESSION_SQL
+    from fetch_converters import CsvConversions, number_text
+
+    type_code, converter = CsvConversions().output_type_handler(_Cursor(), _Metadata(oracledb.DB_TYPE_NUMBER))
+    assert type_code is oracledb.DB_TYPE_VARCHAR and converter is number_text
+
+    for value in (Decimal('0.5'), Decimal('-0.25'), Decimal('1.5'), Decimal('-12.75'), 7, -3, 12345678901234567890123):
+        assert number_text(_oracle_number_text(value)) == str(value)
+    # O separador decimal vem fixado da sessão, independente do território do cliente
+    assert "NLS_NUMERIC_CHARACTERS = '.,'" in NLS_SESSION_SQL
@@ -0,0 +1,63 @@
+from sqlalchemy.orm import Session
+
+from models import JobHE, JobRun
+from recurrence import JobSpec
+
+SQL = 'SELECT id, name FROM fresh_rows'
+PROBE = 'SELECT MAX(id), COUNT(*) FROM fresh_rows'
+
+
+def _fresh_job(tmp_path, job_id=901, probe=PROBE):
+    return JobSpec(job_id, 'fresh_rows', str(tmp_path), 'fresh_rows', SQL, freshness_sql=probe)
+
+
+def _statuses(databases, job_id):
+    with Session(databases[0]) as session:
+        return [run.status for run in session.query(JobRun).filter_by(job_id=job_id).order_by(JobRun.run_id)]
+
+
+def test_unchanged_source_is_skipped_until_it_changes(scheduler, databases, source, job_row, tmp_path):
+    source('fresh_rows', 100)
+    job_row(901, sql_script=SQL, freshness_sql=PROBE)
+
+    [first] = scheduler.execute_jobs([_fresh_job(tmp_path)])
+    assert first['error'] is None and first['rows'] == 100
+    with Session(databases[0]) as session:
+        assert session.get(JobHE, 901).freshness_value == '["100", "100"]'
+
+    [second] = scheduler.execute_jobs([_fresh_job(tmp_path)])
+    assert second == {'job_id': 901, 'rows': 0, 'error': None, 'metrics': second['metrics']}
+    assert second['metrics']['status'] == scheduler.SKIPPED_UNCHANGED
+    assert len((tmp_path / 'fresh_rows.csv').read_text().splitlines()) == 1 + 100
+
+    with databases[1].begin() as connection:
+        connection.exec_driver_sql("INSERT INTO fresh_rows VALUES (101, 'name 101')")
+    [third] = scheduler.execute_jobs([_fresh_job(tmp_path)])
+
+    assert third['rows'] == 101
+    assert _statuses(databases, 901) == ['success', scheduler.SKIPPED_UNCHANGED, 'success']
+
+
+def test_missing_output_is_exported_again(scheduler, source, job_row, tmp_path):
+    source('fresh_rows', 50)
+    job_row(902, sql_script=SQL, freshness_sql=PROBE)
+    scheduler.execute_jobs([_fresh_job(tmp_path, 902)])
+    (tmp_path / 'fresh_rows.csv').unlink()
+
+    [result] = scheduler.execute_jobs([_fresh_job(tmp_path, 902)])
+
+    assert result['rows'] == 50
+    assert (tmp_path / 'fresh_rows.csv').exists()
+
+
+def test_failed_probe_exports_and_keeps_no_probe_value(scheduler, databases, source, job_row, tmp_path):
+    source('fresh_rows', 20)
+    broken = 'SELECT MAX(id) FROM missing_table'
+    job_row(903, sql_script=SQL, freshness_sql=broken)
+
+    for _ in range(2):
+        [result] = scheduler.execute_jobs([_fresh_job(tmp_path, 903, broken)])
+        assert result['error'] is None and result['rows'] == 20
+
+    with Session(databases[0]) as session:
+        assert session.get(JobHE, 903).freshness_value is None
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import event
+
+from recurrence import JobSpec, ScheduleRule
+
+SQL = 'SELECT id, name FROM group_rows'
+
+
+def _rule(job_id, sql=SQL, schedule_id=None, tmp_path='.', **fields):
+    job = JobSpec(job_id, f'group_{job_id}', str(tmp_path), f'group_{job_id}', sql, **fields)
+    return ScheduleRule(schedule_id or job_id, job, 0, timedelta(hours=8))
+
+
+def _ids(groups):
+    return sorted(sorted(job.job_id for job in group) for group in groups)
+
+
+def test_jobs_with_the_same_normalized_sql_share_one_run(scheduler):
+    rules = [
+        _rule(1),
+        _rule(2, 'select  id, name\n  from GROUP_ROWS; -- cópia do job 1'),
+        _rule(3, 'SELECT id FROM group_rows'),
+    ]
+
+    assert _ids(scheduler.group_rules(rules)) == [[1, 2], [3]]
+
+
+def test_two_rules_of_one_job_due_together_run_once(scheduler):
+    rules = [_rule(1, schedule_id=11), _rule(1, schedule_id=12)]
+
+    [[job]] = scheduler.group_rules(rules)
+    assert job.job_id == 1
+
+
+@pytest.mark.parametrize('fields', [
+    {'export_mode': 'delta', 'watermark_column': 'id'},
+    {'export_mode': 'append', 'watermark_column': 'id'},
+    {'split_strategy': 'key_range', 'split_column': 'id', 'split_parts': 2},
+    {'resume_key': 'id'},
+    {'freshness_sql': 'SELECT MAX(id) FROM group_rows'},
+], ids=['delta', 'append', 'split', 'resume', 'freshness'])
+def test_stateful_jobs_are_never_grouped(scheduler, fields):
+    rules = [_rule(1), _rule(2), _rule(3, **fields)]
+
+    assert _ids(scheduler.group_rules(rules)) == [[1, 2], [3]]
+
+
+def test_grouped_run_queries_once_and_writes_every_output(scheduler, databases, source, tmp_path):
+    source('group_rows', 250)
+    rules = [_rule(5, tmp_path=tmp_path), _rule(6, 'select id, name from group_rows', tmp_path=tmp_path)]
+    [group] = scheduler.group_rules(rules)
+    queries = []
+
+    def count_queries(conn, cursor, statement, parameters, context, executemany):
+        if 'group_rows' in statement:
+            queries.append(statement)
+
+    event.listen(databases[1], 'before_cursor_execute', count_queries)
+    try:
+        results = scheduler.execute_jobs(group)
+    finally:
+        event.remove(databases[1], 'before_cursor_execute', count_queries)
+
+    assert len(queries) == 1
+
+    assert [(r['job_id'], r['rows'], r['error']) for r in results] == [(5, 250, None), (6, 250, None)]
+    assert (tmp_path / 'group_5.csv').read_bytes() == (tmp_path / 'group_6.csv').read_bytes()
@@ -0,0 +1,167 @@
+import threading
+import time
+
+import pytest
+
+from job_runner import JobExecutor
+from recurrence import JobSpec
+
+
+def _job(job_id, **fields):
+    return JobSpec(job_id, f'job_{job_id}', '.', f'job_{job_id}', 'SELECT 1', **fields)
+
+
+class _Blocker:
+    """Função de job que segura o worker até `release()`, contando as execuções."""
+
+    def __init__(self):
+        self.started = threading.Semaphore(0)
+        self.released = threading.Event()
+        self.runs = []
+
+    def __call__(self, jobs):
+        self.runs.append([job.job_id for job in jobs])
+        self.started.release()
+        self.released.wait(5)
+
+    def wait_started(self, count=1):
+        for _ in range(count):
+            assert self.started.acquire(timeout=5)
+
+    def release(self):
+        self.released.set()
+
+
+@pytest.fixture
+def executor():
+    executor = JobExecutor(2)
+    yield executor
+    executor.shutdown()
+
+
+def _wait_idle(executor):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        stats = executor.stats()
+        if not stats['running_jobs'] and not stats['queue_depth'] and not stats['deferred']:
+            return stats
+        time.sleep(0.01)
+    raise AssertionError(f"executor did not go idle: {executor.stats()}")
+
+
+def test_skip_policy_drops_a_run_while_the_job_is_running(executor):
+    blocker = _Blocker()
+    job = _job(1, overlap_policy='skip')
+    assert executor.submit_jobs(blocker, [job]) == [job]
+    blocker.wait_started()
+
+    assert executor.submit_jobs(blocker, [job]) == []
+    blocker.release()
+    stats = _wait_idle(executor)
+
+    assert blocker.runs == [[1]]
+    assert stats['skipped'] == 1
+    assert stats['completed'] == 1
+
+
+def test_coalesce_policy_keeps_one_follow_up_run(executor):
+    blocker = _Blocker()
+    job = _job(2, overlap_policy='coalesce')
+    executor.submit_jobs(blocker, [job])
+    blocker.wait_started()
+
+    assert executor.submit_jobs(blocker, [job]) == []
+    assert executor.submit_jobs(blocker, [job]) == []
+    assert executor.stats()['deferred'] == 1
+    blocker.release()
+    stats = _wait_idle(executor)
+
+    assert blocker.runs == [[2], [2]]
+    assert stats['coalesced'] == 1
+    assert stats['skipped'] == 1
+
+
+def test_allow_policy_runs_overlapping_executions(executor):
+    blocker = _Blocker()
+    job = _job(3, overlap_policy='allow')
+    executor.submit_jobs(blocker, [job])
+    assert executor.submit_jobs(blocker, [job]) == [job]
+    # Os dois workers rodam o mesmo job ao mesmo tempo
+    blocker.wait_started(2)
+    assert executor.stats()['running_jobs'] == 2
+    blocker.release()
+
+    assert _wait_idle(executor)['completed'] == 2
+
+
+def test_higher_priority_runs_first():
+    executor = JobExecutor(1)
+    blocker = _Blocker()
+    order = []
+    try:
+        executor.submit_jobs(blocker, [_job(10)])
+        blocker.wait_started()
+        for job_id, priority in ((11, 0), (12, 5), (13, 1), (14, 5)):
+            executor.submit_jobs(lambda jobs: order.extend(job.job_id for job in jobs), [_job(job_id, priority=priority)])
+        blocker.release()
+        _wait_idle(executor)
+    finally:
+        executor.shutdown()
+
+    # Mesma prioridade: ordem de chegada
+    assert order == [12, 14, 13, 11]
+
+
+def test_worker_survives_a_job_raising_base_exception(databases):
+    # `databases`: o log do erro vai para o banco e precisa da configuração dos testes
+    executor = JobExecutor(1)
+    ran = threading.Event()
+
+    def exiting(jobs):
+        raise SystemExit(3)
+
+    try:
+        executor.submit_jobs(exiting, [_job(20)])
+        executor.submit_jobs(lambda jobs: ran.set(), [_job(21)])
+        assert ran.wait(5)
+        stats = _wait_idle(executor)
+    finally:
+        executor.shutdown()
+
+    assert stats['failed'] == 1
+    assert stats['completed'] == 1
+
+
+def test_submit_after_shutdown_raises():
+    executor = JobExecutor(1)
+    executor.shutdown()
+
+    with pytest.raises(RuntimeError):
+        executor.submit_jobs(lambda jobs: None, [_job(30)])
+
+
+def test_get_executor_creates_a_single_executor_under_concurrent_first_use(scheduler, monkeypatch):
+    created = []
+
+    class SlowExecutor:
+        def __init__(self, *args):
+            time.sleep(0.05)
+            created.append(self)
+
+    monkeypatch.setattr(scheduler, '_executor', None)
+    monkeypatch.setattr(scheduler, 'JobExecutor', SlowExecutor)
+    barrier = threading.Barrier(8)
+    seen = []
+
+    def first_use():
+        barrier.wait()
+        seen.append(scheduler.get_executor())
+
+    threads = [threading.Thread(target=first_use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(executor is created[0] for executor in seen)
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from leveling import LoadLeveler, slots_on, tolerance_minutes
+from recurrence import JobSpec, RuleScheduler, ScheduleRule
+
+MONDAY = datetime(2024, 1, 1)
+EIGHT = timedelta(hours=8)
+
+
+def _rule(job_id, tolerance=0, priority=0, end=None, step=None):
+    job = JobSpec(job_id, f'job_{job_id}', '.', f'job_{job_id}', 'SELECT 1',
+                  start_tolerance=tolerance, priority=priority)
+    return ScheduleRule(job_id, job, 0, EIGHT, end, step)
+
+
+def _leveler(seconds=120):
+    return LoadLeveler(lambda: ({}, seconds))
+
+
+def test_leveled_fires_stay_within_tolerance_and_flatten_the_peak():
+    rules = [_rule(job_id, tolerance=10) for job_id in range(1, 9)] + [_rule(9)]
+    plan = _leveler().plan(rules, MONDAY.date())
+    slot = MONDAY + EIGHT
+
+    for rule in rules:
+        fire = plan.fires[(rule.key, slot)]
+        assert slot <= fire <= slot + timedelta(minutes=tolerance_minutes(rule))
+    # Sem tolerância não se move
+    assert plan.fires[(rules[-1].key, slot)] == slot
+    assert plan.unleveled_peak == 9
+    assert plan.peak()[1] < plan.unleveled_peak
+
+
+def test_tolerance_is_capped_below_the_rule_step():
+    periodic = _rule(1, tolerance=30, end=timedelta(hours=9), step=timedelta(minutes=5))
+
+    assert tolerance_minutes(periodic) == 4
+    assert tolerance_minutes(_rule(2, tolerance=30)) == 30
+    assert tolerance_minutes(_rule(3)) == 0
+    assert len(list(slots_on(periodic, MONDAY.date()))) == 13
+
+
+def test_run_pending_defers_leveled_rules_within_their_window():
+    dispatched = []
+    engine = RuleScheduler(lambda rules: dispatched.extend((rule.key, now) for rule in rules), leveler=_leveler())
+    rules = [_rule(job_id, tolerance=5) for job_id in range(1, 7)]
+    for rule in rules:
+        engine.add(rule, now=MONDAY)
+
+    calls = []
+    job_rules = engine.job_rules
+    engine.job_rules = lambda: calls.append(1) or job_rules()
+
+    now = MONDAY + EIGHT
+    engine.run_pending(now)
+    # Um único levantamento das regras por disparo, não um por regra vencida
+    assert len(calls) == 1
+
+    while len(dispatched) < len(rules):
+        now = engine.next_run
+        assert now <= MONDAY + EIGHT + timedelta(minutes=5)
+        engine.run_pending(now)
+
+    assert sorted(key for key, _ in dispatched) == sorted(rule.key for rule in rules)
+    assert len({when for _, when in dispatched}) > 1
+    # Depois dos adiados, cada regra volta para o slot da semana seguinte
+    assert engine.next_run == MONDAY + timedelta(days=7) + EIGHT
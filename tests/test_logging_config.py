@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+from logging_config import DBLogWriter
+
+
+class _Sessions:
+    """`session_factory` falso: guarda cada lote gravado; `gate` segura a gravação."""
+
+    def __init__(self):
+        self.batches = []
+        self.writing = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self):
+        return self
+
+    def execute(self, statement, batch):
+        self.writing.set()
+        assert self.gate.wait(5)
+        self.batches.append([record['log_text'] for record in batch])
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    @property
+    def texts(self):
+        return [text for batch in self.batches for text in batch]
+
+
+def _record(text):
+    return DBLogWriter._make_record("INFO", "test", text)
+
+
+def test_records_are_written_in_batches_of_at_most_batch_size():
+    sessions = _Sessions()
+    writer = DBLogWriter(sessions, batch_size=3, flush_interval=0.5)
+    for index in range(7):
+        writer.submit(_record(f"m{index}"))
+    writer.flush()
+    writer.close()
+
+    assert sessions.texts == [f"m{index}" for index in range(7)]
+    assert all(len(batch) <= 3 for batch in sessions.batches)
+    assert len(sessions.batches) < 7
+
+
+def test_partial_batch_is_written_after_flush_interval():
+    sessions = _Sessions()
+    writer = DBLogWriter(sessions, batch_size=100, flush_interval=0.1)
+    writer.submit(_record("only"))
+
+    deadline = time.monotonic() + 5
+    while not sessions.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.close()
+
+    assert sessions.batches == [["only"]]
+
+
+def _fill_while_writing(overflow):
+    """Segura a thread gravando `first` e enche a fila (queue_size=2) com `second` e `third`."""
+    sessions = _Sessions()
+    sessions.gate.clear()
+    writer = DBLogWriter(sessions, queue_size=2, batch_size=1, flush_interval=0.05, overflow=overflow)
+    writer.submit(_record("first"))
+    assert sessions.writing.wait(5)
+    writer.submit(_record("second"))
+    writer.submit(_record("third"))
+    return sessions, writer
+
+
+@pytest.mark.parametrize('overflow, expected', [
+    ('drop_newest', ["first", "second", "third"]),
+    ('drop_oldest', ["first", "third", "fourth"]),
+])
+def test_full_queue_drops_by_policy_and_reports_the_drop(overflow, expected):
+    sessions, writer = _fill_while_writing(overflow)
+    writer.submit(_record("fourth"))
+    sessions.gate.set()
+    writer.close()
+
+    texts = sessions.texts
+    assert [text for text in texts if not text.startswith("DB log queue overflow")] == expected
+    assert "DB log queue overflow: 1 log records dropped." in texts
+
+
+def test_block_policy_waits_for_room_instead_of_dropping():
+    sessions, writer = _fill_while_writing('block')
+    blocked = threading.Thread(target=writer.submit, args=(_record("fourth"),))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+
+    sessions.gate.set()
+    blocked.join(5)
+    writer.close()
+
+    assert sessions.texts == ["first", "second", "third", "fourth"]
+
+
+def test_record_submitted_while_closing_is_not_lost():
+    sessions = _Sessions()
+    writer = DBLogWriter(sessions, flush_interval=0.01)
+    writer.submit(_record("before"))
+    writer.flush()
+
+    # close() chega entre o teste de `_closed` e o put do registro
+    put_nowait = writer._queue.put_nowait
+    closing = threading.Thread(target=writer.close)
+
+    def racing_put(record):
+        closing.start()
+        closing.join(0.2)
+        put_nowait(record)
+
+    writer._queue.put_nowait = racing_put
+    writer.submit(_record("racing"))
+    closing.join(5)
+
+    assert sessions.texts == ["before", "racing"]
+    # Depois do close() os registros são gravados direto
+    writer.submit(_record("late"))
+    assert sessions.batches[-1] == ["late"]
@@ -0,0 +1,60 @@
+import re
+
+from sqlalchemy import create_engine, event
+
+from migrations import MIGRATION_SQL, missing_schema
+
+# Schema da versão original dos modelos (antes das colunas novas e de job_runs)
+_ORIGINAL_DDL = (
+    "CREATE TABLE sql_scheduler.weekday (job_day TEXT PRIMARY KEY, day_number INTEGER NOT NULL)",
+    "CREATE TABLE sql_scheduler.jobs_he (job_id INTEGER PRIMARY KEY, job_name TEXT NOT NULL, job_status VARCHAR(1) NOT NULL, "
+    "export_path TEXT NOT NULL, export_name TEXT NOT NULL, sql_script TEXT, last_exec TIMESTAMP)",
+    "CREATE TABLE sql_scheduler.jobs_de (schedule_id INTEGER PRIMARY KEY, job_id INTEGER NOT NULL, job_day TEXT NOT NULL, "
+    "start_hour TEXT NOT NULL, end_hour TEXT, job_iter TEXT)",
+    "CREATE TABLE sql_scheduler.logs (log_id INTEGER PRIMARY KEY, timestamp TIMESTAMP NOT NULL, log_level TEXT, logger_name TEXT, "
+    "job_id INTEGER, user_name TEXT, log_text TEXT NOT NULL, duration_ms INTEGER)",
+)
+
+
+def _original_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    schema_path = tmp_path / 'sql_scheduler.db'
+
+    @event.listens_for(engine, 'connect')
+    def attach_schema(dbapi_connection, connection_record):
+        dbapi_connection.execute(f"ATTACH DATABASE '{schema_path}' AS sql_scheduler")
+
+    with engine.begin() as connection:
+        for ddl in _ORIGINAL_DDL:
+            connection.exec_driver_sql(ddl)
+    return engine
+
+
+def _migrated_columns():
+    added = set()
+    for table, body in re.findall(r"ALTER TABLE sql_scheduler\.(\w+)(.*?);", MIGRATION_SQL, re.DOTALL):
+        added.update(f"{table}.{column}" for column in re.findall(r"ADD COLUMN IF NOT EXISTS (\w+)", body))
+    return added
+
+
+def test_migration_covers_every_column_missing_from_the_original_schema(tmp_path):
+    engine = _original_database(tmp_path)
+
+    missing = missing_schema(engine)
+
+    assert 'job_runs' in missing
+    assert 'jobs_he.export_format' in missing and 'jobs_de.updated_at' in missing
+    assert set(missing) - {'job_runs'} == _migrated_columns()
+    assert 'CREATE TABLE IF NOT EXISTS sql_scheduler.job_runs' in MIGRATION_SQL
+
+
+def test_current_schema_has_nothing_missing(databases):
+    assert missing_schema(databases[0]) == []
+
+
+def test_job_runs_table_matches_the_model():
+    from models import JobRun
+
+    body = re.search(r"CREATE TABLE IF NOT EXISTS sql_scheduler\.job_runs \((.*?)\n\);", MIGRATION_SQL, re.DOTALL).group(1)
+    columns = [line.split()[0] for line in body.strip().splitlines()]
+    assert columns == [column.name for column in JobRun.__table__.columns]
@@ -0,0 +1,90 @@
+import threading
+
+import partitioned
+from job_runner import OracleLimiter
+from recurrence import JobSpec
+
+
+def _split_job(tmp_path, parts):
+    return JobSpec(301, 'split_parts', str(tmp_path), 'split_parts', 'SELECT id, name FROM parts_rows',
+                   split_strategy='key_range', split_column='id', split_parts=parts, split_output='parts')
+
+
+def _snapshot(directory):
+    return {path.name: path.read_bytes() for path in directory.iterdir()}
+
+
+def test_failed_parts_run_keeps_previous_output(scheduler, source, tmp_path, monkeypatch):
+    source('parts_rows', 900)
+    [result] = scheduler.execute_jobs([_split_job(tmp_path, 3)])
+    assert result['error'] is None
+    before = _snapshot(tmp_path)
+    assert sorted(before) == [
+        'split_parts.manifest.json', 'split_parts_part0000.csv', 'split_parts_part0001.csv', 'split_parts_part0002.csv'
+    ]
+
+    real_run_export = partitioned.run_export
+    calls = []
+    lock = threading.Lock()
+
+    def failing_run_export(fetch_batch, exporter, **kwargs):
+        rows = real_run_export(fetch_batch, exporter, **kwargs)
+        with lock:
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('part failed')
+        return rows
+
+    monkeypatch.setattr(partitioned, 'run_export', failing_run_export)
+    [result] = scheduler.execute_jobs([_split_job(tmp_path, 4)])
+
+    assert 'part failed' in result['error']
+    assert _snapshot(tmp_path) == before
+
+
+def test_parts_run_replaces_parts_and_writes_manifest_last(scheduler, source, tmp_path):
+    source('parts_rows', 900)
+    scheduler.execute_jobs([_split_job(tmp_path, 3)])
+
+    [result] = scheduler.execute_jobs([_split_job(tmp_path, 2)])
+
+    assert result['error'] is None
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'split_parts.manifest.json', 'split_parts_part0000.csv', 'split_parts_part0001.csv'
+    ]
+    manifest = (tmp_path / 'split_parts.manifest.json').read_text()
+    assert '"rows": 900' in manifest
+
+
+def test_oracle_limiter_reserves_all_slots_at_once():
+    limiter = OracleLimiter(4)
+    limiter.acquire(3)
+    granted = threading.Event()
+
+    def reserve_two():
+        with limiter.slot(2):
+            granted.set()
+
+    worker = threading.Thread(target=reserve_two)
+    worker.start()
+    assert not granted.wait(0.2)
+    assert limiter.active == 3
+
+    limiter.release(3)
+    worker.join(5)
+    assert granted.is_set()
+    assert limiter.active == 0
+    # Pedidos acima do limite reservam o limite inteiro
+    with limiter.slot(10):
+        assert limiter.active == 4
+
+
+def test_process_batches_reserve_one_slot_per_part(scheduler, tmp_path):
+    plain = JobSpec(302, 'plain', str(tmp_path), 'plain', 'SELECT 1', execution_mode='process')
+    split = _split_job(tmp_path, 3)
+    wide = _split_job(tmp_path, 16)
+
+    assert scheduler._oracle_slots_for([plain]) == 1
+    assert scheduler._oracle_slots_for([split]) == 3
+    # max_oracle_queries = 4 nos testes
+    assert scheduler._oracle_slots_for([wide]) == 4
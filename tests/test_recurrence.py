@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from models import JobDE
+from recurrence import JobSpec, RuleScheduler, ScheduleRule
+
+# 01/01/2024 é uma segunda-feira
+MONDAY = datetime(2024, 1, 1)
+
+
+def _job(job_id=1, **fields):
+    return JobSpec(job_id, f'job_{job_id}', '.', f'job_{job_id}', 'SELECT 1', **fields)
+
+
+def _rule(weekday, start, end=None, step=None, schedule_id=1, job=None):
+    hhmm = lambda value: timedelta(hours=int(value[:2]), minutes=int(value[3:]))
+    return ScheduleRule(schedule_id, job or _job(), weekday, hhmm(start),
+                        hhmm(end) if end else None, timedelta(minutes=step) if step else None)
+
+
+def test_single_fire_rule_moves_to_next_week_after_its_slot():
+    rule = _rule(0, '08:00')
+
+    assert rule.next_fire(MONDAY) == MONDAY + timedelta(hours=8)
+    assert rule.next_fire(MONDAY + timedelta(hours=8)) == MONDAY + timedelta(days=7, hours=8)
+    # Domingo à noite: o próximo disparo é na segunda seguinte
+    assert rule.next_fire(MONDAY + timedelta(days=6, hours=23, minutes=59)) == MONDAY + timedelta(days=7, hours=8)
+
+
+def test_rule_on_another_weekday_crosses_day_boundaries():
+    rule = _rule(6, '23:30')  # domingo
+
+    assert rule.next_fire(MONDAY + timedelta(hours=12)) == MONDAY + timedelta(days=6, hours=23, minutes=30)
+    assert rule.next_fire(MONDAY + timedelta(days=6, hours=23, minutes=30)) == MONDAY + timedelta(days=13, hours=23, minutes=30)
+
+
+def test_periodic_rule_fires_on_each_step_until_end_hour():
+    rule = _rule(0, '08:15', '10:00', 45)
+
+    fires, moment = [], MONDAY
+    for _ in range(4):
+        moment = rule.next_fire(moment)
+        fires.append(moment)
+
+    assert fires == [
+        MONDAY + timedelta(hours=8, minutes=15),
+        MONDAY + timedelta(hours=9),
+        MONDAY + timedelta(hours=9, minutes=45),
+        MONDAY + timedelta(days=7, hours=8, minutes=15),
+    ]
+    # Entre dois slots, o próximo é o slot seguinte (não `after + step`)
+    assert rule.next_fire(MONDAY + timedelta(hours=8, minutes=20)) == MONDAY + timedelta(hours=9)
+    assert rule.slot_count() == 3
+
+
+def test_rule_with_end_before_start_never_fires():
+    rule = _rule(0, '10:00', '08:00', 30)
+
+    assert rule.next_fire(MONDAY) is None
+    assert rule.slot_count() == 0
+
+
+def test_from_model_rejects_non_positive_step():
+    sched = JobDE(schedule_id=1, job_id=1, job_day='Seg', start_hour='08:00', end_hour='09:00', job_iter='0')
+
+    with pytest.raises(ValueError):
+        ScheduleRule.from_model(sched, _job(), 0)
+
+
+def test_run_pending_dispatches_due_rules_and_reschedules_them():
+    dispatched = []
+    engine = RuleScheduler(dispatched.append)
+    early = _rule(0, '08:00', schedule_id=1)
+    late = _rule(0, '09:00', schedule_id=2)
+    engine.add(early, now=MONDAY)
+    engine.add(late, now=MONDAY)
+
+    assert engine.next_run == MONDAY + timedelta(hours=8)
+    assert engine.run_pending(MONDAY + timedelta(hours=8, minutes=30)) == 1
+    assert dispatched == [[early]]
+    assert engine.next_run == MONDAY + timedelta(hours=9)
+
+    engine.remove(late.key)
+    assert engine.next_run == MONDAY + timedelta(days=7, hours=8)
+
+
+def _schedule(databases, job_id, *rows):
+    with Session(databases[0]) as session:
+        session.query(JobDE).filter_by(job_id=job_id).delete()
+        for schedule_id, day, start in rows:
+            session.add(JobDE(schedule_id=schedule_id, job_id=job_id, job_day=day, start_hour=start))
+        session.commit()
+
+
+def test_reload_jobs_removes_rules_pruned_from_the_database(scheduler, databases, job_row):
+    job_row(601)
+    _schedule(databases, 601, (6011, 'Seg', '08:00'), (6012, 'Ter', '09:00'))
+    try:
+        scheduler.reload_jobs(job_id=601)
+        assert {key for key in scheduler.engine.keys() if key[0] == 601} == {(601, 6011), (601, 6012)}
+
+        _schedule(databases, 601, (6011, 'Seg', '08:30'))
+        scheduler.reload_jobs(job_id=601)
+
+        assert {key for key in scheduler.engine.keys() if key[0] == 601} == {(601, 6011)}
+        assert scheduler.engine.get((601, 6011)).start == timedelta(hours=8, minutes=30)
+    finally:
+        scheduler.sync_schedule([], job_id=601)
+
+
+def test_sync_schedule_only_touches_the_given_job(scheduler):
+    kept = _rule(0, '08:00', schedule_id=6021, job=_job(602))
+    dropped = _rule(1, '08:00', schedule_id=6031, job=_job(603))
+    try:
+        assert scheduler.sync_schedule([kept], job_id=602) == (1, 0, 0)
+        assert scheduler.sync_schedule([dropped], job_id=603) == (1, 0, 0)
+
+        assert scheduler.sync_schedule([], job_id=603) == (0, 0, 1)
+        assert kept.key in scheduler.engine
+        assert dropped.key not in scheduler.engine
+        # Regra igual à agendada não é substituída; alterada, é
+        assert scheduler.sync_schedule([kept], job_id=602) == (0, 0, 0)
+        moved = _rule(0, '08:05', schedule_id=6021, job=_job(602))
+        assert scheduler.sync_schedule([moved], job_id=602) == (0, 1, 0)
+        assert scheduler.engine.get(kept.key) is moved
+    finally:
+        scheduler.sync_schedule([], job_id=602)
@@ -0,0 +1,50 @@
+import json
+
+from config import cfg
+from recurrence import JobSpec
+
+
+def _resume_job(tmp_path):
+    return JobSpec(401, 'resume_rows', str(tmp_path), 'resume_rows', 'SELECT id, name FROM resume_rows',
+                   fetch_arraysize=500, resume_key='id')
+
+
+def test_failed_resumable_run_checkpoints_and_next_run_resumes(scheduler, source, tmp_path, monkeypatch):
+    source('resume_rows', 5000)
+    monkeypatch.setattr(cfg, 'CHECKPOINT_ROWS', 1000)
+
+    fetch_blocks = scheduler._fetch_blocks
+
+    def failing_fetch_blocks(result, sizing, conversions):
+        fetch_batch = fetch_blocks(result, sizing, conversions)
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            if len(calls) > 6:
+                raise RuntimeError('connection lost')
+            return fetch_batch()
+        return fetch
+
+    with monkeypatch.context() as patch:
+        patch.setattr(scheduler, '_fetch_blocks', failing_fetch_blocks)
+        [result] = scheduler.execute_jobs([_resume_job(tmp_path)])
+
+    assert 'connection lost' in result['error']
+    output = tmp_path / 'resume_rows.csv'
+    assert not output.exists()
+    assert (tmp_path / 'resume_rows.csv.partial').exists()
+    checkpoint = json.loads((tmp_path / 'resume_rows.csv.checkpoint.json').read_text())
+    # Seis blocos de 500 gravados antes da falha
+    assert checkpoint['rows'] == 3000
+
+    [result] = scheduler.execute_jobs([_resume_job(tmp_path)])
+
+    assert result['error'] is None
+    assert result['rows'] == 5000
+    assert result['metrics']['rows'] == 2000
+    lines = output.read_text().splitlines()
+    assert lines[0] == 'id;name'
+    ids = [int(line.split(';')[0]) for line in lines[1:]]
+    assert ids == list(range(1, 5001))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['resume_rows.csv']
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from models import JobHE
+from recurrence import JobSpec
+
+
+def _watermark(databases, job_id):
+    with Session(databases[0]) as session:
+        return session.get(JobHE, job_id).watermark_value
+
+
+def _csv_lines(path):
+    with open(path, encoding='utf-8') as handle:
+        return handle.read().splitlines()
+
+
+def test_first_run_with_null_aware_filter_loads_everything(scheduler, databases, source, job_row, tmp_path):
+    source('wm_rows', 300)
+    sql = 'SELECT id, name FROM wm_rows WHERE (:watermark IS NULL OR id > :watermark)'
+    job_row(201, sql_script=sql, export_mode='append', watermark_column='id')
+    job = JobSpec(201, 'wm_first', str(tmp_path), 'wm_first', sql, export_mode='append', watermark_column='id')
+
+    [first] = scheduler.execute_jobs([job])
+    assert first['error'] is None and first['rows'] == 300
+    assert _watermark(databases, 201) == '300'
+
+    with databases[1].begin() as connection:
+        connection.exec_driver_sql("INSERT INTO wm_rows VALUES (301, 'name 301'), (302, 'name 302')")
+    [second] = scheduler.execute_jobs([job])
+    assert second['rows'] == 2
+    assert _watermark(databases, 201) == '302'
+    assert len(_csv_lines(tmp_path / 'wm_first.csv')) == 1 + 302
+
+
+def test_first_run_without_null_handling_is_refused(scheduler, databases, source, job_row, tmp_path):
+    source('wm_strict', 10)
+    sql = 'SELECT id, name FROM wm_strict WHERE id > :watermark'
+    job_row(202, sql_script=sql, export_mode='delta', watermark_column='id')
+    job = JobSpec(202, 'wm_strict', str(tmp_path), 'wm_strict', sql, export_mode='delta', watermark_column='id')
+
+    assert scheduler.execute_jobs([job]) == []
+    assert _watermark(databases, 202) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_time_watermark_uses_database_clock(scheduler, databases, source, job_row, tmp_path, monkeypatch):
+    source('wm_time', 5)
+    db_now = datetime(2020, 5, 17, 10, 30, 0)
+    monkeypatch.setattr(scheduler, '_database_now', lambda session: db_now)
+    sql = 'SELECT id, name FROM wm_time WHERE (:watermark IS NULL OR id > 0)'
+    job_row(203, sql_script=sql, export_mode='delta')
+    job = JobSpec(203, 'wm_time', str(tmp_path), 'wm_time', sql, export_mode='delta')
+
+    [result] = scheduler.execute_jobs([job])
+    assert result['error'] is None and result['rows'] == 5
+    assert _watermark(databases, 203) == db_now.isoformat()